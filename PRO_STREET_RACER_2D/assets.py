@@ -0,0 +1,145 @@
+"""
+Asset cache and preloader.
+
+Images and fonts are loaded once and handed out as shared objects, images keyed by
+path and size and fonts by family and size. preload() reads files on a background
+thread and decodes them on the Tk thread (Tk is not thread-safe) one per scheduler
+callback, so the menu stays responsive while they load. Load times are kept in
+load_times and printed once preloading is done.
+"""
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+import tkinter.font as tkfont
+from queue import Queue, Empty
+
+FR_PRIVATE = 0x10  # AddFontResourceEx flag: the font is only visible to this process
+
+
+class AssetCache:
+    """
+    Decoded PhotoImages and Fonts, created on first use or by preload().
+    """
+    POLL_MS = 10
+
+    def __init__(self, root, scheduler):
+        self.root = root
+        self.scheduler = scheduler  # See scheduler.py
+        self.images = {}  # (path, size) -> PhotoImage
+        self.fonts = {}  # (family, size) -> Font
+        self.load_times = {}  # Path -> milliseconds spent reading and decoding
+        self.loaded = Queue()  # (path, file bytes, read time) from the reader thread
+        self.pending = 0
+        self.on_ready = []
+
+    def image(self, path, size=None, data=None):
+        """
+        The image at path, scaled by whole factors towards size (width, height) if given.
+        """
+        key = (path, size)
+        image = self.images.get(key)
+        if image is not None:
+            return image
+        start = time.perf_counter()
+        original = self.images.get((path, None))
+        if original is None:
+            if data is None:
+                original = tk.PhotoImage(master=self.root, file=path)
+            else:
+                original = tk.PhotoImage(master=self.root, data=data)
+            self.images[(path, None)] = original
+        image = original
+        if size is not None:
+            width, height = original.width(), original.height()
+            if size[0] < width:
+                image = original.subsample(max(1, width // size[0]), max(1, height // size[1]))
+            elif size[0] > width:
+                image = original.zoom(max(1, size[0] // width), max(1, size[1] // height))
+            self.images[key] = image
+        self.add_time(path, time.perf_counter() - start)
+        return image
+
+    def font(self, family, size):
+        key = (family, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = tkfont.Font(root=self.root, family=family, size=size)
+        return font
+
+    def register_font(self, path):
+        """
+        Makes the font file usable by its family name (the file name). Windows can add it
+        for this process only, elsewhere it has to be installed. Returns whether it is available.
+        """
+        start = time.perf_counter()
+        family = os.path.splitext(os.path.basename(path))[0]
+        if sys.platform == "win32" and os.path.exists(path):
+            import ctypes
+            ctypes.windll.gdi32.AddFontResourceExW(os.path.abspath(path), FR_PRIVATE, 0)
+        available = family.lower() in (name.lower() for name in tkfont.families(self.root))
+        self.add_time(path, time.perf_counter() - start)
+        if not available:
+            print(f"font {family} is not installed, using the default font")
+        return available
+
+    def add_time(self, path, seconds):
+        self.load_times[path] = self.load_times.get(path, 0.0) + seconds * 1000
+
+    def preload(self, paths, on_ready=None):
+        """
+        Reads the images in paths in the background and decodes them on the Tk thread.
+        on_ready is called once they are all in the cache.
+        """
+        paths = [path for path in paths if (path, None) not in self.images]
+        if on_ready:
+            self.on_ready.append(on_ready)
+        if not paths:
+            self.finish()
+            return
+        self.pending += len(paths)
+        threading.Thread(target=self.read_files, args=(paths,), name="asset-reader", daemon=True).start()
+        self.scheduler.call_later(self.POLL_MS, self.poll)
+
+    def read_files(self, paths):
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                file = open(path, "rb")
+                data = file.read()
+                file.close()
+            except OSError as error:
+                print(f"could not read {path}: {error}")
+                data = None
+            self.loaded.put((path, data, time.perf_counter() - start))
+
+    def poll(self):
+        """
+        Decodes one loaded file per call, so a frame never waits for more than one.
+        """
+        try:
+            path, data, read_time = self.loaded.get_nowait()
+        except Empty:
+            self.scheduler.call_later(self.POLL_MS, self.poll)
+            return
+        self.add_time(path, read_time)
+        if data is not None and (path, None) not in self.images:
+            try:
+                self.image(path, data=data)
+            except tk.TclError as error:
+                print(f"could not decode {path}: {error}")
+        self.pending -= 1
+        if self.pending:
+            self.scheduler.call_later(0, self.poll)
+        else:
+            self.finish()
+
+    def finish(self):
+        callbacks, self.on_ready = self.on_ready, []
+        for callback in callbacks:
+            callback()
+
+    def report(self):
+        for path, milliseconds in self.load_times.items():
+            print(f"Loaded {path} in {milliseconds:.1f} ms")
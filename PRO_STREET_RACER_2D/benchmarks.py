@@ -0,0 +1,393 @@
+"""
+Benchmarks for the simulation and rendering hot paths, the scrolling track, particles, the
+vectorised environment, the leaderboard, the rank index, the save files and the cold start to the main menu, each at
+several scales.
+
+    python benchmarks.py                                 # writes bench_results.json
+    python benchmarks.py --save-baseline                 # also stores it as bench_baseline.json
+    python benchmarks.py --compare bench_baseline.json   # flags regressions, exits with 1 if any
+
+Rendering uses a real Tk canvas when a display is available (for example under
+xvfb-run) and a stub canvas otherwise, which only measures the Python side.
+Cold start needs a display or xvfb-run and is skipped without one.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from cheats import DEFAULT_CHEAT_CODES
+from controls import DEFAULT_KEY_BINDINGS
+from leaderboard import Leaderboard
+from particles import ParticleSystem
+from profiler import percentile
+from rankindex import RankIndex
+from savegame import SAVE, read_save, read_world, write_save, write_world
+from scene import Car, ParticleView, Scene, SpriteCache, TrackView
+from simulation import Simulation, default_game_state
+from track import Track, TrackRing
+from vecenv import benchmark as vecenv_benchmark
+
+ENTITY_COUNTS = (1, 10, 100, 1000)
+VECENV_SIZES = (1, 64, 4096)
+PARTICLE_COUNTS = (500, 5000)  # Live particles, frame time should grow with the count only
+TRACK_DISTANCES = (0, 10 ** 6, 10 ** 9)  # Road already driven, the cost per frame should not depend on it
+LEADERBOARD_SIZES = (10, 1000, 100000)
+RANK_SIZES = (1000, 1000000, 10000000)
+SAVE_SIZES = (1, 100, 10000)  # Enemy cars in the saved world
+RESULTS = "bench_results.json"
+BASELINE = "bench_baseline.json"
+THRESHOLD = 0.20  # Relative change that counts as a regression, timings on a busy machine are noisy
+
+
+class StubTk:
+    def eval(self, *args):
+        pass
+
+    call = eval
+
+
+class StubCanvas:
+    """
+    Stands in for tk.Canvas without a display. Hands out item ids and ignores the rest.
+    """
+    _w = ".stub"
+
+    def __init__(self):
+        self.next_item = 0
+        self.tk = StubTk()
+
+    def create_item(self, *args, **kwargs):
+        self.next_item += 1
+        return self.next_item
+
+    create_rectangle = create_text = create_image = create_polygon = create_line = create_oval = create_item
+
+    def move(self, *args):
+        pass
+
+    def coords(self, *args):
+        pass
+
+    def itemconfig(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args):
+        pass
+
+
+def make_canvas():
+    """
+    Returns (canvas, kind, root): a real Tk canvas if a display is available, else a StubCanvas.
+    """
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:  # No tkinter or no display
+        return StubCanvas(), "stub", None
+    root.withdraw()
+    return tk.Canvas(root, width=1000, height=700), "tk", root
+
+
+def metric(value, unit, better):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def best_time(function, repeat=3):
+    """
+    Shortest of repeat runs, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def invincible_state():
+    state = default_game_state.copy()
+    state["invincibility_mode"] = True
+    return state
+
+
+def bench_simulation(results, ticks=2000):
+    for count in ENTITY_COUNTS:
+        def run():
+            sim = Simulation(invincible_state(), seed=0, enemy_count=count)
+            for _ in range(ticks):
+                sim.step()
+
+        setup = best_time(lambda: Simulation(invincible_state(), seed=0, enemy_count=count))
+        elapsed = best_time(run) - setup
+        results[f"simulation.ticks_per_s[{count}]"] = metric(ticks / elapsed, "ticks/s", "higher")
+
+
+def bench_vecenv(results, ticks=200, repeat=3):
+    for count in VECENV_SIZES:
+        rate = max(vecenv_benchmark(count, ticks) for _ in range(repeat))
+        results[f"vecenv.game_ticks_per_s[{count}]"] = metric(rate, "ticks/s", "higher")
+
+
+def bench_render(results, canvas, sprites=None, frames=200, repeat=3):
+    for count in ENTITY_COUNTS:
+        sim = Simulation(invincible_state(), seed=0, enemy_count=count)
+        scene = Scene(canvas, sprites)
+        track = TrackView(TrackRing(sim.track), scene)
+        cars = [Car(sim.player, "RoyalBlue3", "RoyalBlue4", scene)]
+        cars += [Car(model, "Red", "Dark Red", scene) for model in sim.enemies]
+
+        best = float("inf")
+        for _ in range(repeat):
+            elapsed = 0.0
+            for frame in range(frames):
+                sim.step()
+                start = time.perf_counter()
+                track.update(sim.road)
+                for car in cars:
+                    car.print_car()
+                elapsed += time.perf_counter() - start
+            best = min(best, elapsed)
+        for car in cars:
+            car.delete_car()
+        track.delete()
+        results[f"render.ms_per_frame[{count}]"] = metric(best / frames * 1000, "ms", "lower")
+
+
+def bench_track(results, canvas, frames=2000, speed=50):
+    for distance in TRACK_DISTANCES:
+        track = TrackView(TrackRing(Track(0)), Scene(canvas))
+
+        def run():
+            for frame in range(frames):
+                track.update(distance + frame * speed)
+
+        results[f"track.ms_per_frame[{distance}]"] = metric(best_time(run) / frames * 1000, "ms", "lower")
+        track.delete()
+
+
+def bench_particles(results, canvas, frames=600):
+    """
+    Keeps count particles alive, each living half a second to a second and a half, so rows
+    and canvas items are recycled all the time, and times updating and drawing them.
+    """
+    for count in PARTICLE_COUNTS:
+        particles = ParticleSystem(seed=0)
+        view = ParticleView(particles, Scene(canvas))
+        times = []
+        for frame in range(frames):
+            start = time.perf_counter()
+            particles.emit(count - len(particles), 500, 350, speed=(20, 300), life=(0.5, 1.5))
+            particles.update(1 / 60)
+            view.draw()
+            times.append((time.perf_counter() - start) * 1000)
+        view.delete()
+        steady = sorted(times[frames // 4:])  # After the first particles started dying
+        results[f"particles.ms_per_frame[{count}]"] = metric(sum(steady) / len(steady), "ms", "lower")
+        results[f"particles.p99_ms[{count}]"] = metric(percentile(steady, 0.99), "ms", "lower")
+
+
+def bench_leaderboard(results, directory, submissions=200):
+    rng = random.Random(0)
+    for size in LEADERBOARD_SIZES:
+        filename = os.path.join(directory, f"leaderboard_{size}.json")
+        rank_filename = os.path.join(directory, f"ranks_{size}.bin")
+        entries = [{"name": f"PLAYER{i}", "score": rng.randint(0, 10 ** 6)} for i in range(size)]
+        names = [f"PLAYER{rng.randrange(size * 2)}" for _ in range(submissions)]
+        scores = [rng.randint(0, 10 ** 6) for _ in range(submissions)]
+
+        def run():
+            file = open(filename, "w")
+            json.dump(entries, file)
+            file.close()
+            if os.path.exists(rank_filename):
+                os.remove(rank_filename)  # Every run starts from the same rank history
+            leaderboard = Leaderboard(filename, rank_filename=rank_filename)
+            start = time.perf_counter()
+            for name, score in zip(names, scores):
+                leaderboard.add_score(name, score)
+            leaderboard.close()  # Includes writing the file once
+            return time.perf_counter() - start
+
+        elapsed = min(run() for _ in range(3))
+        results[f"leaderboard.add_score_per_s[{size}]"] = metric(submissions / elapsed, "ops/s", "higher")
+
+
+def bench_rank(results, queries=20000):
+    rng = random.Random(0)
+    for size in RANK_SIZES:
+        index = RankIndex()
+        for _ in range(size // 1000):  # Spread the results over the score range in bulk
+            index.add(rng.randint(0, 2000000), 1000)
+        scores = [rng.randint(0, 2000000) for _ in range(queries)]
+
+        def record():
+            for score in scores:
+                index.add(score)
+                index.rank(score)
+
+        results[f"rank_index.record_and_rank_per_s[{size}]"] = metric(queries / best_time(record), "ops/s", "higher")
+
+
+def bench_save(results, directory, repeat=50):
+    """
+    The real save paths: save_game's settings file, and the world file autosaves and the
+    pause menu write, for worlds of several sizes.
+    """
+    filename = os.path.join(directory, SAVE)
+    game_state = default_game_state.copy()
+
+    def save():
+        for _ in range(repeat):
+            write_save(game_state, DEFAULT_KEY_BINDINGS, filename, DEFAULT_CHEAT_CODES)
+
+    def load():
+        for _ in range(repeat):
+            read_save(default_game_state.copy(), DEFAULT_KEY_BINDINGS.copy(), filename, DEFAULT_CHEAT_CODES.copy())
+
+    results["save_game.ms"] = metric(best_time(save, 5) / repeat * 1000, "ms", "lower")
+    results["load_game.ms"] = metric(best_time(load, 5) / repeat * 1000, "ms", "lower")
+
+    for size in SAVE_SIZES:
+        filename = os.path.join(directory, f"world_{size}.sav")
+        sim = Simulation(invincible_state(), seed=0, enemy_count=size)
+        for _ in range(100):
+            sim.step()
+
+        def save_world():
+            for _ in range(repeat):
+                write_world(sim.snapshot(), filename)
+
+        def load_world():
+            for _ in range(repeat):
+                read_world(filename)
+
+        results[f"save_world.ms[{size}]"] = metric(best_time(save_world, 5) / repeat * 1000, "ms", "lower")
+        results[f"load_world.ms[{size}]"] = metric(best_time(load_world, 5) / repeat * 1000, "ms", "lower")
+
+
+def bench_quick_save(results, repeat=100):
+    for count in ENTITY_COUNTS:
+        sim = Simulation(invincible_state(), seed=0, enemy_count=count)
+        for _ in range(100):
+            sim.step()
+        snapshot = sim.snapshot()
+
+        def save():
+            for _ in range(repeat):
+                sim.snapshot()
+
+        def load():
+            for _ in range(repeat):
+                sim.restore(snapshot)
+
+        results[f"quick_save.ms[{count}]"] = metric(best_time(save) / repeat * 1000, "ms", "lower")
+        results[f"quick_load.ms[{count}]"] = metric(best_time(load) / repeat * 1000, "ms", "lower")
+
+
+def bench_cold_start(results):
+    """
+    Times launching game_solution.py until the main menu is up. Needs a display or xvfb-run.
+    """
+    command = [sys.executable, "game_solution.py"]
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        if not shutil.which("xvfb-run"):
+            print("cold start skipped: no display and no xvfb-run")
+            return
+        command = ["xvfb-run", "-a"] + command
+    env = dict(os.environ, PSR_EXIT_AFTER_MENU="1", PSR_PROFILE_STARTUP="1")
+    folder = os.path.dirname(os.path.abspath(__file__))
+    elapsed = best_time(lambda: subprocess.run(command, cwd=folder, env=env, check=True,
+                                               stdout=subprocess.DEVNULL), repeat=3)
+    results["cold_start.ms"] = metric(elapsed * 1000, "ms", "lower")
+
+    # Phase breakdown of the last run, written by game_solution.py
+    profile = os.path.join(folder, "startup_profile.json")
+    if os.path.exists(profile):
+        file = open(profile, "r")
+        phases = json.load(file)["phases_ms"]
+        file.close()
+        os.remove(profile)
+        for phase, milliseconds in phases.items():
+            results[f"cold_start.phase_ms[{phase}]"] = metric(milliseconds, "ms", "lower")
+
+
+def run_all(cold_start=True):
+    results = {}
+    canvas, canvas_kind, root = make_canvas()
+    bench_simulation(results)
+    bench_vecenv(results)
+    bench_render(results, canvas, SpriteCache(root) if root else None)
+    bench_track(results, canvas)
+    bench_particles(results, canvas)
+    if root:
+        root.destroy()
+    directory = tempfile.mkdtemp(prefix="psr_bench_")
+    try:
+        bench_leaderboard(results, directory)
+        bench_rank(results)
+        bench_save(results, directory)
+        bench_quick_save(results)
+    finally:
+        shutil.rmtree(directory)
+    if cold_start:
+        bench_cold_start(results)
+    meta = {"canvas": canvas_kind, "python": platform.python_version(), "machine": platform.machine()}
+    return {"meta": meta, "results": results}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Returns (name, baseline value, new value, relative change) for every metric that got
+    worse by more than threshold.
+    """
+    regressions = []
+    for name, old in baseline["results"].items():
+        new = results["results"].get(name)
+        if new is None or not old["value"]:
+            continue
+        change = (new["value"] - old["value"]) / old["value"]
+        worse = -change if old["better"] == "higher" else change
+        if worse > threshold:
+            regressions.append((name, old["value"], new["value"], change))
+    return regressions
+
+
+def write_json(data, filename):
+    file = open(filename, "w")
+    json.dump(data, file, indent=2)
+    file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths.")
+    parser.add_argument("--output", default=RESULTS)
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write the results to {BASELINE}")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--no-cold-start", action="store_true")
+    args = parser.parse_args()
+
+    data = run_all(cold_start=not args.no_cold_start)
+    for name, result in data["results"].items():
+        print(f"{name:<40} {result['value']:>14,.3f} {result['unit']}")
+    write_json(data, args.output)
+    if args.save_baseline:
+        write_json(data, BASELINE)
+
+    if args.compare:
+        file = open(args.compare, "r")
+        baseline = json.load(file)
+        file.close()
+        regressions = compare(data, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:,.3f} -> {new:,.3f} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,95 @@
+"""
+Cheat code matching.
+
+Codes are data: a dict from the letters to type to the name of the action they
+trigger, e.g. {"GOD": "invincibility"}, kept in the save file so new ones need no
+code changes. Callbacks are registered for action names. The codes are compiled
+into an Aho-Corasick automaton with every transition filled in, so each keystroke
+is one table lookup however many codes there are and however long they are.
+"""
+
+DEFAULT_CHEAT_CODES = {
+    "GOD": "invincibility",
+    "DRK": "mirrored_controls",
+    "SCR": "custom_score",
+}
+
+
+class CheatCodes:
+    """
+    Matches typed keys against the cheat codes and calls the registered callback
+    when one is completed. Matching starts over after each completed code.
+    """
+
+    def __init__(self, codes=None):
+        self.callbacks = {}  # Action -> function without arguments
+        self.state = 0
+        self.set_codes(DEFAULT_CHEAT_CODES if codes is None else codes)
+
+    def set_codes(self, codes):
+        """
+        Compiles codes, a dict of code -> action. Call it again whenever they change.
+        """
+        self.codes = dict(codes)
+        symbols = sorted({symbol for code in self.codes for symbol in code.upper()})
+        goto = [{}]  # Trie, state -> {symbol: state}
+        output = [None]  # State -> action of the code that ends there
+        for code, action in self.codes.items():
+            if not code:
+                continue
+            state = 0
+            for symbol in code.upper():
+                if symbol not in goto[state]:
+                    goto.append({})
+                    output.append(None)
+                    goto[state][symbol] = len(goto) - 1
+                state = goto[state][symbol]
+            output[state] = action
+
+        # Breadth first, so a state's failure link (its longest proper suffix that is
+        # also in the trie) is complete before its children need it.
+        fail = [0] * len(goto)
+        transitions = [dict.fromkeys(symbols, 0) for _ in goto]
+        queue = []
+        for symbol, child in goto[0].items():
+            transitions[0][symbol] = child
+            queue.append(child)
+        for state in queue:
+            if output[state] is None:
+                output[state] = output[fail[state]]  # A shorter code ends inside this one
+            for symbol in symbols:
+                child = goto[state].get(symbol)
+                if child is None:
+                    transitions[state][symbol] = transitions[fail[state]][symbol]
+                else:
+                    fail[child] = transitions[fail[state]][symbol]
+                    transitions[state][symbol] = child
+                    queue.append(child)
+        self.transitions = transitions
+        self.output = output
+        self.state = 0
+
+    def register(self, action, callback):
+        """
+        Calls callback when a code for action is typed, replacing any earlier one.
+        """
+        self.callbacks[action] = callback
+
+    def feed(self, keysym):
+        """
+        Advances the matcher by one key. Returns the action triggered, if any.
+        """
+        self.state = self.transitions[self.state].get(keysym.upper(), 0)
+        action = self.output[self.state]
+        if action is None:
+            return None
+        self.state = 0
+        callback = self.callbacks.get(action)
+        if callback:
+            callback()
+        else:
+            print(f"cheat code for {action} has nothing registered")
+        return action
+
+    def reset(self):
+        self.state = 0
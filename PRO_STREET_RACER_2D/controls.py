@@ -0,0 +1,122 @@
+"""
+Keyboard input dispatcher.
+
+The root window has one <KeyPress>, one <KeyRelease> and one <FocusOut> binding,
+made once at startup. A key event's keysym is looked up in a table built from the
+key bindings to find its game action, then offered to a stack of input contexts
+(menu, playing, paused, boss key, rebind, text entry) from the top down. The first
+context that handles it, or that is modal, stops it going further. Screens push and
+pop contexts instead of binding and unbinding Tk events.
+"""
+
+DEFAULT_KEY_BINDINGS = {
+    "move_left": "<Left>",
+    "move_right": "<Right>",
+    "pause_game": "<Escape>",
+    "boss_key": "<b>",
+    "quick_save": "<F5>",
+    "quick_load": "<F9>",
+}
+
+
+def binding_keysym(binding):
+    """
+    The keysym of a key binding such as "<Left>", "<KeyPress-a>" or "a".
+    """
+    keysym = binding.strip("<>")
+    for prefix in ("KeyPress-", "Key-"):
+        if keysym.startswith(prefix):
+            return keysym[len(prefix):]
+    return keysym
+
+
+class InputContext:
+    """
+    What one screen does with the keyboard. actions maps a game action to
+    (on_press, on_release) and keys does the same for fixed keysyms, either handler may
+    be None. on_key gets every other key press. on_suspend is called when the context
+    stops getting input (covered, removed or focus lost) so it can let go of held keys.
+    A modal context keeps all keys from the contexts below it.
+    """
+
+    def __init__(self, name, actions=None, keys=None, on_key=None, on_suspend=None, modal=True):
+        self.name = name
+        self.actions = actions or {}
+        self.keys = keys or {}
+        self.on_key = on_key
+        self.on_suspend = on_suspend
+        self.modal = modal
+
+    def __repr__(self):
+        return f"InputContext({self.name!r})"
+
+    def handle(self, action, event, pressed):
+        """
+        Runs the handler for the event, returns True if the context had one.
+        """
+        handlers = self.actions.get(action)
+        if handlers is None:
+            handlers = self.keys.get(event.keysym)
+        if handlers is not None:
+            handler = handlers[0] if pressed else handlers[1]
+            if handler:
+                handler(event)
+            return True
+        if pressed and self.on_key:
+            self.on_key(event)
+            return True
+        return False
+
+    def suspend(self):
+        if self.on_suspend:
+            self.on_suspend()
+
+
+class InputDispatcher:
+    """
+    Routes the root window's key events through the context stack.
+    """
+
+    def __init__(self, root, key_bindings):
+        self.root = root
+        self.stack = []
+        self.actions = {}  # Keysym -> game action
+        self.set_bindings(key_bindings)
+        root.bind("<KeyPress>", self.on_press)
+        root.bind("<KeyRelease>", self.on_release)
+        root.bind("<FocusOut>", self.on_focus_out)
+
+    def set_bindings(self, key_bindings):
+        """
+        Rebuilds the keysym table, call it whenever key_bindings changes.
+        """
+        self.actions = {binding_keysym(binding): action for action, binding in key_bindings.items()}
+
+    def push(self, context):
+        if self.stack:
+            self.stack[-1].suspend()
+        self.stack.append(context)
+
+    def remove(self, context):
+        """
+        Takes context off the stack wherever it is. Does nothing if it is not there.
+        """
+        if context in self.stack:
+            self.stack.remove(context)
+            context.suspend()
+
+    def dispatch(self, event, pressed):
+        action = self.actions.get(event.keysym)
+        for context in reversed(self.stack):
+            if context.handle(action, event, pressed) or context.modal:
+                return
+
+    def on_press(self, event):
+        self.dispatch(event, True)
+
+    def on_release(self, event):
+        self.dispatch(event, False)
+
+    def on_focus_out(self, event):
+        for context in self.stack:
+            context.suspend()
@@ -0,0 +1,30 @@
+"""
+File helpers shared by the save file and the leaderboard.
+"""
+import os
+import sys
+
+
+def little_endian(values):
+    """
+    Byte-swaps an array in place on big-endian machines, so files are portable.
+    """
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def write_atomic(filename, data):
+    """
+    Writes data (str or bytes) to a temporary file next to filename and renames it over
+    filename, so a crash mid-write never leaves a half-written file behind.
+    """
+    temp = filename + ".tmp"
+    file = open(temp, "wb" if isinstance(data, bytes) else "w")
+    try:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    finally:
+        file.close()
+    os.replace(temp, filename)
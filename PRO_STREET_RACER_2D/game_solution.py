@@ -1,144 +1,163 @@
-import random
 import tkinter as tk
 from tkinter import Canvas, BOTH, Button, messagebox
 from functools import partial
-import json
 import os
-
-SAVE = "save.json"
-
-key_bindings = {
-    "move_left": "<Left>",
-    "move_right": "<Right>",
-    "pause_game": "<Escape>",
-    "boss_key": "<b>",
-}
-
-default_game_state = {
-    "score": 0,
-    "speed": 10,
-    "player_car_x": 350,
-    "player_car_y": 600,
-    "enemy_car_x": 650,
-    "enemy_car_y": 100,
-    "paused": False,
-    "game_over": False,
-    "invincibility_mode": False,
-    "mirrored_controls": False,
-    "car_colour_1": "RoyalBlue3",
-    "car_colour_2": "RoyalBlue4",
-}
+import random
+import time
+from simulation import Simulation, default_game_state
+from leaderboard import Leaderboard
+from savegame import (SAVE, WORLD, QUICKSAVE, SaveVersionError, SaveWriter, read_save, write_save, read_world,
+                      write_world, remove_file)
+from scene import CallCounter, Scene, SpriteCache, TextSprite, TrackView, ParticleView, Car, interpolate
+from timestep import FixedTimestep
+from track import VIEW_LENGTH, TrackRing
+from particles import STREAK_Y, Effects, ParticleSystem
+from profiler import FrameProfiler, ProfilerHud, StartupTimer
+from replay import ReplayRecorder, new_replay_path
+from assets import AssetCache
+from scheduler import Scheduler
+from controls import DEFAULT_KEY_BINDINGS, InputContext, InputDispatcher
+from cheats import CheatCodes, DEFAULT_CHEAT_CODES
+from metrics import GameMetrics, MetricsServer, Registry
+
+ENEMY_COUNT = 1  # Enemy cars on the road at once
+SHOW_TCL_CALLS = bool(os.environ.get("PSR_SHOW_TCL_CALLS"))  # Shows how many canvas calls each frame makes
+PROFILE_FRAMES = bool(os.environ.get("PSR_PROFILE_FRAMES"))  # Times each phase of the game loop, F3 toggles the overlay
+PROFILE_FILE = "frame_profile.json"  # Where the frame timings are written on exit
+AUTOSAVE_TICKS = 300  # Game ticks between autosaves of the whole world, 30 seconds
+PROFILE_STARTUP = bool(os.environ.get("PSR_PROFILE_STARTUP"))  # Prints where the cold start time goes
+STARTUP_FILE = "startup_profile.json"  # Where the startup phases are written when profiling it
+MAX_EFFECTS_DT = 0.1  # Longest step particles take, so they do not jump after a stall
+METRICS_PORT = int(os.environ.get("PSR_METRICS_PORT", 0))  # Serves live metrics on localhost, see metrics.py
+
+key_bindings = DEFAULT_KEY_BINDINGS.copy()
 
 game_state = default_game_state.copy()
+cheat_code_data = DEFAULT_CHEAT_CODES.copy()  # Code -> action, see cheats.py
+saved_world = None  # Snapshot of the unfinished game that START GAME carries on from
+quick_save_world = None
+save_writer = SaveWriter()  # Writes save files in the background
+particles = ParticleSystem()  # Crash, smoke and speed effects, reused by every game
 
 
 def save_game():
     """"
     Saves current game state and key bindings
     """
-    data = {
-        "game_state": game_state,
-        "key_bindings": key_bindings
-    }
-    file = open(SAVE, "w")
-    file.write(json.dumps(data))
-    file.close()
-    print("Save has been done")
+    save_writer.submit(SAVE, write_save, game_state.copy(), key_bindings.copy(), SAVE, cheat_code_data.copy())
+    print("Saving...")
 
 
 def load_game():
     """"
-    Loads current game state and key bindings
-    """
-    global game_state, key_bindings
-    if os.path.exists(SAVE):
-        file = open(SAVE, "r")
-        data = json.loads(file.read())
-        file.close()
-        if "game_state" in data:
-            game_state.update(data["game_state"])
-        if "key_bindings" in data:
-            key_bindings.update(data["key_bindings"])
-    else:
-        print("Save file is not found")
+    Loads current game state, key bindings and the unfinished game's world
+    """
+    global saved_world
+    try:
+        if not read_save(game_state, key_bindings, SAVE, cheat_code_data):
+            print("Save file is not found")
+    except SaveVersionError as error:
+        print(f"{error}, starting with the default settings")
+    saved_world = read_world(WORLD)
 
 
 def open_settings():
     """
     Opens the settings menu.
     """
-    create_settings_frame()  # Creates settings frame with key bindings
     hide_frame(main_menu_frame)
-    show_frame(settings_frame)
+    show_frame(settings_frame)  # Builds the key-binding rows the first time
+    update_settings_frame()
+
+
+def close_settings():
+    """
+    Leaves the settings menu, dropping a rebind still waiting for its key.
+    """
+    cancel_rebind()
+    show_frame(main_menu_frame)
 
 
 REBIND_LABEL = None
+rebind_context = None
 
 
-def rebind_action(action, key_label_var):
+def cancel_rebind():
     """
-    Rebinds a key to a specified game action.
+    Stops waiting for a key to rebind, if a rebind is waiting.
     """
     global REBIND_LABEL
+    dispatcher.remove(rebind_context)
     if REBIND_LABEL:
         REBIND_LABEL.destroy()
+        REBIND_LABEL = None
+
+
+def rebind_action(action, key_label_var):
+    """
+    Rebinds a key to a specified game action.
+    """
+    global REBIND_LABEL, rebind_context
+    cancel_rebind()
     REBIND_LABEL = tk.Label(settings_frame, text=f"Press a new key for {action}")
     REBIND_LABEL.pack()
 
     def on_key_press(event):
-        global REBIND_LABEL
-        key_bindings[action] = event.keysym  # Update the key binding
-        temp = event.keysym
-        if temp == "Left":
-            key_bindings[action] = "<Left>"
-        if temp == "Right":
-            key_bindings[action] = "<Right>"
-        if temp == "Up":
-            key_bindings[action] = "<Up>"
-        if temp == "Down":
-            key_bindings[action] = "<Down>"
+        key_bindings[action] = f"<{event.keysym}>"  # Update the key binding
+        dispatcher.set_bindings(key_bindings)
         key_label_var.set(event.keysym)
-        root.unbind("<KeyPress>")
-        if REBIND_LABEL:
-            REBIND_LABEL.destroy()
-            REBIND_LABEL = None
+        cancel_rebind()
+
+    rebind_context = InputContext("rebind", on_key=on_key_press)
+    dispatcher.push(rebind_context)
+
 
-    root.bind("<KeyPress>", on_key_press)
+settings_key_vars = {}  # Action -> StringVar shown next to it in settings
 
 
 def create_settings_frame():
     """
     Creates the settings frame, generates key-binding settings
     """
-    for widget in settings_frame.winfo_children():
-        widget.destroy()
-
-    tk.Label(settings_frame, text="Settings", font=("PIXY", 40)).pack(pady=20)
+    tk.Label(settings_frame, text="Settings", font=assets.font("PIXY", 40)).pack(pady=20)
 
     for action, key in key_bindings.items():
         frame = tk.Frame(settings_frame)
         frame.pack(pady=5, padx=10, fill="x")
 
-        action_label = tk.Label(frame, text=action, font=("PIXY", 22), anchor="w", width=20)
+        action_label = tk.Label(frame, text=action, font=assets.font("PIXY", 22), anchor="w", width=20)
         action_label.pack(side="left", padx=10)
 
         key_label_var = tk.StringVar(value=key)
-        key_label = tk.Label(frame, textvariable=key_label_var, font=("PIXY", 22), anchor="center", width=15)
+        settings_key_vars[action] = key_label_var
+        key_label = tk.Label(frame, textvariable=key_label_var, font=assets.font("PIXY", 22), anchor="center", width=15)
         key_label.pack(side="left", padx=10)
 
-        rebind_button = tk.Button(frame, text="Rebind", font=("PIXY", 22),
+        rebind_button = tk.Button(frame, text="Rebind", font=assets.font("PIXY", 22),
                                   height=2, width=5, bg="#ff422b", fg="#1f100e",
                                   command=lambda action=action, var=key_label_var: rebind_action(action, var))
         rebind_button.pack(side="left", padx=10)
 
-    tk.Button(settings_frame, text="Menu", height=2, width=9, font=("PIXY", 22), fg="#1f100e", bg="#ff422b",
-              command=lambda: show_frame(main_menu_frame)).place(x=500, y=660, anchor="center")
+    tk.Button(settings_frame, text="Menu", height=2, width=9, font=assets.font("PIXY", 22), fg="#1f100e", bg="#ff422b",
+              command=close_settings).place(x=500, y=660, anchor="center")
+
+
+def update_settings_frame():
+    """
+    Shows the current key bindings in the existing settings widgets.
+    """
+    for action, key_label_var in settings_key_vars.items():
+        key_label_var.set(key_bindings[action])
 
 
 def show_frame(frame):
     """
-    Displays the specified frame in the application.
+    Displays the specified frame in the application, building its widgets on first use.
     """
+    build = frame_builders.get(frame)
+    if build:
+        del frame_builders[frame]
+        build()
     for f in (main_menu_frame, settings_frame, tutorial_frame, leaderboard_frame, customisation_frame):
         f.pack_forget()
     frame.pack(fill="both", expand=True)
@@ -153,59 +172,98 @@ def hide_frame(frame):
     frame.pack_forget()
 
 
+def short_count(count):
+    """
+    Formats a count for display, e.g. 2.1M or 48K.
+    """
+    if count >= 1000000:
+        return f"{count / 1000000:.1f}M"
+    if count >= 10000:
+        return f"{count // 1000}K"
+    return f"{count:,}"
+
+
+def dump_frame_profile():
+    """
+    Writes the frame profiler's timings to PROFILE_FILE, if profiling is on.
+    """
+    if frame_profiler and frame_profiler.count:
+        frame_profiler.dump(PROFILE_FILE)
+        print(f"Frame profile written to {PROFILE_FILE}")
+
+
 def exit_game():
     """
     Exits the game after prompting the user for confirmation, saves game state before closing.
     """
     if messagebox.askokcancel("Exit Game", "Are you sure you want to exit?"):
         save_game()
+        save_writer.close()
+        leaderboard.close()
+        dump_frame_profile()
         root.destroy()
 
 
+frame_profiler = FrameProfiler() if PROFILE_FRAMES else None
+startup = StartupTimer()
+
+
 root = tk.Tk()
 root.title("PRO STREET RACER 2D")
 root.geometry("1000x700+100+100")
+startup.lap("tk init")
+scheduler = Scheduler(root)  # Runs every timer, see scheduler.py
+assets = AssetCache(root, scheduler)  # Shared images and fonts
+sprite_cache = SpriteCache(root)  # Car images, shared by every game and the car preview
+assets.register_font("PIXY.ttf")
+startup.lap("font")
 load_game()
-root.protocol("WM_DELETE_WINDOW", lambda: [save_game(), root.destroy()])
+startup.lap("load_game")
+dispatcher = InputDispatcher(root, key_bindings)  # The only key bindings, see controls.py
+dispatcher.push(InputContext("menu"))
+root.protocol("WM_DELETE_WINDOW", lambda: [save_game(), save_writer.close(), leaderboard.close(), dump_frame_profile(), root.destroy()])
 
 """
 This module handles main menu.
 """
-main_menu_bg = tk.PhotoImage(file="main_menu.png")
+main_menu_bg = assets.image("main_menu.png")
+startup.lap("image decode")
 main_menu_frame = tk.Frame(root)
 
 main_menu_bg_label = tk.Label(main_menu_frame, image=main_menu_bg)
 main_menu_bg_label.place(x=0, y=0)
+menu_font = assets.font("PIXY", 28)
 
-tk.Button(main_menu_frame, text="START GAME", bg="#ff422b", fg="#1f100e", height=1, width=14, font=("PIXY", 28),
+tk.Button(main_menu_frame, text="START GAME", bg="#ff422b", fg="#1f100e", height=1, width=14, font=menu_font,
           command=lambda: start_game(root)).place(x=220,
                                                   y=120,
                                                   anchor="center")
 
 tk.Button(main_menu_frame, text="CUSTOMISE CAR", bg="#ff422b", fg="#1f100e", height=1, width=14,
-          font=("PIXY", 28), command=lambda: show_frame(customisation_frame)).place(x=220,
-                                                                                    y=190,
-                                                                                    anchor="center")
+          font=menu_font, command=lambda: show_frame(customisation_frame)).place(x=220,
+                                                                                 y=190,
+                                                                                 anchor="center")
 
-tk.Button(main_menu_frame, text="LEADERBOARD", bg="#ff422b", fg="#1f100e", height=1, width=14, font=("PIXY", 28),
+tk.Button(main_menu_frame, text="LEADERBOARD", bg="#ff422b", fg="#1f100e", height=1, width=14, font=menu_font,
           command=lambda: [update_leaderboard_display(), show_frame(leaderboard_frame)]).place(x=220,
                                                                                                y=260,
                                                                                                anchor="center")
 
-tk.Button(main_menu_frame, text="SETTINGS", bg="#ff422b", fg="#1f100e", height=1, width=14, font=("PIXY", 28),
+tk.Button(main_menu_frame, text="SETTINGS", bg="#ff422b", fg="#1f100e", height=1, width=14, font=menu_font,
           command=lambda: open_settings()).place(x=220,
                                                  y=330,
                                                  anchor="center")
 
-tk.Button(main_menu_frame, text="TUTORIAL", bg="#ff422b", fg="#1f100e", height=1, width=14, font=("PIXY", 28),
+tk.Button(main_menu_frame, text="TUTORIAL", bg="#ff422b", fg="#1f100e", height=1, width=14, font=menu_font,
           command=lambda: show_frame(tutorial_frame)).place(x=220,
                                                             y=400,
                                                             anchor="center")
 
 tk.Button(main_menu_frame, text="EXIT", bg="#ff422b", fg="#1f100e", height=1, width=14,
-          font=("PIXY", 28), command=exit_game).place(x=220,
-                                                      y=470,
-                                                      anchor="center")
+          font=menu_font, command=exit_game).place(x=220,
+                                                   y=470,
+                                                   anchor="center")
+startup.lap("main menu build")
 
 settings_frame = tk.Frame(root)
 
@@ -213,44 +271,58 @@ settings_frame = tk.Frame(root)
 Module for customisation frame
 """
 customisation_frame = tk.Frame(root)
-preview_frame = tk.Frame(customisation_frame, width=500, height=500, bg="white")
-preview_frame.pack(side="left", fill="both", expand=True)
-
-controls_frame = tk.Frame(customisation_frame, width=500, height=500, bg="lightgray")
-controls_frame.pack(side="right", fill="both", expand=True)
+preview_canvas = None
+preview_image = None
 
 car_primary_colour = game_state["car_colour_1"]
 car_secondary_colour = game_state["car_colour_2"]
 
-preview_canvas = tk.Canvas(preview_frame, width=400, height=400, bg="white")
-preview_canvas.place(x=50, y=50)
-
 
-def update_car_preview():
+def create_customisation_frame():
     """
-    Updates the car preview in the customization menu.
-    Draws the player's car on the preview canvas based on the selected colors.
+    Creates the car preview and the colour buttons.
     """
-    preview_canvas.delete("preview")
-    x, y = 200, 200
+    global preview_canvas
+    preview_frame = tk.Frame(customisation_frame, width=500, height=500, bg="white")
+    preview_frame.pack(side="left", fill="both", expand=True)
 
-    preview_canvas.create_rectangle(x - 50, y - 75, x + 50, y + 75, outline=car_primary_colour,
-                                    fill=car_primary_colour, tags="preview")
+    controls_frame = tk.Frame(customisation_frame, width=500, height=500, bg="lightgray")
+    controls_frame.pack(side="right", fill="both", expand=True)
 
-    preview_canvas.create_rectangle(x - 40, y - 30, x + 40, y + 60, outline=car_secondary_colour,
-                                    fill=car_secondary_colour, tags="preview")
+    preview_canvas = tk.Canvas(preview_frame, width=400, height=400, bg="white")
+    preview_canvas.place(x=50, y=50)
+    update_car_preview()
+
+    tk.Label(controls_frame, text="Customise Your Car", font=assets.font("PIXY", 32), bg="lightgray").pack(pady=20)
+
+    # Primary colour buttons
+    tk.Label(controls_frame, text="Primary Colour", font=assets.font("PIXY", 22), bg="lightgray").pack(pady=5)
 
-    preview_canvas.create_rectangle(x - 65, y - 65, x - 50, y - 20, fill="black", tags="preview")
-    preview_canvas.create_rectangle(x + 65, y - 65, x + 50, y - 20, fill="black", tags="preview")
-    preview_canvas.create_rectangle(x - 65, y + 65, x - 50, y + 20, fill="black", tags="preview")
-    preview_canvas.create_rectangle(x + 65, y + 65, x + 50, y + 20, fill="black", tags="preview")
-    preview_canvas.create_rectangle(x - 20, y - 85, x - 40, y - 75, fill="gold", outline="gold", tags="preview")
-    preview_canvas.create_rectangle(x + 20, y - 85, x + 40, y - 75, fill="gold", outline="gold", tags="preview")
+    for colour in primary_colours:
+        tk.Button(controls_frame, text=colour, bg=colour, width=10,
+                  command=lambda c=colour: set_primary_colour(c)).pack(pady=2)
 
+    # Secondary colour buttons
+    tk.Label(controls_frame, text="Secondary Colour", font=assets.font("PIXY", 22), bg="lightgray").pack(pady=5)
 
-update_car_preview()
+    for colour in secondary_colours:
+        tk.Button(controls_frame, text=colour, bg=colour, width=10,
+                  command=lambda c=colour: set_secondary_colour(c)).pack(pady=2)
 
-tk.Label(controls_frame, text="Customise Your Car", font=("PIXY", 32), bg="lightgray").pack(pady=20)
+    tk.Button(controls_frame, text="Save and Back", command=save_customisation, font=assets.font("PIXY", 22),
+              bg="#ff422b", fg="#1f100e").pack(pady=5)
+
+
+def update_car_preview():
+    """
+    Updates the car preview in the customization menu.
+    Draws the player's car on the preview canvas based on the selected colors.
+    """
+    global preview_image
+    preview_canvas.delete("preview")
+    # Kept in a global so the image outlives the cache dropping it while it is shown.
+    preview_image = sprite_cache.car(car_primary_colour, car_secondary_colour, 0)
+    preview_canvas.create_image(200, 200, image=preview_image, tags="preview")
 
 
 def set_primary_colour(colour):
@@ -271,21 +343,8 @@ def set_secondary_colour(colour):
     update_car_preview()
 
 
-# Primary colour buttons
-tk.Label(controls_frame, text="Primary Colour", font=("PIXY", 22), bg="lightgray").pack(pady=5)
-
 primary_colours = ["Red", "Blue", "Green", "Yellow", "Orange", "Purple"]
-for colour in primary_colours:
-    tk.Button(controls_frame, text=colour, bg=colour, width=10, command=lambda c=colour: set_primary_colour(c)).pack(
-        pady=2)
-
-# Secondary colour buttons
-tk.Label(controls_frame, text="Secondary Colour", font=("PIXY", 22), bg="lightgray").pack(pady=5)
-
 secondary_colours = ["Cyan", "Magenta", "Brown", "Pink", "Gray", "Black"]
-for colour in secondary_colours:
-    tk.Button(controls_frame, text=colour, bg=colour, width=10, command=lambda c=colour: set_secondary_colour(c)).pack(
-        pady=2)
 
 
 # Save customization and return to main menu
@@ -300,9 +359,6 @@ def save_customisation():
     show_frame(main_menu_frame)
 
 
-tk.Button(controls_frame, text="Save and Back", command=save_customisation, font=("PIXY", 22),
-          bg="#ff422b", fg="#1f100e").pack(pady=5)
-
 """
 Module for tutorial frame
 """
@@ -321,6 +377,8 @@ Default Controls:
     • Move Right:    Press <Arrow Right> ️
     • Pause the Game: Press <Escape> ️
     • Boss Key:      Press <B> (Quickly hide the game)
+    • Quick Save:    Press <F5>
+    • Quick Load:    Press <F9>
 
 ---
 
@@ -330,21 +388,38 @@ Cheat Codes:
     • Set Custom Score: Type S C R
 
 """
-tk.Label(tutorial_frame, text="Tutorial", font=("PIXY", 40)).pack(pady=20)
-tk.Label(tutorial_frame, text=tutorial_text, fg="Black", font=("PIXY", 16), justify="left", padx=10, pady=10).pack()
-tk.Button(tutorial_frame, text="Menu", height=2, width=9, font=("PIXY", 22), fg="#1f100e", bg="#ff422b",
-          command=lambda: show_frame(main_menu_frame)).place(x=500, y=660, anchor="center")
+
+
+def create_tutorial_frame():
+    """
+    Creates the tutorial text and its menu button.
+    """
+    tk.Label(tutorial_frame, text="Tutorial", font=assets.font("PIXY", 40)).pack(pady=20)
+    tk.Label(tutorial_frame, text=tutorial_text, fg="Black", font=assets.font("PIXY", 16), justify="left", padx=10,
+             pady=10).pack()
+    tk.Button(tutorial_frame, text="Menu", height=2, width=9, font=assets.font("PIXY", 22), fg="#1f100e", bg="#ff422b",
+              command=lambda: show_frame(main_menu_frame)).place(x=500, y=660, anchor="center")
+
 
 """
 Module for leaderboard frame
 """
 leaderboard_frame = tk.Frame(root)
-tk.Label(leaderboard_frame, text="Leaderboard", font=("PIXY", 40)).pack(pady=20)
 leaderboard_displayed_data = []
-for i in range(1, 11):
-    label = tk.Label(leaderboard_frame, text="", font=("PIXY", 22), anchor="w")
-    label.pack(pady=2)
-    leaderboard_displayed_data.append(label)
+
+
+def create_leaderboard_frame():
+    """
+    Creates the title, the ten score labels and the menu button.
+    """
+    tk.Label(leaderboard_frame, text="Leaderboard", font=assets.font("PIXY", 40)).pack(pady=20)
+    for i in range(1, 11):
+        label = tk.Label(leaderboard_frame, text="", font=assets.font("PIXY", 22), anchor="w")
+        label.pack(pady=2)
+        leaderboard_displayed_data.append(label)
+    tk.Button(leaderboard_frame, text="Menu", height=2, width=9, font=assets.font("PIXY", 22), fg="#1f100e",
+              bg="#ff422b", command=lambda: show_frame(main_menu_frame)).pack(pady=10)
+    update_leaderboard_display()
 
 
 def update_leaderboard_display():
@@ -359,230 +434,30 @@ def update_leaderboard_display():
             label.config(text="")
 
 
-tk.Button(leaderboard_frame, text="Menu", height=2, width=9, font=("PIXY", 22), fg="#1f100e", bg="#ff422b",
-          command=lambda: show_frame(main_menu_frame)).pack(pady=10)
+# Screens other than the main menu are built the first time show_frame shows them.
+frame_builders = {
+    settings_frame: create_settings_frame,
+    customisation_frame: create_customisation_frame,
+    tutorial_frame: create_tutorial_frame,
+    leaderboard_frame: create_leaderboard_frame,
+}
 
+startup.lap("frame build")
 show_frame(main_menu_frame)
-
-
-class Leaderboard:
-    """
-    Manages the leaderboard, including loading, saving, and displaying top scores.
-    """
-
-    def __init__(self, filename="leaderboard.json"):
-        self.filename = filename
-        self.scores = self.load_leaderboard()
-
-    def load_leaderboard(self):
-        try:
-            file = open(self.filename, "r")
-            data = json.load(file)
-            file.close()
-            return data
-        except FileNotFoundError:
-            print(f"file {self.filename} not found")
-            return []
-        except json.JSONDecodeError:
-            print(f"file {self.filename} is not valid")
-            return []
-
-    def save_leaderboard(self):
-        file = open(self.filename, "w")
-        json.dump(self.scores, file)
-        file.close()
-
-    def add_score(self, name, score):
-        saved_name = None
-        for value in self.scores:
-            if value["name"] == name:
-                saved_name = value
-                break
-        if saved_name:
-            if score > saved_name["score"]:
-                saved_name["score"] = score
-        else:
-            self.scores.append({"name": name, "score": score})
-        # self.scores.append({"name": name, "score": score})
-        self.scores = sorted(self.scores, key=lambda x: x["score"], reverse=True)
-        self.scores = self.scores[:10]
-        self.save_leaderboard()
-
-    def display_leadeboard(self):
-        print("LEADERBOARD")
-        for i, value in enumerate(self.scores, 1):
-            print(f'{i}. {value["name"]} - {value["score"]}')
+startup.lap("show menu")
 
 
 leaderboard = Leaderboard()
+startup.lap("Leaderboard()")
 
-
-class Line:
-    """
-    Road lines in the game.
-    """
-    x = 0
-    y = 0
-    rec = 0
-
-    def __init__(self, x1, y1, canvas, speedprovider):
-        self.x = x1
-        self.y = y1
-        self.print_line(canvas)
-        self.speedprovider = speedprovider
-
-    def change_coord(self, canvas):
-        """
-        Cycles lines.
-        """
-        canvas.delete(self.rec)
-        self.y = (self.y + self.speedprovider.speed)
-        if self.y >= 700:
-            self.y -= 800
-        if self.y <= -100:
-            self.y += 800
-        self.print_line(canvas)
-
-    def print_line(self, canvas):
-        """
-        Draws lines on road.
-        """
-        self.rec = canvas.create_rectangle(self.x, self.y, self.x + 20, self.y + 100, fill="white", outline="white",
-                                           width=2)
-
-    # def upSpeed(self):
-    #     self.speedprovider.speed += 5
-    #     if self.speedprovider.speed > 30:
-    #         self.speedprovider.speed = 30
-    #
-    # def downSpeed(self):
-    #     self.speedprovider.speed -= 5
-    #     if self.speedprovider.speed < 0:
-    #         self.speedprovider.speed = -10
-
-    def get_speed(self):
-        return self.speedprovider.speed
-
-
-class SpeedProvider:
-    """
-    Provides the speed for game objects.
-    """
-    speed = game_state["speed"]
-
-
-class Car:
-    """
-    A car in the game.
-    """
-    x = 0
-    y = 0
-    direction = 0
-    rec1, rec2, rec3, rec4, rec5, rec6, rec7, rec8 = 0, 0, 0, 0, 0, 0, 0, 0
-
-    def __init__(self, x1, y1, colour1, colour2, direct, canvas, speedprovider):
-        self.x = x1
-        self.y = y1
-        self.speedprovider = speedprovider
-        self.col1 = colour1
-        self.col2 = colour2
-        self.direction = direct
-        self.print_car(canvas)
-
-    def delete_car(self, canvas):
-        if self.rec1 != 0:
-            canvas.delete(self.rec1, self.rec2, self.rec3, self.rec4, self.rec5, self.rec6, self.rec7, self.rec8)
-
-    def print_car(self, canvas):
-        """
-        Draws cars on canvas
-        """
-        self.delete_car(canvas)
-        self.rec1 = canvas.create_rectangle(
-            self.x - 50, self.y - 75, self.x + 50, self.y + 75, outline=self.col1, fill=self.col1, width=0)
-        roof = self.y - 30
-        if self.direction == 1:
-            roof = self.y - 60
-        self.rec2 = canvas.create_rectangle(
-            self.x - 40, roof, self.x + 40, roof + 90, outline=self.col2, fill=self.col2, width=0)
-
-        self.rec3 = canvas.create_rectangle(
-            self.x - 65, self.y - 65, self.x - 50, self.y - 20, outline="black", fill="black", width=0)
-
-        self.rec4 = canvas.create_rectangle(
-            self.x + 65, self.y - 65, self.x + 50, self.y - 20, outline="black", fill="black", width=0)
-
-        self.rec5 = canvas.create_rectangle(
-            self.x - 65, self.y + 65, self.x - 50, self.y + 20, outline="black", fill="black", width=0)
-
-        self.rec6 = canvas.create_rectangle(
-            self.x + 65, self.y + 65, self.x + 50, self.y + 20, outline="black", fill="black", width=0)
-
-        light = self.y - 85
-        if self.direction == 1:
-            light = self.y + 75
-        self.rec7 = canvas.create_rectangle(
-            self.x - 20, light, self.x - 40, light + 10, outline="gold", fill="gold", width=0)
-
-        self.rec8 = canvas.create_rectangle(
-            self.x + 20, light, self.x + 40, light + 10, outline="gold", fill="gold", width=0)
-
-    def change_colour(self, colour1, colour2, canvas):
-        self.col1 = colour1
-        self.col2 = colour2
-        canvas.delete(self.rec1, self.rec2)
-        self.rec1 = canvas.create_rectangle(
-            self.x - 50, self.y - 75, self.x + 50, self.y + 75, outline=self.col1, fill=self.col1, width=0)
-        self.rec2 = canvas.create_rectangle(
-            self.x - 40, self.y - 30, self.x + 40, self.y + 60, outline=self.col2, fill=self.col2, width=0)
-
-    def move_left(self, canvas, arg, mirrored=False):  # mirrored is a flag required to prevent infinite recursion.
-        """
-        Moves car left.
-        """
-        if game_state["mirrored_controls"] and not mirrored:
-            self.move_right(canvas, arg, mirrored=True)
-        else:
-            if self.x > 70:  # Restricts movement out of screen on the left side
-                self.x = (self.x - 20)
-                self.print_car(canvas)
-
-    def move_right(self, canvas, arg, mirrored=False):  # mirrored is a flag required to prevent infinite recursion.
-        """
-        Moves car right.
-        """
-        if game_state["mirrored_controls"] and not mirrored:
-            self.move_left(canvas, arg, mirrored=True)
-        else:
-            if self.x < 930:  # Restricts movement out of screen on the left side
-                self.x = (self.x + 20)
-                self.print_car(canvas)
-
-    def change_coord(self, speed, canvas):
-        """
-        Randomly places enemy car.
-        """
-        self.y = (self.y + speed)
-        if self.y >= 800:
-            self.y -= 900
-            self.x = random.randint(0 + 100, 1000 - 100)
-        self.print_car(canvas)
-
-    def __add__(self, other):
-        self_left = self.x - 50
-        self_right = self.x + 50
-        self_top = self.y - 75
-        self_bottom = self.y + 75
-
-        car2_left = other.x - 50
-        car2_right = other.x + 50
-        car2_top = other.y - 75
-        car2_bottom = other.y + 75
-
-        return not (self_right < car2_left or
-                    self_left > car2_right or
-                    self_bottom < car2_top or
-                    self_top > car2_bottom)
+game_metrics = None
+if METRICS_PORT:
+    game_metrics = GameMetrics(Registry(), scheduler, (SAVE, WORLD, QUICKSAVE))
+    leaderboard.on_write = game_metrics.leaderboard_write
+    save_writer.on_write = game_metrics.save_write
+    metrics_server = MetricsServer(game_metrics.registry, METRICS_PORT).start()
+    print(f"Metrics on http://127.0.0.1:{metrics_server.port}/metrics")
+    startup.lap("metrics server")
 
 
 def up(line, arg):
@@ -598,63 +473,41 @@ def down(line, arg):
 """
 This module handles cheat codes
 """
-key_sequence = []
-invincibility_activation_sequence = ["G", "O", "D"]
-mirrored_activation_sequence = ["D", "R", "K"]
-custom_score_activation_sequence = ["S", "C", "R"]
-
-
-def check_cheat_codes_sequences(arg, canvas, set_custom_score_callback):
-    """
-    Checks cheat codes sequences.
-    """
+cheat_codes = CheatCodes(cheat_code_data)  # Callbacks are registered by each game in start_game
 
-    global key_sequence
-    key_sequence.append(arg.keysym.upper())
-    if key_sequence[-len(invincibility_activation_sequence):] == invincibility_activation_sequence:
-        toggle_invincibility(canvas)
-        key_sequence.clear()
-    elif key_sequence[-len(mirrored_activation_sequence):] == mirrored_activation_sequence:
-        toggle_mirrored_controls(canvas)
-        key_sequence.clear()
-    elif key_sequence[-len(custom_score_activation_sequence):] == custom_score_activation_sequence:
-        set_custom_score_callback()
-        key_sequence.clear()
-    elif len(key_sequence) > max(len(invincibility_activation_sequence), len(mirrored_activation_sequence)):
-        key_sequence.pop(0)
 
-
-def toggle_invincibility(canvas):
+def toggle_invincibility(canvas, timers):
     """
     Toggles invincibility mode and shows a flashing message on the canvas.
     """
     game_state["invincibility_mode"] = not game_state["invincibility_mode"]
     if game_state["invincibility_mode"]:
         print("INVINCIBILITY ACTIVATED")
-        show_flashing_text("INVINCIBILITY \nACTIVATED", canvas)
+        show_flashing_text("INVINCIBILITY \nACTIVATED", canvas, timers)
     else:
         print("INVINCIBILITY DEACTIVATED")
-        show_flashing_text("INVINCIBILITY \nDEACTIVATED", canvas)
+        show_flashing_text("INVINCIBILITY \nDEACTIVATED", canvas, timers)
 
 
-def toggle_mirrored_controls(canvas):
+def toggle_mirrored_controls(canvas, timers):
     """
     Toggles mirrored controls mode and shows a flashing message on the canvas.
     """
     game_state["mirrored_controls"] = not game_state["mirrored_controls"]
     if game_state["mirrored_controls"]:
         print("mirrored \nCONTROLS \nACTIVATED")
-        show_flashing_text("mirrored \nCONTROLS \nACTIVATED", canvas)
+        show_flashing_text("mirrored \nCONTROLS \nACTIVATED", canvas, timers)
     else:
         print("mirrored CONTROLS \n DEACTIVATED")
-        show_flashing_text("mirrored \nCONTROLS \nDEACTIVATED", canvas)
+        show_flashing_text("mirrored \nCONTROLS \nDEACTIVATED", canvas, timers)
 
 
-def show_flashing_text(message, canvas):
+def show_flashing_text(message, canvas, timers):
     """"
     Shows flashing message based on the activated cheat code.
+    timers is the game's TimerGroup, so the flashing stops with the game.
     """
-    flashing_text = canvas.create_text(895, 150, text=message, fill="black", font=("PIXY", 22),
+    flashing_text = canvas.create_text(895, 150, text=message, fill="black", font=assets.font("PIXY", 22),
                                        tags="flashing_text")
     canvas.tag_raise("flashing_text")
 
@@ -666,13 +519,27 @@ def show_flashing_text(message, canvas):
             current_colour = canvas.itemcget(flashing_text, "fill")
             new_colour = "orange" if current_colour == "" else ""
             canvas.itemconfig(flashing_text, fill=new_colour)
-            root.after(500, toggle_visibility, count - 1)
+            timers.call_later(500, toggle_visibility, count - 1)
         else:
             canvas.delete(flashing_text)
 
     toggle_visibility(6)
 
 
+boss_key_overlay = None
+
+
+def get_boss_key_overlay():
+    """
+    Returns the boss key cover, built once and then only placed and hidden.
+    """
+    global boss_key_overlay
+    if boss_key_overlay is None:
+        boss_key_overlay = tk.Canvas(root, bg="black", highlightthickness=0)
+        boss_key_overlay.create_image(500, 350, image=assets.image("boss_key.png"))
+    return boss_key_overlay
+
+
 def start_game(root):
     """
     Starts the game. Initializes game objects, sets up the canvas, and begins the game loop.
@@ -680,14 +547,20 @@ def start_game(root):
     global game_state, leaderboard
     print("Score before starting game:", game_state)  # DEBUG PROCESS
     hide_frame(main_menu_frame)
-    canvas = Canvas()
+    canvas = CallCounter(Canvas())
     canvas.pack(fill=BOTH, expand=1)
-    canvas.create_rectangle(200, -20, 800, 720, outline="grey", fill="#797c7e", width=20)
-    root.bind("<KeyPress>", lambda arg: check_cheat_codes_sequences(arg, canvas, set_custom_score))
-
-    score = game_state["score"]
-    speedprovider = SpeedProvider()
-    speedprovider.speed = game_state["speed"]
+    scene = Scene(canvas, sprite_cache)
+
+    seed = random.getrandbits(32)
+    enemy_count = len(saved_world["enemy_x"]) if saved_world else ENEMY_COUNT
+    sim = Simulation(game_state, seed, enemy_count)
+    recorder = ReplayRecorder(new_replay_path(seed), game_state, seed, enemy_count)  # See replay.py
+    sim.recorder = recorder
+    if saved_world:
+        sim.restore(saved_world)
+    last_autosave_tick = sim.tick
+    timers = scheduler.group()  # Every timer of this game, cancelled when it ends
+    frame_timer = None
 
     menu_button = None
     gameover = False
@@ -697,17 +570,39 @@ def start_game(root):
     paused_by_boss_key = False
     pause_return_to_menu_button = None
 
-    score_text = False
-    line = [Line(489, i * 200 - 50, canvas, speedprovider) for i in range(5)]
+    track = TrackView(TrackRing(sim.track), scene)  # See track.py
+
+    car = Car(sim.player, game_state["car_colour_1"], game_state["car_colour_2"], scene)  # Player's car instance
+
+    enemy_cars = [Car(model, "Red", "Dark Red", scene) for model in sim.enemies]  # Enemy car instances
 
-    car = Car(game_state["player_car_x"], game_state["player_car_y"], game_state["car_colour_1"],
-              game_state["car_colour_2"], 0, canvas, speedprovider)  # Player's car instance
+    particles.clear()
+    particle_view = ParticleView(particles, scene)  # Above the road and the cars
+    effects = Effects(particles)
+    last_effects_time = time.perf_counter()
 
-    car2 = Car(game_state["enemy_car_x"], game_state["enemy_car_y"], "Red", "Dark Red", 1, canvas,
-               speedprovider)  # Enemy car instance
+    score_text = TextSprite(scene, 900, 100, fill="black", font=assets.font("PIXY", 30),
+                            text="Score: " + str(game_state["score"]))
+    tcl_calls_text = None
+    if SHOW_TCL_CALLS:
+        tcl_calls_text = TextSprite(scene, 110, 20, fill="black", font=assets.font("PIXY", 14))
+    profiler = frame_profiler
+    sim.profiler = profiler
+    profiler_hud = None
+    debug_keys = {}
+    if profiler:
+        profiler_hud = ProfilerHud(profiler, scene)
+        debug_keys["F3"] = (lambda arg: profiler_hud.toggle(), None)
 
-    root.bind(key_bindings["move_left"], partial(car.move_left, canvas))
-    root.bind(key_bindings["move_right"], partial(car.move_right, canvas))
+    def press_key(action, arg):
+        """
+        Marks a movement key as held, the simulation samples it on its next tick.
+        OS key repeat only sets it again, so it never moves the car by itself.
+        """
+        sim.key_down(action)
+
+    def release_key(action, arg):
+        sim.key_up(action)
 
     def trigger_pause(arg):
         """
@@ -722,14 +617,14 @@ def start_game(root):
             if paused:
                 # print("paused")
                 if not pause_title:
-                    pause_title = canvas.create_text(500, 300, fill="#1f100e", font=("PIXY", 40), text="PAUSED")
+                    pause_title = canvas.create_text(500, 300, fill="#1f100e", font=assets.font("PIXY", 40),
+                                                     text="PAUSED")
                 if not pause_return_to_menu_button:
-                    pause_return_to_menu_button = tk.Button(root, text="MENU", font=("PIXY", 32),
+                    pause_return_to_menu_button = tk.Button(root, text="MENU", font=assets.font("PIXY", 32),
                                                             height=1, width=9, command=save_and_return_to_menu,
                                                             bg="#ff422b", fg="#1f100e")
                     pause_return_to_menu_button.place(x=500, y=400, anchor="center")
-                root.unbind(key_bindings["move_left"])
-                root.unbind(key_bindings["move_right"])
+                dispatcher.push(paused_context)
             else:
                 print("not paused")
                 if pause_title:
@@ -738,11 +633,8 @@ def start_game(root):
                 if pause_return_to_menu_button:
                     pause_return_to_menu_button.destroy()
                     pause_return_to_menu_button = None
-                root.bind(key_bindings["move_left"], partial(car.move_left, canvas))
-                root.bind(key_bindings["move_right"], partial(car.move_right, canvas))
-                game_loop()
-
-    root.bind(key_bindings["pause_game"], trigger_pause)
+                dispatcher.remove(paused_context)
+                resume_game_loop()
 
     def trigger_boss_key(arg):
         """
@@ -755,38 +647,84 @@ def start_game(root):
         if not gameover:
             if paused_by_boss_key:
                 # print("Paused by boss key")
+                dispatcher.push(boss_key_context)
                 if not boss_key_canvas:
-                    boss_key_canvas = tk.Canvas(root, bg="black")
+                    boss_key_canvas = get_boss_key_overlay()
                     boss_key_canvas.place(x=0, y=0, relwidth=1, relheight=1)
-                    boss_key_image = tk.PhotoImage(file="boss_key.png")
-                    boss_key_canvas.create_image(500, 350, image=boss_key_image)
-                    boss_key_canvas.image = boss_key_image
+                    boss_key_canvas.lift()
             else:
                 if boss_key_canvas:
-                    boss_key_canvas.destroy()
+                    boss_key_canvas.place_forget()
                     boss_key_canvas = None
-                game_loop()
+                dispatcher.remove(boss_key_context)
+                resume_game_loop()
+
+    def quick_save(arg):
+        """
+        Keeps a snapshot of the world in memory and writes it to QUICKSAVE in the background.
+        """
+        global quick_save_world
+        if gameover:
+            return
+        quick_save_world = sim.snapshot()
+        save_writer.submit(QUICKSAVE, write_world, quick_save_world, QUICKSAVE)
+        print("Quick saving...")
 
-    root.bind(key_bindings["boss_key"], trigger_boss_key)
+    def quick_load(arg):
+        """
+        Puts the world back to the last quick save.
+        """
+        global quick_save_world
+        if gameover:
+            return
+        if quick_save_world is None:
+            quick_save_world = read_world(QUICKSAVE)
+        if quick_save_world is None or len(quick_save_world["enemy_x"]) != len(sim.enemies):
+            print("No quick save for this game")
+            return
+        sim.restore(quick_save_world)
+        track.ring.set_track(sim.track)  # The quick save may be from a game on another track
+        game_state["score"] = sim.score
+
+    playing_context = InputContext("playing", actions={
+        "move_left": (partial(press_key, "move_left"), partial(release_key, "move_left")),
+        "move_right": (partial(press_key, "move_right"), partial(release_key, "move_right")),
+        "pause_game": (trigger_pause, None),
+        "boss_key": (trigger_boss_key, None),
+        "quick_save": (quick_save, None),
+        "quick_load": (quick_load, None),
+    }, keys=debug_keys, on_key=lambda arg: cheat_codes.feed(arg.keysym), on_suspend=sim.release_keys)
+    cheat_codes.reset()
+    cheat_codes.register("invincibility", lambda: toggle_invincibility(canvas, timers))
+    cheat_codes.register("mirrored_controls", lambda: toggle_mirrored_controls(canvas, timers))
+    cheat_codes.register("custom_score", lambda: set_custom_score())
+    paused_context = InputContext("paused", actions={
+        "pause_game": (trigger_pause, None),
+        "quick_save": (quick_save, None),
+        "quick_load": (quick_load, None),
+    })
+    boss_key_context = InputContext("boss key", actions={"boss_key": (trigger_boss_key, None)})
+    dispatcher.push(playing_context)
 
     def save_and_return_to_menu():
         """
         Allows the player to leave to main menu from the pause screen.
         """
-        global game_state
+        global game_state, saved_world
         print("Full game state before saving:", game_state)  # DEBUG PROCESS
-        game_state["score"] = score
-        game_state["speed"] = speedprovider.speed
-        game_state["player_car_x"] = car.x
-        game_state["player_car_y"] = car.y
-        game_state["enemy_car_x"] = car2.x
-        game_state["enemy_car_y"] = car2.y
+        game_state.update(sim.to_game_state())
+        recorder.finish(sim.tick, sim.score)
+        saved_world = sim.snapshot()
+        save_writer.submit(WORLD, write_world, saved_world, WORLD)
         print(game_state)
+        timers.cancel()
+        dispatcher.remove(paused_context)
+        dispatcher.remove(playing_context)
         canvas.destroy()
         if pause_return_to_menu_button:
             pause_return_to_menu_button.destroy()
         show_frame(main_menu_frame)
-        root.after(10, lambda: show_frame(main_menu_frame))
+        scheduler.call_later(10, show_frame, main_menu_frame)
 
     def game_over():
         """
@@ -794,20 +732,34 @@ def start_game(root):
         and allows the player to submit their score to the leaderboard.
         """
         nonlocal gameover, menu_button
-        global game_state
+        global game_state, saved_world
         print("Score at game over:", game_state)  # DEBUG PROCESS
         gameover = True
-        car.delete_car(canvas)
-        car2.delete_car(canvas)
-        speedprovider.speed = 0
+        timers.cancel()
+        canvas.delete("flashing_text")
+        recorder.finish(sim.tick, sim.score)
+        saved_world = None  # The next game starts from scratch
+        save_writer.submit(WORLD, remove_file, WORLD)
+        effects.crash(car.sprite.x, car.sprite.y, (car.col1, car.col2))
+        car.delete_car()
+        for enemy_car in enemy_cars:
+            enemy_car.delete_car()
 
         canvas.create_rectangle(200, -20, 800, 720, outline="white", fill="#797c7e", width=20)
-        canvas.create_text(500, 300, fill="#ff3217", font=("PIXY", 70), text="GAME OVER")
-
-        name_entry = tk.Entry(root, font=("PIXY", 22), fg="#1f100e", justify="center")
+        canvas.create_text(500, 300, fill="#ff3217", font=assets.font("PIXY", 70), text="GAME OVER")
+        canvas.tag_raise(particle_view.tag)
+        play_out_effects()
+        rank, total = leaderboard.record_result(game_state["score"])
+        canvas.create_text(500, 215, fill="#1f100e", font=assets.font("PIXY", 26),
+                           text=f"YOU ARE #{rank:,} OF {short_count(total)}")
+
+        name_entry = tk.Entry(root, font=assets.font("PIXY", 22), fg="#1f100e", justify="center")
         name_entry.place(x=500, y=360, width=205, anchor="center")
 
         name_entry.insert(0, "Your name")
+        name_context = InputContext("text entry")  # Typing a name must not trigger game keys
+        dispatcher.remove(playing_context)
+        dispatcher.push(name_context)
 
         def on_entry_click(arg):
             """
@@ -826,10 +778,10 @@ def start_game(root):
             name = name_entry.get().strip()
             if name and name != "Your name":
                 leaderboard.add_score(name, game_state["score"])
-                leaderboard.save_leaderboard()
                 # print("Submitted score:", game_state["score"])  # DEBUG PROCESS
             # name_label.destroy()
             name_entry.destroy()
+            dispatcher.remove(name_context)
             custom_colours = {
                 "car_colour_1": game_state["car_colour_1"],
                 "car_colour_2": game_state["car_colour_2"],
@@ -838,7 +790,7 @@ def start_game(root):
             game_state.update(custom_colours)
             return_to_menu()
 
-        menu_button = Button(root, text="MENU", font=("PIXY", 32),
+        menu_button = Button(root, text="MENU", font=assets.font("PIXY", 32),
                              command=submit_name, height=1,
                              width=9, bg="#ff422b", fg="#1f100e")
         menu_button.place(x=500, y=410, anchor="center")
@@ -846,32 +798,17 @@ def start_game(root):
         leaderboard.display_leadeboard()
         update_leaderboard_display()
 
-        root.unbind(key_bindings["move_left"])
-        root.unbind(key_bindings["move_right"])
-
     def return_to_menu():
         """
         Called in frames to return to main menu
         """
         nonlocal menu_button
+        timers.cancel()  # The crash effect may still be playing
         canvas.destroy()
         if menu_button:
             menu_button.destroy()
         show_frame(main_menu_frame)
-        root.after(10, lambda: show_frame(main_menu_frame))
-
-    def increase_speed():
-        """
-        Increases speed over time.
-        """
-        nonlocal paused, paused_by_boss_key
-        if not paused and not paused_by_boss_key and speedprovider.speed < 50:
-            speedprovider.speed += 5
-        root.after(5000, increase_speed)
-
-        # print(speedprovider.speed)
-
-    increase_speed()
+        scheduler.call_later(10, show_frame, main_menu_frame)
 
     def set_custom_score():
         """
@@ -882,10 +819,12 @@ def start_game(root):
         paused = True
         # print("Paused by score cc")
 
-        score_entry = tk.Entry(root, font=("PIXY", 22), fg="#1f100e", justify="center")
+        score_entry = tk.Entry(root, font=assets.font("PIXY", 22), fg="#1f100e", justify="center")
         score_entry.place(x=500, y=350, width=200, anchor="center")
 
         score_entry.insert(0, "Your score")
+        score_context = InputContext("text entry")
+        dispatcher.push(score_context)
 
         def on_entry_click(arg):
             if score_entry.get() == "Your score" or score_entry.get() == "Enter a number":
@@ -894,51 +833,148 @@ def start_game(root):
         score_entry.bind("<FocusIn>", on_entry_click)
 
         def submit_custom_score():
-            nonlocal score, paused
+            nonlocal paused
             input_value = score_entry.get()
-            if input_value.isdigit():
+            if input_value.isdecimal():
                 custom_score = int(input_value)
-                score = custom_score
+                sim.set_score(custom_score)
 
                 score_entry.destroy()
                 submit_custom_score_button.destroy()
+                dispatcher.remove(score_context)
                 paused = False
-                game_loop()
+                resume_game_loop()
             else:
                 score_entry.insert(0, "Invalid input. Enter a number")
 
-        submit_custom_score_button = Button(root, text="SUBMIT", font=("PIXY", 32),
+        submit_custom_score_button = Button(root, text="SUBMIT", font=assets.font("PIXY", 32),
                                             command=submit_custom_score, height=2,
                                             width=9, bg="#ff422b", fg="#1f100e")
         submit_custom_score_button.place(x=500, y=410, anchor="center")
 
+    timestep = FixedTimestep(Simulation.TICK)
+
+    def effects_dt():
+        """
+        Seconds since the particles last moved.
+        """
+        nonlocal last_effects_time
+        now = time.perf_counter()
+        dt = min(now - last_effects_time, MAX_EFFECTS_DT)
+        last_effects_time = now
+        return dt
+
+    def play_out_effects():
+        """
+        Keeps the particles moving after the game loop has stopped, until the last one is gone.
+        """
+        particles.update(effects_dt())
+        particle_view.draw()
+        if len(particles):
+            timers.call_later(timestep.frame_delay_ms(), play_out_effects)
+
+    def resume_game_loop():
+        """
+        Restarts the game loop without counting the time it was stopped for.
+        A frame that is still scheduled is cancelled, so there is only ever one loop.
+        """
+        nonlocal last_effects_time
+        if frame_timer:
+            frame_timer.cancel()
+        timestep.reset()
+        last_effects_time = time.perf_counter()
+        game_loop()
+
     def game_loop():
         """
-        Main game loop that continuously updates the game state and graphics.
+        Main game loop: runs the simulation at its fixed tick rate and draws a frame
+        as often as the display allows, interpolating between ticks.
         """
 
-        nonlocal gameover, score_text, score
+        nonlocal gameover, last_autosave_tick, frame_timer
 
         if not paused and not paused_by_boss_key and not gameover:
-            if score_text:
-                canvas.delete(score_text)
-
-            for i in range(5):
-                line[i].change_coord(canvas)
-            car.print_car(canvas)
-            car2.change_coord(speedprovider.speed, canvas)
-
-            score_text = canvas.create_text(900, 100, fill="black", font=("PIXY", 30),
-                                            text="Score: " + str(game_state["score"]))
-            score += speedprovider.speed
-            game_state["score"] = score
-            if (car + car2) and not game_state["invincibility_mode"]:
+            if game_metrics:
+                frame_start = time.perf_counter()
+            if profiler:
+                profiler.start_frame()
+            sim.set_modes(game_state["invincibility_mode"], game_state["mirrored_controls"])
+            running = True
+            steps = timestep.advance()
+            if profiler:
+                profiler.lap("schedule")
+            for _ in range(steps):
+                running = sim.step(Simulation.TICK)  # Laps step_traffic and step_collision
+                if not running:
+                    break
+
+            if running and sim.tick - last_autosave_tick >= AUTOSAVE_TICKS:
+                last_autosave_tick = sim.tick
+                save_writer.submit(WORLD, write_world, sim.snapshot(), WORLD)
+            if profiler:
+                profiler.lap("autosave")
+
+            alpha = timestep.alpha()
+            track.update(interpolate(sim.prev_road, sim.road, alpha))
+            if profiler:
+                profiler.lap("draw_track")
+            car.print_car(alpha)
+            if profiler:
+                profiler.lap("draw_player")
+            for enemy_car in enemy_cars:
+                enemy_car.print_car(alpha)
+            if profiler:
+                profiler.lap("draw_enemies")
+            dt = effects_dt()
+            effects.frame(dt, sim.speed, car.sprite.x, car.sprite.y, sim.steering,
+                          sim.road_span(STREAK_Y, VIEW_LENGTH))
+            particles.update(dt)
+            if profiler:
+                profiler.lap("step_effects")
+            particle_view.draw()
+            if profiler:
+                profiler.lap("draw_effects")
+
+            score_text.set_text("Score: " + str(game_state["score"]))
+            game_state["score"] = sim.score
+            calls = canvas.end_frame()
+            if tcl_calls_text:
+                tcl_calls_text.set_text(f"Tcl calls/frame: {calls}")
+            if profiler_hud:
+                profiler_hud.update()
+            if profiler:
+                profiler.lap("draw_hud")
+            if game_metrics:
+                game_metrics.frame(time.perf_counter() - frame_start, sim, canvas)
+            if not running:
                 game_over()
             else:
-                root.after(100, game_loop)
+                frame_timer = timers.call_later(timestep.frame_delay_ms(), game_loop)
+                if profiler:
+                    profiler.lap("schedule")
+                    profiler.end_frame()
 
-    game_loop()
+    resume_game_loop()
 
 
 root.resizable(False, False)
-root.mainloop()
+startup.lap("rest of module")
+# Decodes the boss key image and builds its overlay while the menu is up.
+assets.preload(["boss_key.png"], on_ready=lambda: [get_boss_key_overlay(), assets.report()])
+
+
+def finish_startup():
+    """
+    Runs once the main menu is up and Tk is idle for the first time.
+    """
+    startup.lap("first idle")
+    if PROFILE_STARTUP:
+        startup.report()
+        startup.dump(STARTUP_FILE)
+
+
+if __name__ == "__main__":
+    root.after_idle(finish_startup)
+    if os.environ.get("PSR_EXIT_AFTER_MENU"):  # Lets benchmarks.py time the cold start to the main menu
+        root.after_idle(root.destroy)
+    root.mainloop()
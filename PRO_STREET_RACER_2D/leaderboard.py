@@ -0,0 +1,205 @@
+"""
+Leaderboard storage.
+
+The top scores are kept in a bounded min-heap with an index from name to entry, so a
+submission costs O(log K). The file is written in the background: submissions that
+arrive close together are coalesced into one atomic write, and pending changes are
+flushed on exit.
+
+Every game result, named or not, also goes into a RankIndex so any score can be
+ranked among all historical results, not just the top 10.
+"""
+import atexit
+import heapq
+import json
+import threading
+import time
+
+from files import write_atomic
+from rankindex import RankIndex
+
+TOP_K = 10
+FLUSH_DELAY = 0.5  # Seconds to wait for more submissions before writing the file
+
+
+class Leaderboard:
+    """
+    Manages the leaderboard, including loading, saving, and displaying top scores.
+    """
+
+    def __init__(self, filename="leaderboard.json", size=TOP_K, flush_delay=FLUSH_DELAY, rank_filename="ranks.bin"):
+        self.filename = filename
+        self.rank_filename = rank_filename
+        self.size = size
+        self.flush_delay = flush_delay
+        self.heap = []  # [score, -order, name, live] entries, the lowest score on top
+        self.entries = {}  # Name -> its live heap entry
+        self.order = 0  # Change counter, a score reached earlier wins ties like in a stable sort
+        self.stale = 0  # Replaced entries still sitting in the heap
+        self.sorted_scores = None
+        self.dirty = False
+        self.ranks_dirty = False
+        self.closed = False
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.on_write = None  # Optional on_write(seconds), called on the writing thread after each write
+
+        loaded = self.load_leaderboard()
+        for value in loaded:
+            self.insert(value["name"], value["score"])
+        self.ranks = RankIndex.load(rank_filename)
+        if self.ranks is None:  # Start the history from the scores we still know
+            self.ranks = RankIndex()
+            for value in loaded:
+                self.ranks.add(value["score"])
+            self.ranks_dirty = bool(loaded)
+        self.flusher = threading.Thread(target=self.flush_loop, name="leaderboard-flusher", daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    def load_leaderboard(self):
+        try:
+            file = open(self.filename, "r")
+            data = json.load(file)
+            file.close()
+            return data
+        except FileNotFoundError:
+            print(f"file {self.filename} not found")
+            return []
+        except json.JSONDecodeError:
+            print(f"file {self.filename} is not valid")
+            return []
+
+    @property
+    def scores(self):
+        """
+        Top scores as [{"name": ..., "score": ...}], highest first.
+        """
+        if self.sorted_scores is None:
+            live = sorted(self.entries.values(), reverse=True)
+            self.sorted_scores = [{"name": entry[2], "score": entry[0]} for entry in live]
+        return self.sorted_scores
+
+    def insert(self, name, score):
+        """
+        Keeps the best score per name among the top size names. Returns True if the board changed.
+        """
+        entry = self.entries.get(name)
+        new_entry = [score, -self.order, name, True]
+        if entry is not None:
+            if score <= entry[0]:
+                return False
+            entry[3] = False
+            self.stale += 1
+            heapq.heappush(self.heap, new_entry)
+            if self.stale > self.size:
+                self.heap = [entry for entry in self.heap if entry[3]]
+                heapq.heapify(self.heap)
+                self.stale = 0
+        elif len(self.entries) < self.size:
+            heapq.heappush(self.heap, new_entry)
+        else:
+            while not self.heap[0][3]:
+                heapq.heappop(self.heap)
+                self.stale -= 1
+            lowest = self.heap[0]
+            if new_entry[:2] <= lowest[:2]:
+                return False
+            heapq.heapreplace(self.heap, new_entry)
+            del self.entries[lowest[2]]
+        self.order += 1
+        self.entries[name] = new_entry
+        return True
+
+    def add_score(self, name, score):
+        with self.lock:
+            if not self.insert(name, score):
+                return
+            self.sorted_scores = None
+            self.dirty = True
+        self.changed()
+
+    def record_result(self, score):
+        """
+        Adds a finished game to the rank index. Returns (rank, number of results).
+        """
+        with self.lock:
+            self.ranks.add(score)
+            self.ranks_dirty = True
+            rank = self.ranks.rank(score)
+            total = len(self.ranks)
+        self.changed()
+        return rank, total
+
+    def changed(self):
+        """
+        Wakes the background writer, or writes now if close() has already stopped it.
+        """
+        if self.closed:
+            self.flush()
+        else:
+            self.wake.set()
+
+    def rank(self, score):
+        with self.lock:
+            return self.ranks.rank(score)
+
+    def percentile(self, score):
+        with self.lock:
+            return self.ranks.percentile(score)
+
+    def flush_loop(self):
+        """
+        Background writer: after a change, waits flush_delay so a burst of submissions
+        ends up in a single write.
+        """
+        while not self.closed:
+            self.wake.wait()
+            self.wake.clear()
+            if self.closed:
+                break
+            time.sleep(self.flush_delay)
+            self.flush()
+
+    def flush(self):
+        """
+        Writes pending changes now.
+        """
+        data = ranks = None
+        with self.lock:
+            if self.dirty:
+                data = json.dumps(self.scores)
+            if self.ranks_dirty:
+                ranks = self.ranks.snapshot()
+            self.dirty = self.ranks_dirty = False
+        if data is None and ranks is None:
+            return
+        with self.write_lock:
+            start = time.perf_counter()
+            if data is not None:
+                write_atomic(self.filename, data)
+            if ranks is not None:
+                ranks.save(self.rank_filename)
+            if self.on_write:
+                self.on_write(time.perf_counter() - start)
+
+    def save_leaderboard(self):
+        with self.lock:
+            self.dirty = True
+        self.flush()
+
+    def close(self):
+        """
+        Stops the background writer and flushes pending changes.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.flush()
+
+    def display_leadeboard(self):
+        print("LEADERBOARD")
+        for i, value in enumerate(self.scores, 1):
+            print(f'{i}. {value["name"]} - {value["score"]}')
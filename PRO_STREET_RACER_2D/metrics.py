@@ -0,0 +1,193 @@
+"""
+Live metrics on a local HTTP endpoint, in the Prometheus text format.
+
+    PSR_METRICS_PORT=9464 python game_solution.py
+    curl http://127.0.0.1:9464/metrics
+
+The game only ever writes plain numbers: a histogram is a list of bucket counts and
+a sum, a gauge a single value. Each series has one writer (the Tk thread, or the
+thread doing the file writes it times), and the HTTP server reads them from its own
+thread without taking a lock, so a scrape never waits on a frame and a frame never
+waits on a scrape. A scrape can see a histogram's sum a moment ahead of its buckets.
+
+Gauges given a function are read when scraped, from the server's thread, so the
+function must only read attributes. Anything that needs Tk, like the canvas item
+count, is set from the game loop instead.
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds. Frames should take well under a 60 Hz frame, file writes a few ms.
+FRAME_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.016, 0.033, 0.066, 0.1, 0.25)
+WRITE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CANVAS_SAMPLE_FRAMES = 30  # Frames between counts of the canvas items, find_all is not free
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, for a single writer thread.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one counts values above every bucket
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        counts = list(self.counts)  # One copy, so the buckets and the count agree
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            yield f"{name}_bucket{label_text(labels + (('le', number(bound)),))} {total}"
+        yield f"{name}_sum{label_text(labels)} {number(self.sum)}"
+        yield f"{name}_count{label_text(labels)} {total}"
+
+
+class Gauge:
+    """
+    A value set by its writer, or read from function at every scrape.
+    """
+
+    def __init__(self, function=None):
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        value = self.function() if self.function else self.value
+        yield f"{name}{label_text(labels)} {number(value)}"
+
+
+class Registry:
+    """
+    Every series the endpoint shows, grouped by metric name.
+    """
+
+    def __init__(self):
+        self.families = {}  # Name -> [type, help, {labels: series}]
+
+    def add(self, kind, name, help_text, make, labels):
+        family = self.families.setdefault(name, [kind, help_text, {}])
+        if family[0] != kind:
+            raise ValueError(f"{name} is already a {family[0]}")
+        key = tuple(sorted(labels.items()))
+        series = family[2].get(key)
+        if series is None:
+            series = family[2][key] = make()
+        return series
+
+    def histogram(self, name, help_text, buckets, **labels):
+        return self.add("histogram", name, help_text, lambda: Histogram(buckets), labels)
+
+    def gauge(self, name, help_text, function=None, **labels):
+        return self.add("gauge", name, help_text, lambda: Gauge(function), labels)
+
+    def render(self):
+        lines = []
+        for name, (kind, help_text, series) in list(self.families.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, values in list(series.items()):
+                lines.extend(values.samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves a Registry at /metrics from a daemon thread.
+    """
+
+    def __init__(self, registry, port, host=HOST):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = self.server.registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # One line per scrape would flood the console
+
+        self.server = HTTPServer((host, port), Handler)
+        self.server.registry = registry
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GameMetrics:
+    """
+    The series game_solution.py exports: frame times, speed, score, canvas items, pending
+    timers and how long leaderboard and save file writes take.
+    """
+
+    def __init__(self, registry, scheduler=None, save_files=()):
+        self.registry = registry
+        self.frame_seconds = registry.histogram("psr_frame_seconds", "Time game_loop spent on a frame.",
+                                                FRAME_BUCKETS)
+        self.speed = registry.gauge("psr_speed", "Current speed of the game, speedprovider.speed.")
+        self.score = registry.gauge("psr_score", "Current score.")
+        self.canvas_items = registry.gauge("psr_canvas_items", "Live items on the game canvas.")
+        self.leaderboard_write_seconds = registry.histogram(
+            "psr_leaderboard_write_seconds", "Time taken by each leaderboard file write.", WRITE_BUCKETS)
+        # Made up front, so the writer thread never adds to the registry while it is scraped.
+        self.save_write_seconds = {
+            filename: registry.histogram("psr_save_write_seconds", "Time taken by each save file write, "
+                                         "including save_game's.", WRITE_BUCKETS, file=filename)
+            for filename in save_files}
+        if scheduler is not None:
+            registry.gauge("psr_pending_timers", "Timers waiting in the scheduler.", scheduler.pending)
+        self.frames = 0
+
+    def frame(self, seconds, sim, canvas):
+        """
+        Records a frame of game_loop. Called from the Tk thread.
+        """
+        self.frame_seconds.observe(seconds)
+        self.speed.set(sim.speed)
+        self.score.set(sim.score)
+        if self.frames % CANVAS_SAMPLE_FRAMES == 0:
+            self.canvas_items.set(len(canvas.find_all()))
+        self.frames += 1
+
+    def leaderboard_write(self, seconds):
+        self.leaderboard_write_seconds.observe(seconds)
+
+    def save_write(self, filename, seconds):
+        series = self.save_write_seconds.get(filename)
+        if series:
+            series.observe(seconds)
+
@@ -0,0 +1,574 @@
+"""
+Head-to-head races over a local socket.
+
+    python multiplayer.py server --port 7878
+    python multiplayer.py bots --port 7878 --count 8
+    python race_client.py --port 7878 --name ALICE           # a player, in a Tk window
+    python multiplayer.py selftest --bots 24 --seconds 5    # server and bots in one process on localhost
+
+RaceServer runs the authoritative game: a Simulation for the road, the traffic and
+the speed curve, plus one car per connected player, kept on the track like the single
+player's car. A player that crashes is out
+until everyone has crashed, then a new race starts. Clients send their movement keys
+once per tick and the server applies one input per player per tick, so the keys act
+exactly as they do in the single player game.
+
+After every tick each client gets a snapshot, delta encoded against the previous one
+it was sent: enemies are expected to have driven down by the speed and live players
+to have scored it, so only respawned enemies and players that moved, crashed, joined
+or left are written. Each client has a small send buffer. A client that cannot keep
+up has its backlog dropped and gets a full snapshot next.
+
+RaceClient predicts its own car from the keys it sent. On every snapshot it starts
+again from the server's position and replays the inputs the server has not applied
+yet, against the road ahead of it on the track the snapshot names.
+
+Messages are a u16 length followed by the message. Integers are little endian.
+"""
+import argparse
+import asyncio
+import random
+import struct
+import sys
+from collections import deque
+
+import numpy as np
+
+from simulation import Simulation, default_game_state, road_range
+from track import Track
+
+PORT = 7878
+ENEMY_COUNT = 8
+INPUT_BUFFER = 8  # Inputs kept per player, a client that runs ahead loses its oldest ones
+SEND_BUFFER = 4  # Snapshots queued per client before its backlog is dropped
+PLAYER_Y = default_game_state["player_car_y"]
+LEFT_KEY = 1
+RIGHT_KEY = 2
+KEY_BITS = {"move_left": LEFT_KEY, "move_right": RIGHT_KEY}  # Actions of key_bindings -> key bits
+
+LENGTH = struct.Struct("<H")
+HELLO = 1  # Client: type, then the player's name in UTF-8
+INPUT = 2  # Client: INPUT_FORMAT
+WELCOME = 0x81  # Server: WELCOME_FORMAT
+SNAPSHOT = 0x82  # Server: SNAPSHOT_HEADER, player records, removed ids, enemy records
+INPUT_FORMAT = struct.Struct("<BIB")  # Type, sequence number, keys
+WELCOME_FORMAT = struct.Struct("<BHHH")  # Type, player id, tick in ms, enemy cars
+# Type, flags, tick, last input applied for this client, speed, road, track seed, players, removed players, enemies
+SNAPSHOT_HEADER = struct.Struct("<BBIIhqIHHH")
+ACK_OFFSET = 6  # Where the last input applied goes in SNAPSHOT_HEADER, filled in per client
+PLAYER_DTYPE = np.dtype([("id", "<u2"), ("x", "<i2"), ("alive", "u1"), ("score", "<i8")])
+REMOVED_DTYPE = np.dtype("<u2")
+ENEMY_DTYPE = np.dtype([("index", "<u2"), ("x", "<i2"), ("y", "<i4")])
+FULL = 1  # Snapshot flag: not a delta, the client starts from nothing
+
+
+def player_range(track, road):
+    """
+    The x positions a player's car can take with the traffic driven road far, as in
+    Simulation.player_range.
+    """
+    return road_range(track, road, PLAYER_Y, Simulation.PLAYER_MIN_X, Simulation.PLAYER_MAX_X,
+                      Simulation.ROAD_INSET)
+
+
+def move_player(x, keys, x_range):
+    """
+    The player's x after one tick with keys held, kept within x_range from player_range,
+    as in Simulation.sample_keys.
+    """
+    left = bool(keys & LEFT_KEY)
+    right = bool(keys & RIGHT_KEY)
+    if left != right:
+        x += -Simulation.PLAYER_SPEED if left else Simulation.PLAYER_SPEED
+    return max(x_range[0], min(x_range[1], x))
+
+
+def spawn_x(slot, x_range):
+    """
+    Starting x of the slot-th player in a race, spread over x_range.
+    """
+    return x_range[0] + (slot * 130) % (x_range[1] - x_range[0] + 1)
+
+
+def frame(message):
+    return LENGTH.pack(len(message)) + message
+
+
+async def read_message(reader):
+    length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return await reader.readexactly(length)
+
+
+class WorldState:
+    """
+    What a snapshot describes. players maps id -> (x, alive, score).
+    """
+
+    def __init__(self, tick=0, speed=0, players=None, enemy_x=None, enemy_y=None, road=0, track_seed=0):
+        self.tick = tick
+        self.speed = speed
+        self.road = road
+        self.track_seed = track_seed
+        self.players = players if players is not None else {}
+        self.enemy_x = enemy_x if enemy_x is not None else np.zeros(0, dtype=np.int64)
+        self.enemy_y = enemy_y if enemy_y is not None else np.zeros(0, dtype=np.int64)
+
+    def predicted(self):
+        """
+        This state one tick on, if nothing but the speed happens: what deltas are against.
+        """
+        players = {player_id: (x, alive, score + self.speed if alive else score)
+                   for player_id, (x, alive, score) in self.players.items()}
+        return WorldState(self.tick + 1, self.speed, players, self.enemy_x, self.enemy_y + self.speed,
+                          self.road + self.speed, self.track_seed)
+
+    def same_as(self, other):
+        return (self.tick == other.tick and self.speed == other.speed and self.road == other.road and
+                self.track_seed == other.track_seed and self.players == other.players and
+                np.array_equal(self.enemy_x, other.enemy_x) and np.array_equal(self.enemy_y, other.enemy_y))
+
+
+def encode_snapshot(current, baseline=None):
+    """
+    Snapshot message for current, as a delta from baseline (the state one tick before)
+    or full without one. The last input applied is left 0 for the caller to fill in.
+    """
+    if baseline is None:
+        flags = FULL
+        players = list(current.players.items())
+        removed = []
+        changed = np.arange(len(current.enemy_x))
+    else:
+        flags = 0
+        expected = baseline.predicted()
+        players = [(player_id, values) for player_id, values in current.players.items()
+                   if expected.players.get(player_id) != values]
+        removed = [player_id for player_id in baseline.players if player_id not in current.players]
+        changed = np.flatnonzero((current.enemy_x != expected.enemy_x) | (current.enemy_y != expected.enemy_y))
+
+    player_records = np.array([(player_id, x, alive, score) for player_id, (x, alive, score) in players],
+                              dtype=PLAYER_DTYPE)
+    enemy_records = np.empty(len(changed), dtype=ENEMY_DTYPE)
+    enemy_records["index"] = changed
+    enemy_records["x"] = current.enemy_x[changed]
+    enemy_records["y"] = current.enemy_y[changed]
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT, flags, current.tick, 0, current.speed, current.road, current.track_seed,
+                                  len(player_records), len(removed), len(enemy_records))
+    return frame(header + player_records.tobytes() + np.array(removed, dtype=REMOVED_DTYPE).tobytes() +
+                 enemy_records.tobytes())
+
+
+def decode_snapshot(message, world):
+    """
+    Applies a snapshot message to world. Returns (new world, last input applied),
+    or raises ValueError if a delta does not follow on from world.
+    """
+    _, flags, tick, ack, speed, road, track_seed, player_count, removed_count, enemy_count = \
+        SNAPSHOT_HEADER.unpack_from(message)
+    position = SNAPSHOT_HEADER.size
+    players = np.frombuffer(message, PLAYER_DTYPE, player_count, position)
+    position += players.nbytes
+    removed = np.frombuffer(message, REMOVED_DTYPE, removed_count, position)
+    position += removed.nbytes
+    enemies = np.frombuffer(message, ENEMY_DTYPE, enemy_count, position)
+
+    if flags & FULL:
+        world = WorldState(tick, speed, {}, np.zeros(enemy_count, dtype=np.int64),
+                           np.zeros(enemy_count, dtype=np.int64), road, track_seed)
+    else:
+        if tick != world.tick + 1:
+            raise ValueError(f"delta for tick {tick} after tick {world.tick}")
+        world = world.predicted()
+        world.enemy_x = world.enemy_x.copy()
+        world.speed = speed
+        world.road = road  # Starts again at 0 on a new track when a race ends
+        world.track_seed = track_seed
+    for record in players:
+        world.players[int(record["id"])] = (int(record["x"]), bool(record["alive"]), int(record["score"]))
+    for player_id in removed:
+        world.players.pop(int(player_id), None)
+    world.enemy_x[enemies["index"]] = enemies["x"]
+    world.enemy_y[enemies["index"]] = enemies["y"]
+    return world, ack
+
+
+class Player:
+    """
+    A connected client and its car, on the server.
+    """
+
+    def __init__(self, player_id, name, writer, x):
+        self.id = player_id
+        self.name = name
+        self.writer = writer
+        self.x = x
+        self.alive = True
+        self.score = 0
+        self.keys = 0
+        self.ack = 0  # Sequence number of the last input applied
+        self.inputs = deque(maxlen=INPUT_BUFFER)
+        self.outbox = asyncio.Queue(SEND_BUFFER)
+        self.needs_full = True
+        self.dropped = 0  # Times the send buffer filled up
+        self.sender = None
+
+
+class RaceServer:
+    """
+    Authoritative race: steps the game at Simulation.TICK and sends snapshots to every client.
+    """
+
+    def __init__(self, enemy_count=ENEMY_COUNT, seed=None):
+        self.enemy_count = enemy_count
+        self.rng = random.Random(seed)
+        self.players = {}
+        self.next_id = 1
+        self.races = 0
+        self.tick = 0  # Snapshots count ticks across races, the simulation starts again at 0 each race
+        self.previous = None  # World state of the last snapshot sent
+        self.snapshot_bytes = {"full": [0, 0], "delta": [0, 0]}  # Kind -> [snapshots, bytes]
+        self.server = None
+        self.handlers = set()
+        self.new_race()
+
+    def new_race(self):
+        state = default_game_state.copy()
+        state["invincibility_mode"] = True  # The simulation's own car is not raced, the players are
+        self.sim = Simulation(state, self.rng.getrandbits(32), self.enemy_count)
+        self.races += 1
+        x_range = self.player_range()
+        for slot, player in enumerate(self.players.values()):
+            player.x = spawn_x(slot, x_range)
+            player.alive = True
+            player.score = 0
+
+    async def handle(self, reader, writer):
+        """
+        Serves one client: HELLO, then INPUT messages until it disconnects.
+        """
+        player = None
+        self.handlers.add(asyncio.current_task())
+        try:
+            hello = await read_message(reader)
+            if not hello or hello[0] != HELLO:
+                return
+            player = Player(self.next_id, hello[1:].decode("utf-8", "replace"), writer,
+                            spawn_x(len(self.players), self.player_range()))
+            self.next_id += 1
+            player.alive = not self.players  # Players joining a race already on wait for the next one
+            self.players[player.id] = player
+            writer.write(frame(WELCOME_FORMAT.pack(WELCOME, player.id, Simulation.TICK_MS, self.enemy_count)))
+            player.sender = asyncio.create_task(self.send_loop(player))
+            while True:
+                message = await read_message(reader)
+                if not message:
+                    continue
+                if message[0] == INPUT and len(message) == INPUT_FORMAT.size:
+                    _, sequence, keys = INPUT_FORMAT.unpack(message)
+                    player.inputs.append((sequence, keys))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if player:
+                self.players.pop(player.id, None)
+                if player.sender:
+                    player.sender.cancel()
+            writer.close()
+            self.handlers.discard(asyncio.current_task())
+
+    def player_range(self):
+        return player_range(self.sim.track, self.sim.road)
+
+    async def send_loop(self, player):
+        while True:
+            data = await player.outbox.get()
+            player.writer.write(data)
+            await player.writer.drain()
+
+    def step(self):
+        """
+        Applies one input per player, advances the game by a tick and sends the snapshots.
+        """
+        x_range = self.player_range()
+        for player in self.players.values():
+            if player.inputs:
+                player.ack, player.keys = player.inputs.popleft()
+            if player.alive:
+                player.x = move_player(player.x, player.keys, x_range)
+        speed = self.sim.speed
+        self.sim.step()
+        self.tick += 1
+        traffic = self.sim.traffic
+        for player in self.players.values():
+            if player.alive:
+                player.score += speed
+                if traffic.hit_mask(player.x, PLAYER_Y).any():
+                    player.alive = False
+        if self.players and not any(player.alive for player in self.players.values()):
+            self.new_race()
+        self.broadcast()
+
+    def world(self):
+        n = len(self.sim.traffic)
+        players = {player.id: (player.x, player.alive, player.score) for player in self.players.values()}
+        return WorldState(self.tick, self.sim.speed, players, self.sim.traffic.x[:n].copy(),
+                          self.sim.traffic.y[:n].copy(), self.sim.road, self.sim.track.seed)
+
+    def broadcast(self):
+        """
+        Queues this tick's snapshot for every client. The delta and the full snapshot are
+        encoded at most once each, only the last input applied differs per client.
+        """
+        current = self.world()
+        encoded = {}
+        for player in self.players.values():
+            kind = "full" if player.needs_full or self.previous is None else "delta"
+            if kind not in encoded:
+                encoded[kind] = encode_snapshot(current, None if kind == "full" else self.previous)
+            data = bytearray(encoded[kind])
+            struct.pack_into("<I", data, LENGTH.size + ACK_OFFSET, player.ack)
+            try:
+                player.outbox.put_nowait(bytes(data))
+            except asyncio.QueueFull:
+                # The client is not keeping up: what is queued is out of date, and the deltas
+                # after it would have no baseline, so start it again from a full snapshot.
+                while not player.outbox.empty():
+                    player.outbox.get_nowait()
+                player.needs_full = True
+                player.dropped += 1
+                continue
+            player.needs_full = False
+            self.snapshot_bytes[kind][0] += 1
+            self.snapshot_bytes[kind][1] += len(data)
+        self.previous = current
+
+    async def start(self, host="127.0.0.1", port=PORT):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def run(self, ticks=None):
+        """
+        Steps at the tick rate, against fixed deadlines so the rate does not drift.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        tick = 0
+        while ticks is None or tick < ticks:
+            self.step()
+            tick += 1
+            deadline += Simulation.TICK
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+    async def close(self):
+        """
+        Disconnects every client and waits for their handlers to finish.
+        """
+        self.server.close()
+        for player in list(self.players.values()):
+            player.writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+
+class RaceClient:
+    """
+    Connection to a RaceServer. Holds the last world state received and predicts the
+    player's own x from the inputs the server has not applied yet.
+    """
+
+    def __init__(self, name="PLAYER"):
+        self.name = name
+        self.player_id = None
+        self.enemy_count = 0
+        self.world = WorldState()
+        self.keys = 0
+        self.sequence = 0
+        self.pending = deque()  # (sequence, keys) sent but not yet applied by the server
+        self.predicted_x = None
+        self.track = Track(0)  # The track of the last snapshot, for the predicted car's range
+        self.corrections = 0  # Snapshots that moved the predicted car
+        self.errors = 0
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host="127.0.0.1", port=PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(frame(bytes([HELLO]) + self.name.encode("utf-8")))
+        _, self.player_id, tick_ms, self.enemy_count = WELCOME_FORMAT.unpack(await read_message(self.reader))
+
+    def key_down(self, action):
+        """
+        Takes the actions of key_bindings, so a Tk client can forward its key events.
+        """
+        self.keys |= KEY_BITS.get(action, 0)
+
+    def key_up(self, action):
+        self.keys &= ~KEY_BITS.get(action, 0)
+
+    def me(self):
+        return self.world.players.get(self.player_id)
+
+    def range_ahead(self, ticks):
+        """
+        The range the server will keep this player's car in ticks ticks after the last
+        snapshot, if the speed holds until then.
+        """
+        world = self.world
+        if self.track.seed != world.track_seed:
+            self.track = Track(world.track_seed)
+        return player_range(self.track, world.road + ticks * world.speed)
+
+    def send_input(self):
+        """
+        Sends the keys for the next tick and moves the predicted car with them.
+        """
+        self.sequence += 1
+        self.pending.append((self.sequence, self.keys))
+        self.writer.write(frame(INPUT_FORMAT.pack(INPUT, self.sequence, self.keys)))
+        me = self.me()
+        if self.predicted_x is not None and me and me[1]:
+            self.predicted_x = move_player(self.predicted_x, self.keys, self.range_ahead(len(self.pending) - 1))
+
+    def on_snapshot(self, message):
+        try:
+            self.world, ack = decode_snapshot(message, self.world)
+        except ValueError:
+            self.errors += 1
+            return
+        while self.pending and self.pending[0][0] <= ack:
+            self.pending.popleft()
+        me = self.me()
+        if me is None:
+            return
+        x, alive, score = me
+        if alive:
+            for ticks, (sequence, keys) in enumerate(self.pending):
+                x = move_player(x, keys, self.range_ahead(ticks))
+        if self.predicted_x is not None and x != self.predicted_x:
+            self.corrections += 1
+        self.predicted_x = x
+
+    async def receive_loop(self):
+        try:
+            while True:
+                message = await read_message(self.reader)
+                if message and message[0] == SNAPSHOT:
+                    self.on_snapshot(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def run(self, seconds, pilot=None):
+        """
+        Sends an input every tick for seconds, letting pilot(client) set the keys first.
+        """
+        receiver = asyncio.create_task(self.receive_loop())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        end = deadline + seconds
+        while loop.time() < end and not receiver.done():
+            if pilot:
+                pilot(self)
+            self.send_input()
+            await self.writer.drain()
+            deadline += Simulation.TICK
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+        return receiver
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+def bot_pilot(client):
+    """
+    Steers away from the nearest enemy coming down its lane, towards the middle of the road otherwise.
+    """
+    x = client.predicted_x
+    world = client.world
+    if x is None or not len(world.enemy_x):
+        return
+    low, high = client.range_ahead(len(client.pending))
+    middle = (low + high) // 2
+    ahead = (np.abs(world.enemy_x - x) <= 150) & (world.enemy_y > PLAYER_Y - 450) & (world.enemy_y < PLAYER_Y + 150)
+    if ahead.any():
+        nearest = world.enemy_x[ahead][np.argmax(world.enemy_y[ahead])]
+        go_left = nearest > x if x - 150 > low else False
+    elif abs(x - middle) > Simulation.PLAYER_SPEED:
+        go_left = x > middle
+    else:
+        client.keys = 0
+        return
+    client.keys = LEFT_KEY if go_left else RIGHT_KEY
+
+
+async def run_bots(host, port, count, seconds):
+    clients = [RaceClient(f"BOT{i}") for i in range(count)]
+    await asyncio.gather(*(client.connect(host, port) for client in clients))
+    receivers = await asyncio.gather(*(client.run(seconds, bot_pilot) for client in clients))
+    return clients, receivers
+
+
+async def selftest(bot_count, seconds, enemy_count):
+    """
+    Runs a server and bots on localhost, then checks every client decoded the same world
+    the server last sent. Returns True if they all did.
+    """
+    server = RaceServer(enemy_count, seed=0)
+    port = await server.start("127.0.0.1", 0)
+    ticking = asyncio.create_task(server.run())
+    clients, receivers = await run_bots("127.0.0.1", port, bot_count, seconds)
+    ticking.cancel()
+    await asyncio.sleep(0.5)  # Lets the last snapshots arrive
+
+    full_count, full_bytes = server.snapshot_bytes["full"]
+    delta_count, delta_bytes = server.snapshot_bytes["delta"]
+    print(f"{bot_count} bots, {server.sim.tick} ticks in the last of {server.races} races, "
+          f"{enemy_count} enemy cars")
+    print(f"full snapshots:  {full_count:>6} averaging {full_bytes / max(full_count, 1):,.0f} bytes")
+    print(f"delta snapshots: {delta_count:>6} averaging {delta_bytes / max(delta_count, 1):,.0f} bytes")
+    print(f"send buffers dropped {sum(player.dropped for player in server.players.values())} times, "
+          f"{sum(client.corrections for client in clients)} prediction corrections, "
+          f"{sum(client.errors for client in clients)} decode errors")
+    mismatched = [client.name for client in clients if not client.world.same_as(server.previous)]
+    for client in clients:
+        client.close()
+    for receiver in receivers:
+        receiver.cancel()
+    await server.close()
+    if mismatched:
+        print("clients out of sync with the server: " + ", ".join(mismatched))
+        return False
+    print("every client is in sync with the server")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multiplayer race server, bots and a localhost self-test.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server_parser = commands.add_parser("server", help="run a race server")
+    server_parser.add_argument("--host", default="127.0.0.1")
+    server_parser.add_argument("--port", type=int, default=PORT)
+    server_parser.add_argument("--enemies", type=int, default=ENEMY_COUNT)
+    bots_parser = commands.add_parser("bots", help="connect bot players to a server")
+    bots_parser.add_argument("--host", default="127.0.0.1")
+    bots_parser.add_argument("--port", type=int, default=PORT)
+    bots_parser.add_argument("--count", type=int, default=8)
+    bots_parser.add_argument("--seconds", type=float, default=30)
+    test_parser = commands.add_parser("selftest", help="server and bots in one process on localhost")
+    test_parser.add_argument("--bots", type=int, default=24)
+    test_parser.add_argument("--seconds", type=float, default=5)
+    test_parser.add_argument("--enemies", type=int, default=ENEMY_COUNT)
+    args = parser.parse_args()
+
+    if args.command == "server":
+        async def serve():
+            server = RaceServer(args.enemies)
+            port = await server.start(args.host, args.port)
+            print(f"Race server on {args.host}:{port}")
+            await server.run()
+
+        asyncio.run(serve())
+    elif args.command == "bots":
+        asyncio.run(run_bots(args.host, args.port, args.count, args.seconds))
+    elif not asyncio.run(selftest(args.bots, args.seconds, args.enemies)):
+        sys.exit(1)
@@ -0,0 +1,176 @@
+"""
+Particles for crash debris, tyre smoke and speed streaks.
+
+Every particle lives in a row of preallocated NumPy arrays: position, velocity, size,
+growth, age, lifetime and colour. Free rows are kept on a stack, so emitting takes rows
+off it and particles that die push theirs back; nothing is allocated per particle and
+the arrays never grow. update(dt) moves, ages and kills every particle with a handful
+of array operations, however many are alive. scene.ParticleView draws them.
+
+Positions are in canvas pixels, velocities in pixels per second and times in seconds,
+so particles move at the frame rate rather than the simulation's tick rate.
+"""
+import numpy as np
+
+CAPACITY = 8192
+DRAG = 2.0  # Fraction of their speed particles lose per second, debris and smoke slow down
+
+CRASH_DEBRIS = 120
+CRASH_SMOKE = 40
+SMOKE_RATE = 4.0  # Smoke puffs per second per wheel while steering, per 10 of speed
+STREAK_MIN_SPEED = 20  # Speed lines start at this speed
+STREAK_RATE = 3.0  # Streaks per second for every speed step above STREAK_MIN_SPEED
+STREAK_Y = -40  # Screen y streaks start at, above the screen
+STREAK_GAP = (20, 140)  # Range of distances of streaks from the road's edge
+SMOKE_COLOURS = ("gray70", "gray80", "gray90")
+
+
+class ParticleSystem:
+    """
+    Up to capacity particles in flat arrays, with a stack of the free rows.
+    """
+
+    def __init__(self, capacity=CAPACITY, seed=None):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.width = np.zeros(capacity)
+        self.height = np.zeros(capacity)
+        self.grow = np.zeros(capacity)  # Pixels the size grows per second
+        self.drag = np.zeros(capacity)
+        self.age = np.zeros(capacity)
+        self.life = np.zeros(capacity)
+        self.colour = np.zeros(capacity, dtype=np.int32)  # Index into colours
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.fresh = np.zeros(capacity, dtype=bool)  # Emitted since the view last drew them
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int64)  # Stack, row 0 is handed out first
+        self.free_count = capacity
+        self.colours = []  # Tk colour names, in the order first used
+        self.colour_index = {}
+        self.dropped = 0  # Particles not emitted because every row was taken
+
+    def __len__(self):
+        return self.capacity - self.free_count
+
+    def colour_id(self, colour):
+        index = self.colour_index.get(colour)
+        if index is None:
+            index = self.colour_index[colour] = len(self.colours)
+            self.colours.append(colour)
+        return index
+
+    def emit(self, count, x, y, speed=(0, 0), angle=(0, 2 * np.pi), size=(4, 4), grow=0.0, life=(0.5, 1.0),
+             colour="white", drag=DRAG, velocity=(0, 0)):
+        """
+        Emits count particles at (x, y), each with a random speed, direction and lifetime
+        picked uniformly from the ranges given, plus velocity. x and y may also be arrays
+        of count positions. size is (width, height). Returns the rows used, fewer than
+        count when the system is full.
+        """
+        self.dropped += max(0, int(count) - self.free_count)
+        count = min(int(count), self.free_count)
+        if count <= 0:
+            return self.free[:0]
+        rows = self.free[self.free_count - count:self.free_count].copy()
+        self.free_count -= count
+        rng = self.rng
+        speeds = rng.uniform(speed[0], speed[1], count)
+        angles = rng.uniform(angle[0], angle[1], count)
+        self.x[rows] = x[:count] if np.ndim(x) else x
+        self.y[rows] = y[:count] if np.ndim(y) else y
+        self.vx[rows] = speeds * np.cos(angles) + velocity[0]
+        self.vy[rows] = speeds * np.sin(angles) + velocity[1]
+        self.width[rows] = size[0]
+        self.height[rows] = size[1]
+        self.grow[rows] = grow
+        self.drag[rows] = drag
+        self.age[rows] = 0.0
+        self.life[rows] = rng.uniform(life[0], life[1], count)
+        self.colour[rows] = self.colour_id(colour)
+        self.alive[rows] = True
+        self.fresh[rows] = True
+        return rows
+
+    def update(self, dt):
+        """
+        Moves every particle dt seconds on and frees the rows of the ones that died.
+        """
+        alive = self.alive
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        slow = np.maximum(0.0, 1.0 - self.drag * dt)
+        self.vx *= slow
+        self.vy *= slow
+        self.width += self.grow * dt
+        self.height += self.grow * dt
+        self.age += dt
+        died = np.flatnonzero(alive & (self.age >= self.life))
+        if len(died):
+            alive[died] = False
+            self.free[self.free_count:self.free_count + len(died)] = died
+            self.free_count += len(died)
+
+    def clear(self):
+        self.alive[:] = False
+        self.fresh[:] = False
+        self.free[:] = np.arange(self.capacity - 1, -1, -1)
+        self.free_count = self.capacity
+
+
+class Effects:
+    """
+    The game's effects, made of particles: a burst when the player crashes, smoke from the
+    rear wheels while steering and speed lines along the road, both growing with the speed.
+    """
+
+    def __init__(self, particles):
+        self.particles = particles
+        self.smoke_due = 0.0  # Fractions of a particle owed, so low rates still emit
+        self.streaks_due = 0.0
+
+    def crash(self, x, y, colours):
+        """
+        Debris in the car's colours and a cloud of smoke, at (x, y).
+        """
+        particles = self.particles
+        per_colour = CRASH_DEBRIS // len(colours)
+        for colour in colours:
+            particles.emit(per_colour, x, y, speed=(100, 450), size=(8, 8), life=(0.6, 1.6), colour=colour)
+        for colour in SMOKE_COLOURS:
+            particles.emit(CRASH_SMOKE // len(SMOKE_COLOURS), x, y, speed=(20, 90), size=(16, 16), grow=40.0,
+                           life=(0.8, 2.0), colour=colour)
+
+    def frame(self, dt, speed, car_x, car_y, steering, road_span):
+        """
+        Emits this frame's smoke and streaks. steering is (left, right) as sampled by the simulation.
+        road_span is the leftmost and rightmost x of the road's edges from STREAK_Y to the bottom
+        of the screen, streaks fall beside it.
+        """
+        particles = self.particles
+        if steering[0] != steering[1]:
+            self.smoke_due += SMOKE_RATE * speed / 10 * dt
+            puffs = int(self.smoke_due)
+            self.smoke_due -= puffs
+            if puffs:
+                drift = 60 if steering[0] else -60  # Smoke trails away from the way the car turns
+                colour = SMOKE_COLOURS[int(particles.rng.integers(len(SMOKE_COLOURS)))]
+                for wheel_x in (car_x - 40, car_x + 40):
+                    particles.emit(puffs, wheel_x, car_y + 70, speed=(10, 40), size=(10, 10), grow=30.0,
+                                   life=(0.4, 0.9), colour=colour, velocity=(drift, speed * 10))
+        else:
+            self.smoke_due = 0.0
+
+        if speed > STREAK_MIN_SPEED:
+            self.streaks_due += STREAK_RATE * (speed - STREAK_MIN_SPEED) * dt
+            streaks = int(self.streaks_due)
+            self.streaks_due -= streaks
+            if streaks:
+                rng = particles.rng
+                gap = rng.uniform(STREAK_GAP[0], STREAK_GAP[1], streaks)
+                x = np.where(rng.random(streaks) < 0.5, road_span[0] - gap, road_span[1] + gap)  # Either side
+                fall = speed * 40
+                particles.emit(streaks, x, STREAK_Y, size=(3, 20 + speed * 2), life=(800 / fall, 800 / fall),
+                               colour="white", drag=0.0, velocity=(0, fall))
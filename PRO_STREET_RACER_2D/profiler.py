@@ -0,0 +1,190 @@
+"""
+Per-phase frame profiler for the game loop.
+
+The loop calls start_frame(), then lap(phase) after each phase and end_frame() at the
+end. Stepping the game and drawing it are timed as separate phases, so a slow frame
+shows whether the simulation or the canvas is to blame. Timings of the last frames are
+kept in a fixed-size ring buffer, shown on an optional overlay and written to JSON so
+runs can be compared.
+"""
+import json
+import time
+from array import array
+
+from scene import TextSprite
+
+# Simulation.step laps step_traffic and step_collision on every tick, the game loop every other phase once per frame
+SIM_PHASES = ("step_traffic", "step_collision", "step_effects")
+DRAW_PHASES = ("draw_track", "draw_player", "draw_enemies", "draw_effects", "draw_hud")
+PHASES = SIM_PHASES + ("autosave",) + DRAW_PHASES + ("schedule",)  # autosave: snapshotting the world to save
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class FrameProfiler:
+    """
+    Ring buffer of per-phase timings for the last size frames.
+    """
+
+    def __init__(self, phases=PHASES, size=600, clock=time.perf_counter):
+        self.phases = phases
+        self.phase_index = {phase: i for i, phase in enumerate(phases)}
+        self.size = size
+        self.clock = clock
+        self.timings = array("d", bytes(8 * size * len(phases)))  # Row per frame, column per phase
+        self.totals = array("d", bytes(8 * size))
+        self.starts = array("d", bytes(8 * size))
+        self.position = 0
+        self.count = 0
+        self.frame_start = 0.0
+        self.last = 0.0
+
+    def start_frame(self):
+        row = self.position * len(self.phases)
+        for i in range(row, row + len(self.phases)):
+            self.timings[i] = 0.0
+        self.frame_start = self.last = self.clock()
+
+    def lap(self, phase):
+        """
+        Adds the time since the previous lap to phase in the current frame.
+        """
+        now = self.clock()
+        self.timings[self.position * len(self.phases) + self.phase_index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        now = self.clock()
+        self.totals[self.position] = now - self.frame_start
+        self.starts[self.position] = self.frame_start
+        self.position = (self.position + 1) % self.size
+        self.count += 1
+
+    def frames(self):
+        """
+        Indices of the buffered frames, oldest first.
+        """
+        if self.count < self.size:
+            return range(self.count)
+        return [(self.position + i) % self.size for i in range(self.size)]
+
+    def fps(self):
+        frames = self.frames()
+        if len(frames) < 2:
+            return 0.0
+        span = self.starts[frames[-1]] - self.starts[frames[0]]
+        return (len(frames) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        """
+        FPS, frame time percentiles and per-phase means and p99s, times in milliseconds.
+        """
+        frames = self.frames()
+        totals = sorted(self.totals[i] * 1000 for i in frames)
+        phases = {}
+        for phase, column in self.phase_index.items():
+            values = sorted(self.timings[i * len(self.phases) + column] * 1000 for i in frames)
+            phases[phase] = {
+                "mean": sum(values) / len(values) if values else 0.0,
+                "p99": percentile(values, 0.99),
+            }
+        return {
+            "frames": self.count,
+            "fps": self.fps(),
+            "p50": percentile(totals, 0.5),
+            "p99": percentile(totals, 0.99),
+            "max": totals[-1] if totals else 0.0,
+            "phases": phases,
+        }
+
+    def histogram(self, bucket_ms=1):
+        """
+        Number of buffered frames per bucket_ms wide bucket of frame time.
+        """
+        buckets = {}
+        for i in self.frames():
+            bucket = int(self.totals[i] * 1000 // bucket_ms) * bucket_ms
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        return dict(sorted(buckets.items()))
+
+    def dump(self, filename):
+        """
+        Writes the stats and the frame time histogram to a JSON file.
+        """
+        data = self.stats()
+        data["histogram_ms"] = self.histogram()
+        file = open(filename, "w")
+        json.dump(data, file, indent=2)
+        file.close()
+
+
+class ProfilerHud:
+    """
+    Overlay with FPS, frame time percentiles and the per-phase breakdown.
+    """
+    REFRESH_FRAMES = 15  # Redrawing the overlay every frame would show up in the numbers
+
+    def __init__(self, profiler, scene, x=120, y=240):
+        self.profiler = profiler
+        self.text = TextSprite(scene, x, y, fill="black", font=("Courier", 11), anchor="n", state="hidden")
+        self.visible = False
+        self.frames_since_refresh = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.text.canvas.itemconfig(self.text.item, state="normal" if self.visible else "hidden")
+        self.frames_since_refresh = self.REFRESH_FRAMES
+
+    def update(self):
+        if not self.visible:
+            return
+        self.frames_since_refresh += 1
+        if self.frames_since_refresh < self.REFRESH_FRAMES:
+            return
+        self.frames_since_refresh = 0
+        stats = self.profiler.stats()
+        lines = [f"{stats['fps']:5.1f} FPS",
+                 f"p50 {stats['p50']:6.2f} ms",
+                 f"p99 {stats['p99']:6.2f} ms"]
+        for phase, values in stats["phases"].items():
+            lines.append(f"{phase:<14} {values['mean']:6.3f}")
+        self.text.set_text("\n".join(lines))
+
+
+class StartupTimer:
+    """
+    Wall time of each phase of starting the game, in the order they ran.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.start = self.last = clock()
+        self.phases = {}
+
+    def lap(self, phase):
+        """
+        Adds the time since the previous lap to phase.
+        """
+        now = self.clock()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+    def total(self):
+        return (self.last - self.start) * 1000
+
+    def report(self):
+        for phase, milliseconds in self.phases.items():
+            print(f"{phase:<16} {milliseconds:8.1f} ms")
+        print(f"{'total':<16} {self.total():8.1f} ms")
+
+    def dump(self, filename):
+        file = open(filename, "w")
+        json.dump({"phases_ms": self.phases, "total_ms": self.total()}, file, indent=2)
+        file.close()
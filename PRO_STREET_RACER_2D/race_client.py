@@ -0,0 +1,147 @@
+"""
+A window to race in against other players on a multiplayer.py server.
+
+    python multiplayer.py server --port 7878
+    python race_client.py --port 7878 --name ALICE
+
+The movement keys and car colours come from the single player game's save file, so
+keys rebound in SETTINGS work here too. RaceClient runs on an asyncio loop in its own
+thread. Key events are handed to that loop with call_soon_threadsafe, and the Tk
+thread only reads client.world, which the client replaces whole on every snapshot
+rather than changing in place. The road is drawn from the track and road distance each
+snapshot carries, so it bends and narrows like the one the server keeps the cars on.
+"""
+import argparse
+import asyncio
+import threading
+import tkinter as tk
+
+from assets import AssetCache
+from controls import DEFAULT_KEY_BINDINGS, InputContext, InputDispatcher
+from multiplayer import PLAYER_Y, PORT, RaceClient
+from savegame import read_save
+from scene import ImageSprite, Scene, SpriteCache, TextSprite, TrackView
+from scheduler import Scheduler
+from simulation import default_game_state
+from track import Track, TrackRing
+
+FRAME_MS = 16
+OTHER_COLOURS = ("gray60", "gray30")  # Other players' cars
+ENEMY_COLOURS = ("Red", "Dark Red")
+
+
+class RaceWindow:
+    """
+    Draws the client's world on a canvas and forwards the movement keys to the client.
+    """
+
+    def __init__(self, root, scheduler, assets, client, loop, connection, key_bindings, colours):
+        self.root = root
+        self.client = client
+        self.loop = loop
+        self.connection = connection  # Future of race(), done once the server has gone
+        self.colours = colours
+        self.scheduler = scheduler
+        self.sprites = SpriteCache(root)
+        self.canvas = tk.Canvas(root, width=1000, height=700, bg="#2e8b57", highlightthickness=0)
+        self.canvas.pack()
+        self.scene = Scene(self.canvas, self.sprites)
+        self.track = TrackView(TrackRing(Track(client.world.track_seed)), self.scene)
+        self.status = TextSprite(self.scene, 500, 30, "CONNECTING", fill="white", font=assets.font("PIXY", 24))
+        self.cars = {}  # Player id -> sprite
+        self.enemies = []
+        self.dispatcher = InputDispatcher(root, key_bindings)
+        self.dispatcher.push(InputContext("race", actions={
+            "move_left": (self.key_handler("key_down", "move_left"), self.key_handler("key_up", "move_left")),
+            "move_right": (self.key_handler("key_down", "move_right"), self.key_handler("key_up", "move_right")),
+        }, on_suspend=self.release_keys))
+        self.scheduler.call_later(FRAME_MS, self.frame)
+
+    def key_handler(self, method, action):
+        def handler(event):
+            self.loop.call_soon_threadsafe(getattr(self.client, method), action)
+        return handler
+
+    def release_keys(self):
+        for action in ("move_left", "move_right"):
+            self.loop.call_soon_threadsafe(self.client.key_up, action)
+
+    def track_for(self, seed):
+        """
+        The ring's track if it has this seed, a new one after the server starts a race on another.
+        """
+        track = self.track.ring.track
+        return track if track.seed == seed else Track(seed)
+
+    def car_sprite(self, colours, direction):
+        return ImageSprite(self.scene, 0, -1000, self.sprites.car(colours[0], colours[1], direction), "car")
+
+    def frame(self):
+        if self.connection.done():
+            self.root.destroy()
+            return
+        client = self.client
+        world = client.world
+        self.track.ring.set_track(self.track_for(world.track_seed))
+        self.track.update(world.road)
+        while len(self.enemies) < len(world.enemy_x):
+            self.enemies.append(self.car_sprite(ENEMY_COLOURS, 1))
+        for sprite, x, y in zip(self.enemies, world.enemy_x, world.enemy_y):
+            sprite.move_to(int(x), int(y))
+
+        for player_id in [player_id for player_id in self.cars if player_id not in world.players]:
+            self.cars.pop(player_id).delete()
+        for player_id, (x, alive, score) in world.players.items():
+            sprite = self.cars.get(player_id)
+            if sprite is None:
+                own = player_id == client.player_id
+                sprite = self.cars[player_id] = self.car_sprite(self.colours if own else OTHER_COLOURS, 0)
+            if player_id == client.player_id and client.predicted_x is not None:
+                x = client.predicted_x
+            sprite.move_to(x, PLAYER_Y)
+            sprite.set_hidden(not alive)
+        me = client.me()
+        if me is None:
+            self.status.set_text("CONNECTING")
+        elif me[1]:
+            self.status.set_text(f"SCORE {me[2]}")
+        else:
+            self.status.set_text(f"SCORE {me[2]}  WAITING FOR THE NEXT RACE")
+        self.scheduler.call_later(FRAME_MS, self.frame)
+
+
+async def race(client, host, port):
+    await client.connect(host, port)
+    receiver = await client.run(float("inf"))
+    receiver.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Race against other players on a multiplayer.py server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--name", default="PLAYER")
+    args = parser.parse_args()
+
+    game_state = default_game_state.copy()
+    key_bindings = DEFAULT_KEY_BINDINGS.copy()
+    read_save(game_state, key_bindings)
+
+    client = RaceClient(args.name)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="race-client", daemon=True).start()
+    connection = asyncio.run_coroutine_threadsafe(race(client, args.host, args.port), loop)
+
+    root = tk.Tk()
+    root.title("PRO STREET RACER 2D - " + args.name)
+    root.geometry("1000x700+100+100")
+    root.resizable(False, False)
+    scheduler = Scheduler(root)
+    assets = AssetCache(root, scheduler)
+    assets.register_font("PIXY.ttf")
+    RaceWindow(root, scheduler, assets, client, loop, connection, key_bindings,
+               (game_state["car_colour_1"], game_state["car_colour_2"]))
+    root.mainloop()
+    if connection.done() and connection.exception():
+        print(f"lost the server: {connection.exception()!r}")
+    loop.call_soon_threadsafe(client.close)
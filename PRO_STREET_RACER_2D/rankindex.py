@@ -0,0 +1,156 @@
+"""
+Rank index over every recorded score.
+
+Results are counted in fixed-width score buckets held in a Fenwick tree, so recording
+a result and asking for the rank or percentile of a score both cost O(log n) in the
+number of buckets, however many results there are. Scores in the same bucket count
+as tied.
+
+On disk only the non-empty buckets are stored, as (bucket, count) pairs behind a
+small versioned header.
+"""
+import struct
+from array import array
+
+import numpy as np
+
+from files import write_atomic
+
+BUCKET_WIDTH = 10
+MAX_BUCKETS = 1 << 20  # Scores past MAX_BUCKETS * BUCKET_WIDTH all share the last bucket
+MAGIC = b"PSRR"
+VERSION = 1
+HEADER = struct.Struct("<4sHIQI")  # Magic, version, bucket width, total results, stored buckets
+
+
+class RankIndex:
+    """
+    Counts of results per score bucket, with prefix sums in a Fenwick tree.
+    """
+
+    def __init__(self, bucket_width=BUCKET_WIDTH, capacity=1024):
+        self.bucket_width = bucket_width
+        self.counts = array("q", bytes(8 * capacity))
+        self.tree = array("q", bytes(8 * (capacity + 1)))  # 1-based
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def bucket(self, score):
+        return min(max(int(score) // self.bucket_width, 0), MAX_BUCKETS - 1)
+
+    def grow(self, bucket):
+        capacity = len(self.counts)
+        while capacity <= bucket:
+            capacity *= 2
+        self.counts.frombytes(bytes(8 * (capacity - len(self.counts))))
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Builds the Fenwick tree from the bucket counts in O(n). Node i covers the buckets
+        (i - lowbit(i), i], so it is a difference of two prefix sums.
+        """
+        size = len(self.counts)
+        prefix = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self.counts, dtype=np.int64), out=prefix[1:])
+        nodes = np.arange(size + 1)
+        tree = prefix - prefix[nodes - (nodes & -nodes)]
+        self.tree = array("q", tree.tobytes())
+
+    def add(self, score, count=1):
+        bucket = self.bucket(score)
+        if bucket >= len(self.counts):
+            self.grow(bucket)
+        self.counts[bucket] += count
+        self.total += count
+        tree = self.tree
+        size = len(self.counts)
+        i = bucket + 1
+        while i <= size:
+            tree[i] += count
+            i += i & -i
+
+    def count_before(self, bucket):
+        """
+        Number of results in the buckets below bucket.
+        """
+        tree = self.tree
+        i = min(bucket, len(self.counts))
+        found = 0
+        while i > 0:
+            found += tree[i]
+            i -= i & -i
+        return found
+
+    def rank(self, score):
+        """
+        1 + the number of results in higher buckets.
+        """
+        return self.total - self.count_before(self.bucket(score) + 1) + 1
+
+    def percentile(self, score):
+        """
+        Percentage of results that scored lower.
+        """
+        if not self.total:
+            return 100.0
+        return 100.0 * self.count_before(self.bucket(score)) / self.total
+
+    def snapshot(self):
+        """
+        Copy of the counts to serialise on another thread. Only good for to_bytes.
+        """
+        copy = RankIndex(self.bucket_width, capacity=1)
+        copy.counts = self.counts[:]
+        copy.total = self.total
+        return copy
+
+    def to_bytes(self):
+        """
+        The file's bytes. Finds the non-empty buckets with NumPy, a loop over a million
+        buckets would hold the GIL for the whole write.
+        """
+        counts = np.frombuffer(self.counts, dtype=np.int64)
+        buckets = np.flatnonzero(counts)
+        header = HEADER.pack(MAGIC, VERSION, self.bucket_width, self.total, len(buckets))
+        return header + buckets.astype("<u4").tobytes() + counts[buckets].astype("<u4").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, bucket_width, total, stored = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a rank index file")
+        start = HEADER.size
+        if len(data) != start + 8 * stored:
+            raise ValueError("truncated rank index file")
+        buckets = np.frombuffer(data, dtype="<u4", count=stored, offset=start)
+        counts = np.frombuffer(data, dtype="<u4", count=stored, offset=start + 4 * stored)
+        index = cls(bucket_width)
+        if stored:
+            index.counts = array("q", bytes(8 * max(len(index.counts), int(buckets[-1]) + 1)))
+            np.frombuffer(index.counts, dtype=np.int64)[buckets] = counts
+        index.total = total
+        index.rebuild()
+        return index
+
+    def save(self, filename):
+        write_atomic(filename, self.to_bytes())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Returns the index stored in filename, or None if there is no usable file.
+        """
+        try:
+            file = open(filename, "rb")
+            data = file.read()
+            file.close()
+            return cls.from_bytes(data)
+        except FileNotFoundError:
+            print(f"file {filename} not found")
+            return None
+        except (ValueError, struct.error):
+            print(f"file {filename} is not valid")
+            return None
@@ -0,0 +1,222 @@
+"""
+Replay recording and headless playback.
+
+A replay is the seed and starting state of a session plus every input and outside
+change (cheat modes, custom score, quick load) tagged with the tick it happened at.
+The simulation is deterministic given those, so playing a replay back reproduces
+the session exactly, and much faster than real time:
+
+    python replay.py replays/20240101-120000-1234.psr   # verifies the final score
+
+Records are (tick, event, value) int64 triples buffered in an array and appended to
+the file as the game runs. A quick load is followed by the packed world it loaded.
+"""
+import argparse
+import atexit
+import os
+import struct
+import sys
+import time
+from array import array
+
+from files import little_endian
+from savegame import pack_world, unpack_world
+from simulation import Simulation, default_game_state
+
+REPLAY_DIR = "replays"
+KEEP_REPLAYS = 100  # Older replays are deleted when a new session starts
+MAGIC = b"PSRP"
+VERSION = 2  # 2 keeps the cars on the track's road and holds version 2 worlds
+# Magic, version, seed, enemy cars, score, speed, player x, player y, enemy x, enemy y,
+# invincibility, mirrored controls
+HEADER = struct.Struct("<4sHQIqqqqqq??")
+RECORD = struct.Struct("<qqq")
+FLUSH_WORDS = 3 * 512  # Records kept in memory before they are appended to the file
+
+MOVE_LEFT = 0
+MOVE_RIGHT = 1
+MODES = 2  # Value: bit 0 invincibility, bit 1 mirrored controls
+SET_SCORE = 3
+WORLD = 4  # Value: length of the packed world that follows, padded to 8 bytes
+END = 5  # Value: final score
+KEYS = 6  # Value: movement keys sampled from then on, bit 0 left, bit 1 right
+ACTIONS = {"move_left": MOVE_LEFT, "move_right": MOVE_RIGHT}
+ACTION_NAMES = {code: action for action, code in ACTIONS.items()}
+
+
+class ReplayRecorder:
+    """
+    Appends a session's events to a replay file. Attach it as Simulation.recorder.
+    """
+
+    def __init__(self, filename, state, seed, enemy_count):
+        self.filename = filename
+        self.words = array("q")
+        self.file = open(filename, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, enemy_count, state["score"], state["speed"],
+                                    state["player_car_x"], state["player_car_y"], state["enemy_car_x"],
+                                    state["enemy_car_y"], state["invincibility_mode"], state["mirrored_controls"]))
+        atexit.register(self.close)
+
+    def record(self, tick, event, value=0):
+        self.words.append(tick)
+        self.words.append(event)
+        self.words.append(value)
+        if len(self.words) >= FLUSH_WORDS:
+            self.flush()
+
+    def record_input(self, tick, action):
+        self.record(tick, ACTIONS[action])
+
+    def record_keys(self, tick, left, right):
+        self.record(tick, KEYS, int(left) | int(right) << 1)
+
+    def record_modes(self, tick, invincibility_mode, mirrored_controls):
+        self.record(tick, MODES, int(invincibility_mode) | int(mirrored_controls) << 1)
+
+    def record_score(self, tick, score):
+        self.record(tick, SET_SCORE, score)
+
+    def record_world(self, tick, snapshot):
+        data = pack_world(snapshot)
+        self.record(tick, WORLD, len(data))
+        self.flush()
+        self.file.write(data + bytes(-len(data) % 8))
+
+    def flush(self):
+        if self.file and self.words:
+            self.file.write(little_endian(self.words).tobytes())
+            self.words = array("q")
+
+    def finish(self, tick, score):
+        """
+        Records the final score and closes the file.
+        """
+        if self.file:
+            self.record(tick, END, score)
+            self.close()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+        atexit.unregister(self.close)  # Otherwise every session's recorder stays alive until exit
+
+
+def new_replay_path(seed, directory=REPLAY_DIR, keep=KEEP_REPLAYS):
+    """
+    Path for a new replay, after deleting the oldest ones beyond keep.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".psr"))
+    for name in names[:max(0, len(names) - keep + 1)]:
+        os.remove(os.path.join(directory, name))
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{seed}.psr")
+
+
+def read_replay(filename):
+    """
+    Returns (header, events): the header fields as a dict and a list of
+    (tick, event, value) with the world snapshot as the value of WORLD events.
+    """
+    file = open(filename, "rb")
+    data = file.read()
+    file.close()
+    try:
+        (magic, version, seed, enemy_count, score, speed, player_x, player_y, enemy_x, enemy_y,
+         invincible, mirrored) = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError(f"{filename} is not a replay")
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{filename} is not a replay")
+    state = default_game_state.copy()
+    state.update(score=score, speed=speed, player_car_x=player_x, player_car_y=player_y, enemy_car_x=enemy_x,
+                 enemy_car_y=enemy_y, invincibility_mode=invincible, mirrored_controls=mirrored)
+    header = {"seed": seed, "enemy_count": enemy_count, "state": state}
+
+    events = []
+    position = HEADER.size
+    while position + RECORD.size <= len(data):
+        tick, event, value = RECORD.unpack_from(data, position)
+        position += RECORD.size
+        if event == WORLD:
+            value, position = unpack_world(data[position:position + value]), position + value + (-value % 8)
+        events.append((tick, event, value))
+    return header, events
+
+
+def play(header, events):
+    """
+    Runs a replay headless as fast as possible. Returns the simulation and the final
+    score the recording claims, None if the session never ended properly.
+    """
+    sim = Simulation(header["state"], header["seed"], header["enemy_count"])
+    claimed = None
+    for tick, event, value in events:
+        while sim.tick < tick and sim.step():
+            pass
+        if event in ACTION_NAMES:
+            sim.apply_input(ACTION_NAMES[event])
+        elif event == MODES:
+            sim.set_modes(bool(value & 1), bool(value & 2))
+        elif event == SET_SCORE:
+            sim.set_score(value)
+        elif event == WORLD:
+            sim.restore(value)
+        elif event == KEYS:
+            sim.held["move_left"] = bool(value & 1)
+            sim.held["move_right"] = bool(value & 2)
+        elif event == END:
+            claimed = value
+    return sim, claimed
+
+
+def cheats_used(header, events):
+    """
+    Names of the things in a replay that make its score not a fair one.
+    """
+    found = set()
+    if header["state"]["invincibility_mode"]:
+        found.add("invincibility")
+    for tick, event, value in events:
+        if event == MODES and value & 1:
+            found.add("invincibility")
+        elif event == SET_SCORE:
+            found.add("custom score")
+        elif event == WORLD:
+            found.add("loaded a saved world")
+    return sorted(found)
+
+
+def verify(filename):
+    """
+    Plays a replay back and prints whether it reproduces the recorded score.
+    Returns True if it does.
+    """
+    header, events = read_replay(filename)
+    start = time.perf_counter()
+    sim, claimed = play(header, events)
+    elapsed = time.perf_counter() - start
+    rate = sim.tick / elapsed if elapsed else float("inf")
+    print(f"{filename}: {sim.tick} ticks, score {sim.score}, {rate:,.0f} ticks/s")
+    cheats = cheats_used(header, events)
+    if cheats:
+        print("  used: " + ", ".join(cheats))
+    if claimed is None:
+        print("  unfinished session, nothing to verify")
+        return False
+    if claimed != sim.score:
+        print(f"  MISMATCH: recorded score {claimed}")
+        return False
+    print("  score verified")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play replays back headless and check their scores.")
+    parser.add_argument("replays", nargs="+")
+    args = parser.parse_args()
+    results = [verify(filename) for filename in args.replays]
+    if not all(results):
+        sys.exit(1)
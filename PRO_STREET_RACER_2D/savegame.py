@@ -0,0 +1,201 @@
+"""
+Reading and writing the save files.
+
+save.json holds the settings, the cheat codes and the scalar game state as compact
+JSON. World snapshots (every car, the track's seed, the speed and the random generator, see
+Simulation.snapshot) go into small versioned binary files. SaveWriter writes both on
+a background thread so saving never stalls a frame, and every write is atomic.
+"""
+import atexit
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from files import write_atomic
+
+SAVE = "save.json"
+SAVE_VERSION = 2
+WORLD = "world.sav"  # Autosave, and the game left from the pause menu
+QUICKSAVE = "quicksave.sav"
+
+WORLD_MAGIC = b"PSRW"
+WORLD_VERSION = 2  # 2 has the track seed where 1 had the road lines, which the game no longer steps
+# Magic, version, enemy cars, track seed, tick, score, speed, speed timer, road, traffic length,
+# player x, player y, invincibility, mirrored controls
+WORLD_HEADER = struct.Struct("<4sHIQqqqdqqqq??")
+# Random generator: version, 625 words of Mersenne Twister state, whether a gauss value is cached, the value
+RNG_FORMAT = struct.Struct("<B625I?d")
+
+
+def write_save(game_state, key_bindings, filename=SAVE, cheat_codes=None):
+    """
+    Saves game state, key bindings and, if given, the cheat codes.
+    """
+    data = {
+        "version": SAVE_VERSION,
+        "game_state": game_state,
+        "key_bindings": key_bindings
+    }
+    if cheat_codes is not None:
+        data["cheat_codes"] = cheat_codes
+    write_atomic(filename, json.dumps(data, separators=(",", ":")))
+
+
+class SaveVersionError(ValueError):
+    """
+    The save file was written by a newer version of the game.
+    """
+
+
+def read_save(game_state, key_bindings, filename=SAVE, cheat_codes=None):
+    """
+    Updates game state, key bindings and, if given, the cheat codes in place from the
+    save file. Returns False when there is no save file, raises SaveVersionError when
+    it is from a newer version.
+    """
+    if not os.path.exists(filename):
+        return False
+    file = open(filename, "r")
+    data = json.loads(file.read())
+    file.close()
+    if data.get("version", 1) > SAVE_VERSION:
+        raise SaveVersionError(f"file {filename} is from a newer version of the game")
+    if "game_state" in data:
+        game_state.update(data["game_state"])
+    if "key_bindings" in data:
+        key_bindings.update(data["key_bindings"])
+    if cheat_codes is not None and "cheat_codes" in data:
+        cheat_codes.update(data["cheat_codes"])
+    return True
+
+
+def pack_world(snapshot):
+    enemy_x = np.asarray(snapshot["enemy_x"], dtype="<i8")
+    enemy_y = np.asarray(snapshot["enemy_y"], dtype="<i8")
+    rng_version, words, gauss = snapshot["rng"]
+    header = WORLD_HEADER.pack(WORLD_MAGIC, WORLD_VERSION, len(enemy_x), snapshot["track_seed"], snapshot["tick"],
+                               snapshot["score"], snapshot["speed"], snapshot["speed_timer"], snapshot["road"],
+                               snapshot["traffic_length"], snapshot["player_x"], snapshot["player_y"],
+                               snapshot["invincibility_mode"], snapshot["mirrored_controls"])
+    rng = RNG_FORMAT.pack(rng_version, *words, gauss is not None, gauss or 0.0)
+    return header + rng + enemy_x.tobytes() + enemy_y.tobytes()
+
+
+def unpack_world(data):
+    """
+    Snapshot from pack_world's bytes. Raises ValueError if they are not a world save.
+    """
+    try:
+        (magic, version, enemies, track_seed, tick, score, speed, speed_timer, road, traffic_length,
+         player_x, player_y, invincible, mirrored) = WORLD_HEADER.unpack_from(data)
+        rng = RNG_FORMAT.unpack_from(data, WORLD_HEADER.size)
+    except struct.error:
+        raise ValueError("not a world save")
+    if magic != WORLD_MAGIC or version != WORLD_VERSION:
+        raise ValueError("not a world save")
+    start = WORLD_HEADER.size + RNG_FORMAT.size
+    if len(data) != start + 16 * enemies:
+        raise ValueError("truncated world save")
+    arrays = np.frombuffer(data, dtype="<i8", offset=start).astype(np.int64)
+    return {
+        "tick": tick,
+        "score": score,
+        "speed": speed,
+        "speed_timer": speed_timer,
+        "road": road,
+        "traffic_length": traffic_length,
+        "invincibility_mode": invincible,
+        "mirrored_controls": mirrored,
+        "track_seed": track_seed,
+        "player_x": player_x,
+        "player_y": player_y,
+        "enemy_x": arrays[:enemies],
+        "enemy_y": arrays[enemies:],
+        "rng": (rng[0], rng[1:626], rng[627] if rng[626] else None),
+    }
+
+
+def write_world(snapshot, filename=WORLD):
+    write_atomic(filename, pack_world(snapshot))
+
+
+def read_world(filename=WORLD):
+    """
+    Returns the snapshot stored in filename, or None if there is no usable file.
+    """
+    if not os.path.exists(filename):
+        return None
+    file = open(filename, "rb")
+    data = file.read()
+    file.close()
+    try:
+        return unpack_world(data)
+    except ValueError:
+        print(f"file {filename} is not valid")
+        return None
+
+
+def remove_file(filename):
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+class SaveWriter:
+    """
+    Background thread that runs file writes queued with submit(). Writes to the same
+    file that pile up are collapsed, only the latest one runs.
+    """
+
+    def __init__(self):
+        self.pending = {}  # Filename -> (function, args)
+        self.busy = False
+        self.closed = False
+        self.on_write = None  # Optional on_write(filename, seconds), called on the writer thread
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="save-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, filename, function, *args):
+        """
+        Queues function(*args), which writes filename. The arguments must not change
+        afterwards, pass copies or snapshots.
+        """
+        with self.condition:
+            self.pending[filename] = (function, args)
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                filename, (function, args) = self.pending.popitem()
+                self.busy = True
+            start = time.perf_counter()
+            try:
+                function(*args)
+            except Exception as error:  # Anything else would end the thread and every save after it
+                print(f"could not write {filename}: {error!r}")
+            if self.on_write:
+                self.on_write(filename, time.perf_counter() - start)
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def close(self):
+        """
+        Writes what is still queued and stops the thread.
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
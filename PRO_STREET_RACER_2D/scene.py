@@ -0,0 +1,477 @@
+"""
+Retained-mode drawing for the game canvas.
+
+Every sprite creates its canvas items once under its own tag and is afterwards only
+moved with canvas.move or updated with canvas.itemconfig, and only when its state
+actually changed. With a SpriteCache, cars are one image item each instead of eight
+rectangles, rasterised once per colour scheme and direction. TrackView scrolls the whole road with
+one canvas.move per frame. ParticleView draws every particle with one call into Tcl per frame.
+CallCounter wraps a canvas to count how many calls reach Tcl.
+"""
+import argparse
+import tkinter as tk
+from collections import OrderedDict
+
+import numpy as np
+
+from simulation import Simulation, default_game_state
+from track import CHUNK_LENGTH, MAX_LANES, MAX_PROPS, ROAD_CENTRE, TAPER, VIEW_LENGTH, TrackRing
+
+
+class CountedTcl:
+    """
+    A canvas's Tcl interpreter as seen through a CallCounter: tk.call and tk.eval count as calls.
+    """
+
+    def __init__(self, counter, interpreter):
+        self.counter = counter
+        self.tk = interpreter
+
+    def __getattr__(self, name):
+        return getattr(self.tk, name)
+
+    def call(self, *args):
+        self.counter.calls += 1
+        return self.tk.call(*args)
+
+    def eval(self, script):
+        self.counter.calls += 1
+        return self.tk.eval(script)
+
+
+class CallCounter:
+    """
+    Wraps a canvas and counts every method call made through it, and every call made
+    straight into Tcl through its tk.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.tk = CountedTcl(self, canvas.tk)
+        self.calls = 0
+        self.frame_calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.canvas, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+    def end_frame(self):
+        """
+        Stores the number of calls made since the previous frame and starts counting again.
+        """
+        self.frame_calls = self.calls
+        self.calls = 0
+        return self.frame_calls
+
+
+class Scene:
+    """
+    Owns the canvas and hands out unique tags to sprites.
+    """
+
+    def __init__(self, canvas, sprites=None):
+        self.canvas = canvas
+        self.sprites = sprites  # SpriteCache, or None to draw cars from rectangles
+        self.next_tag = 0
+
+    def new_tag(self, prefix):
+        self.next_tag += 1
+        return f"{prefix}{self.next_tag}"
+
+
+class Sprite:
+    """
+    A group of rectangles drawn around (x, y) and moved as one unit.
+    Shapes are (left, top, right, bottom, colour) offsets from the sprite's position.
+    """
+
+    def __init__(self, scene, x, y, shapes, prefix="sprite"):
+        self.canvas = scene.canvas
+        self.tag = scene.new_tag(prefix)
+        self.x = x
+        self.y = y
+        self.hidden = False
+        for left, top, right, bottom, colour in shapes:
+            self.canvas.create_rectangle(x + left, y + top, x + right, y + bottom, outline=colour, fill=colour,
+                                         width=0, tags=self.tag)
+
+    def move_to(self, x, y):
+        """
+        Moves every item of the sprite, skipping the call when the position is unchanged.
+        """
+        if x == self.x and y == self.y:
+            return
+        self.canvas.move(self.tag, x - self.x, y - self.y)
+        self.x = x
+        self.y = y
+
+    def set_hidden(self, hidden):
+        if hidden != self.hidden:
+            self.canvas.itemconfig(self.tag, state="hidden" if hidden else "normal")
+            self.hidden = hidden
+
+    def delete(self):
+        self.canvas.delete(self.tag)
+
+
+class ImageSprite(Sprite):
+    """
+    A single image item centred on (x, y). Keeps the image so it stays alive while shown.
+    """
+
+    def __init__(self, scene, x, y, image, prefix="sprite"):
+        self.canvas = scene.canvas
+        self.tag = scene.new_tag(prefix)
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.image = image
+        self.canvas.create_image(x, y, image=image, tags=self.tag)
+
+
+class TextSprite:
+    """
+    A canvas text item that is only reconfigured when its text changes.
+    """
+
+    def __init__(self, scene, x, y, text="", **options):
+        self.canvas = scene.canvas
+        self.text = text
+        self.item = self.canvas.create_text(x, y, text=text, **options)
+
+    def set_text(self, text):
+        if text != self.text:
+            self.canvas.itemconfig(self.item, text=text)
+            self.text = text
+
+    def delete(self):
+        self.canvas.delete(self.item)
+
+
+def car_shapes(colour1, colour2, direction):
+    """
+    Rectangles of a car centred on (0, 0). Direction 1 is an oncoming car.
+    """
+    roof = -30
+    light = -85
+    if direction == 1:
+        roof = -60
+        light = 75
+    return [
+        (-50, -75, 50, 75, colour1),
+        (-40, roof, 40, roof + 90, colour2),
+        (-65, -65, -50, -20, "black"),
+        (50, -65, 65, -20, "black"),
+        (-65, 20, -50, 65, "black"),
+        (50, 20, 65, 65, "black"),
+        (-40, light, -20, light + 10, "gold"),
+        (20, light, 40, light + 10, "gold"),
+    ]
+
+
+def shapes_bounds(shapes):
+    """
+    (left, top, right, bottom) around all the shapes.
+    """
+    return (min(shape[0] for shape in shapes), min(shape[1] for shape in shapes),
+            max(shape[2] for shape in shapes), max(shape[3] for shape in shapes))
+
+
+class SpriteCache:
+    """
+    Car images rasterised from car_shapes, one per (colour1, colour2, direction), with the
+    least recently used dropped past capacity. Shared by every game and the car preview.
+    """
+
+    def __init__(self, master, capacity=32):
+        self.master = master
+        self.capacity = capacity
+        self.images = OrderedDict()
+        self.hex_colours = {}  # Colour name -> "#rrggbb"
+
+    def __len__(self):
+        return len(self.images)
+
+    def hex_colour(self, colour):
+        value = self.hex_colours.get(colour)
+        if value is None:
+            red, green, blue = self.master.winfo_rgb(colour)
+            value = self.hex_colours[colour] = f"#{red >> 8:02x}{green >> 8:02x}{blue >> 8:02x}"
+        return value
+
+    def car(self, colour1, colour2, direction):
+        """
+        The car image, centred on the car's position like car_shapes.
+        """
+        key = (colour1, colour2, direction)
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        shapes = car_shapes(colour1, colour2, direction)
+        left, top, right, bottom = shapes_bounds(shapes)
+        # Symmetric around the centre, so an image item anchored at its centre lines up.
+        half_width = max(-left, right)
+        half_height = max(-top, bottom)
+        image = tk.PhotoImage(master=self.master, width=2 * half_width, height=2 * half_height)
+        for shape_left, shape_top, shape_right, shape_bottom, colour in shapes:
+            image.put(self.hex_colour(colour), to=(shape_left + half_width, shape_top + half_height,
+                                                   shape_right + half_width, shape_bottom + half_height))
+        self.images[key] = image
+        if len(self.images) > self.capacity:
+            self.images.popitem(last=False)  # Sprites still on a canvas keep their own reference
+        return image
+
+
+SNAP_DISTANCE = 200  # Respawning cars and quick loads jump further than any tick moves
+
+
+def interpolate(previous, current, alpha):
+    """
+    Position between the previous and the current simulation step, alpha from 0 to 1.
+    """
+    if abs(current - previous) > SNAP_DISTANCE:
+        return current
+    return previous + (current - previous) * alpha
+
+
+ROAD_COLOUR = "#797c7e"
+PROP_STYLES = {"tree": ("forest green", 70), "bush": ("olive drab", 40), "rock": ("gray45", 30)}  # Colour, size
+
+
+class TrackView:
+    """
+    The road, drawn from a track.TrackRing. Every slot of the ring has its canvas items made
+    once: the road, its two edges, a dashed line between each pair of lanes and the roadside
+    objects, with the ones a chunk does not use hidden. All of them share one tag, so
+    scrolling is a single canvas.move; only a slot that gets a new chunk is reshaped.
+    """
+
+    def __init__(self, ring, scene, screen_bottom=VIEW_LENGTH):
+        self.ring = ring
+        self.canvas = scene.canvas
+        self.tag = scene.new_tag("track")
+        self.screen_bottom = screen_bottom
+        self.road = None  # Road distance the items are drawn at
+        self.slots = []
+        canvas = self.canvas
+        for _ in range(ring.size):
+            self.slots.append({
+                "road": canvas.create_polygon(0, 0, 0, 0, 0, 0, fill=ROAD_COLOUR, outline="", tags=self.tag),
+                "edges": [canvas.create_line(0, 0, 0, 0, fill="grey", width=20, tags=self.tag) for _ in range(2)],
+                "lanes": [canvas.create_line(0, 0, 0, 0, fill="white", width=20, dash=(100, 100), tags=self.tag)
+                          for _ in range(MAX_LANES - 1)],
+                "props": [canvas.create_oval(0, 0, 0, 0, width=0, state="hidden", tags=self.tag)
+                          for _ in range(MAX_PROPS)],
+            })
+
+    def update(self, road):
+        """
+        Scrolls the road to distance road, which may be between two simulation steps.
+        """
+        if self.road is not None and road != self.road:
+            self.canvas.move(self.tag, 0, road - self.road)
+        self.road = road
+        for slot in self.ring.advance(road):
+            self.draw_slot(slot)
+
+    def point(self, chunk, distance, across):
+        """
+        Screen position distance into chunk, across lanes from the road's centre.
+        """
+        x = ROAD_CENTRE + chunk.offset_at(distance) + across * chunk.half_width(distance)
+        return x, self.screen_bottom - (chunk.index * CHUNK_LENGTH + distance - self.road)
+
+    def draw_slot(self, slot):
+        chunk = self.ring.chunks[slot]
+        items = self.slots[slot]
+        canvas = self.canvas
+        left = [self.point(chunk, distance, -1) for distance in (0, TAPER, CHUNK_LENGTH)]
+        right = [self.point(chunk, distance, 1) for distance in (CHUNK_LENGTH, TAPER, 0)]
+        canvas.coords(items["road"], *[value for point in left + right for value in point])
+        canvas.coords(items["edges"][0], *[value for point in left for value in point])
+        canvas.coords(items["edges"][1], *[value for point in right for value in point])
+
+        for i, item in enumerate(items["lanes"]):
+            if i < chunk.lanes - 1:
+                across = (2 * (i + 1) - chunk.lanes) / chunk.lanes  # Fraction of the half width
+                canvas.coords(item, *self.point(chunk, TAPER, across), *self.point(chunk, CHUNK_LENGTH, across))
+                canvas.itemconfig(item, state="normal")
+            else:
+                canvas.itemconfig(item, state="hidden")
+
+        for i, item in enumerate(items["props"]):
+            if i < len(chunk.props):
+                kind, side, distance, gap = chunk.props[i]
+                colour, size = PROP_STYLES[kind]
+                x, y = self.point(chunk, distance, side)
+                x += side * (gap + size / 2)
+                canvas.coords(item, x - size / 2, y - size / 2, x + size / 2, y + size / 2)
+                canvas.itemconfig(item, fill=colour, state="normal")
+            else:
+                canvas.itemconfig(item, state="hidden")
+
+    def delete(self):
+        self.canvas.delete(self.tag)
+
+
+# Draws a frame of particles in one call: shows the new ones in their colour, hides the ones
+# that died and moves every live one. Tkinter hands Tcl the lists as they are, so the
+# coordinates are never formatted into text.
+PARTICLE_PROC = """
+proc psr_draw_particles {canvas shown colours hidden coords} {
+    foreach item $shown colour $colours {$canvas itemconfigure $item -fill $colour -state normal}
+    foreach item $hidden {$canvas itemconfigure $item -state hidden}
+    foreach {item x0 y0 x1 y1} $coords {$canvas coords $item $x0 $y0 $x1 $y1}
+}
+"""
+
+
+class ParticleView:
+    """
+    Draws a particles.ParticleSystem. Each row of the system gets a rectangle item the first
+    time it is used, kept for good and hidden while the row is free. A frame is one call
+    into Tcl however many particles are alive, see PARTICLE_PROC.
+    """
+
+    def __init__(self, particles, scene):
+        self.particles = particles
+        self.canvas = scene.canvas
+        self.tag = scene.new_tag("particles")
+        self.items = np.zeros(particles.capacity, dtype=np.int64)  # Canvas item of each row, 0 until used
+        self.shown = np.zeros(particles.capacity, dtype=bool)
+        self.canvas.tk.eval(PARTICLE_PROC)
+
+    def draw(self):
+        particles = self.particles
+        alive = particles.alive
+
+        fresh = np.flatnonzero(particles.fresh & alive)
+        particles.fresh[:] = False
+        for row in fresh[self.items[fresh] == 0]:
+            self.items[row] = self.canvas.create_rectangle(0, 0, 0, 0, width=0, state="hidden", tags=self.tag)
+        colours = particles.colours
+        fresh_colours = tuple(colours[colour] for colour in particles.colour[fresh].tolist())
+        self.shown[fresh] = True
+
+        gone = np.flatnonzero(self.shown & ~alive)
+        self.shown[gone] = False
+
+        rows = np.flatnonzero(alive)
+        if not len(rows) and not len(gone):
+            return
+        x = particles.x[rows]
+        y = particles.y[rows]
+        half_width = particles.width[rows] / 2
+        half_height = particles.height[rows] / 2
+        coords = np.column_stack((self.items[rows], x - half_width, y - half_height, x + half_width, y + half_height))
+        self.canvas.tk.call("psr_draw_particles", self.canvas._w, tuple(self.items[fresh].tolist()), fresh_colours,
+                            tuple(self.items[gone].tolist()), tuple(coords.ravel().tolist()))
+
+    def delete(self):
+        self.canvas.delete(self.tag)
+        self.items[:] = 0
+        self.shown[:] = False
+
+
+class Car:
+    """
+    A car in the game, drawn from a simulation.Car.
+    """
+
+    def __init__(self, model, colour1, colour2, scene):
+        self.model = model
+        self.col1 = colour1
+        self.col2 = colour2
+        if scene.sprites is not None:
+            image = scene.sprites.car(colour1, colour2, model.direction)
+            self.sprite = ImageSprite(scene, model.x, model.y, image, "car")
+        else:
+            self.sprite = Sprite(scene, model.x, model.y, car_shapes(colour1, colour2, model.direction), "car")
+
+    def print_car(self, alpha=1.0):
+        """
+        Moves the car's items to its position, alpha of the way through the last simulation step.
+        """
+        model = self.model
+        self.sprite.move_to(interpolate(model.prev_x, model.x, alpha), interpolate(model.prev_y, model.y, alpha))
+
+    def delete_car(self):
+        self.sprite.delete()
+
+
+def draw_frame_recreate(canvas, sim, items):
+    """
+    The old per-frame drawing: deletes and re-creates every item. Kept for comparison only.
+    """
+    if items:
+        canvas.delete(*items)
+    items.clear()
+    for i in range(5):  # The old road lines, 200 apart and scrolling with the road
+        y = (i * 200 + 50 + sim.road) % 800 - 100
+        items.append(canvas.create_rectangle(489, y, 509, y + 100, fill="white", outline="white", width=2))
+    for model, colours in ((sim.player, ("RoyalBlue3", "RoyalBlue4")), (sim.enemy, ("Red", "Dark Red"))):
+        for left, top, right, bottom, colour in car_shapes(colours[0], colours[1], model.direction):
+            items.append(canvas.create_rectangle(model.x + left, model.y + top, model.x + right,
+                                                 model.y + bottom, outline=colour, fill=colour, width=0))
+    items.append(canvas.create_text(900, 100, text="Score: " + str(sim.score)))
+
+
+def compare_frame_cost(frames):
+    """
+    Counts canvas calls per frame for the old delete/re-create drawing and for the scene,
+    and canvas items per car for rectangles and cached sprites.
+    """
+    state = default_game_state.copy()
+    state["invincibility_mode"] = True
+    root = tk.Tk()
+    root.withdraw()
+
+    sim = Simulation(state, seed=0)
+    counter = CallCounter(tk.Canvas(root))
+    items = []
+    for _ in range(frames):
+        sim.step()
+        draw_frame_recreate(counter, sim, items)
+    recreate = counter.calls / frames
+
+    sprites = SpriteCache(root)
+    retained = {}
+    items_per_car = {}
+    for name, cache in (("rectangles", None), ("sprites", sprites)):
+        sim = Simulation(state, seed=0)
+        counter = CallCounter(tk.Canvas(root))
+        scene = Scene(counter, cache)
+        track = TrackView(TrackRing(sim.track), scene)
+        cars = [Car(sim.player, "RoyalBlue3", "RoyalBlue4", scene), Car(sim.enemy, "Red", "Dark Red", scene)]
+        score_text = TextSprite(scene, 900, 100)
+        items_per_car[name] = len(counter.find_withtag(cars[0].sprite.tag))
+        counter.end_frame()
+        for _ in range(frames):
+            sim.step()
+            track.update(sim.road)
+            for car in cars:
+                car.print_car()
+            score_text.set_text("Score: " + str(sim.score))
+        retained[name] = counter.calls / frames
+    root.destroy()
+    return recreate, retained, items_per_car
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare canvas calls per frame.")
+    parser.add_argument("--frames", type=int, default=1000)
+    args = parser.parse_args()
+
+    recreate, retained, items_per_car = compare_frame_cost(args.frames)
+    print(f"delete/re-create: {recreate:.1f} canvas calls per frame")
+    for name, calls in retained.items():
+        print(f"retained scene with {name}: {calls:.1f} canvas calls per frame, "
+              f"{items_per_car[name]} canvas items per car")
@@ -0,0 +1,162 @@
+"""
+Timers for the Tk main loop.
+
+Every delayed call goes through one Scheduler: a heap of timers ordered by deadline,
+driven by a single root.after set for the earliest one. With no timers pending there
+is no after callback at all, so an idle menu costs no CPU. Timers started for a game
+belong to a TimerGroup that is cancelled as a whole when the game ends, so nothing
+from an old session keeps running into the next one.
+"""
+import heapq
+import itertools
+import math
+import time
+
+EARLY = 0.001  # Timers due within this many seconds run now, Tk's after only has millisecond resolution
+
+
+class Timer:
+    """
+    Handle for a scheduled call.
+    """
+
+    def __init__(self, scheduler, deadline, function, args):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.function = function
+        self.args = args
+        self.group = None
+        self.pending = True
+
+    def cancel(self):
+        """
+        Stops the call from happening. Does nothing if it already happened.
+        """
+        if self.pending:
+            self.pending = False
+            self.scheduler.live -= 1
+            self.scheduler.cancelled += 1
+            if self.group:
+                self.group.timers.discard(self)
+
+
+class TimerGroup:
+    """
+    Timers that belong together, e.g. everything one game session started.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.timers = set()
+
+    def __len__(self):
+        return len(self.timers)
+
+    def call_later(self, delay_ms, function, *args):
+        timer = self.scheduler.call_later(delay_ms, function, *args)
+        timer.group = self
+        self.timers.add(timer)
+        return timer
+
+    def cancel(self):
+        for timer in list(self.timers):
+            timer.cancel()
+
+
+class Scheduler:
+    """
+    Heap of timers run from one root.after callback.
+    """
+    COMPACT_AT = 64  # Cancelled timers left in the heap before it is rebuilt without them
+
+    def __init__(self, root, clock=time.perf_counter):
+        self.root = root
+        self.clock = clock
+        self.heap = []  # (deadline, order, timer)
+        self.order = itertools.count()  # Keeps timers with the same deadline in the order they were added
+        self.live = 0
+        self.cancelled = 0  # Cancelled timers still in the heap
+        self.after_id = None
+        self.after_deadline = None
+
+    def __len__(self):
+        return self.live
+
+    def pending(self):
+        """
+        Number of timers that have not run or been cancelled.
+        """
+        return self.live
+
+    def next_deadline(self):
+        """
+        Seconds until the next timer is due, or None if there is none.
+        """
+        self.drop_cancelled()
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - self.clock())
+
+    def group(self):
+        return TimerGroup(self)
+
+    def call_later(self, delay_ms, function, *args):
+        """
+        Calls function(*args) after delay_ms milliseconds. Returns a Timer that can cancel it.
+        """
+        timer = Timer(self, self.clock() + delay_ms / 1000, function, args)
+        heapq.heappush(self.heap, (timer.deadline, next(self.order), timer))
+        self.live += 1
+        self.arm()
+        return timer
+
+    def drop_cancelled(self):
+        heap = self.heap
+        while heap and not heap[0][2].pending:
+            heapq.heappop(heap)
+            self.cancelled -= 1
+        if self.cancelled > self.COMPACT_AT and self.cancelled > len(heap) // 2:
+            self.heap = [entry for entry in heap if entry[2].pending]
+            heapq.heapify(self.heap)
+            self.cancelled = 0
+
+    def arm(self):
+        """
+        Makes sure the one root.after is set for the earliest timer, and that there is
+        none when nothing is pending.
+        """
+        self.drop_cancelled()
+        deadline = self.heap[0][0] if self.heap else None
+        if self.after_id is not None:
+            if deadline is not None and self.after_deadline <= deadline:
+                return
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        if deadline is not None:
+            delay = max(0, math.ceil((deadline - self.clock()) * 1000))
+            self.after_id = self.root.after(delay, self.run_due)
+            self.after_deadline = deadline
+
+    def run_due(self):
+        """
+        Runs the timers that are due. Timers they add run on a later pass, even with no
+        delay, so Tk still gets to handle events in between.
+        """
+        self.after_id = None
+        last = next(self.order)
+        now = self.clock() + EARLY
+        heap = self.heap
+        try:
+            while heap and heap[0][0] <= now and heap[0][1] < last:
+                timer = heapq.heappop(heap)[2]
+                if not timer.pending:
+                    self.cancelled -= 1
+                    continue
+                timer.pending = False
+                self.live -= 1
+                if timer.group:
+                    timer.group.timers.discard(timer)
+                timer.function(*timer.args)
+                heap = self.heap  # drop_cancelled may have rebuilt it
+        finally:
+            self.arm()
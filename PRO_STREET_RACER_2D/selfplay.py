@@ -0,0 +1,230 @@
+"""
+Batch self-play for tuning the difficulty curve.
+
+Runs many headless episodes, one seed each, with an autopilot at the wheel, spread
+over a multiprocessing pool. Episodes share nothing, so throughput grows with the
+number of cores. Every episode's result is appended to a JSONL file as it comes in,
+and the score and survival distributions are printed per parameter set at the end:
+
+    python selfplay.py --episodes 2000
+    python selfplay.py --episodes 500 --param max_speed=40,50,60 --param speed_step=5,10
+
+Every combination of --param values is run with the same seeds, so the parameter
+sets can be compared directly.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from simulation import Simulation, default_game_state
+
+RESULTS = "selfplay.jsonl"
+PILOTS = ("heuristic", "random", "idle")
+# Difficulty parameters that --param can set, and the Simulation attribute each one sets.
+# "speed" is the starting speed, before the speed-up at the start, and goes through the game state instead.
+PARAMETERS = {
+    "speed_step": "SPEED_UP_STEP",
+    "speed_interval": "SPEED_UP_INTERVAL",
+    "max_speed": "MAX_SPEED",
+    "spawn_min_x": "SPAWN_MIN_X",
+    "spawn_max_x": "SPAWN_MAX_X",
+    "speed": None,
+}
+HORIZON = 20  # Ticks the heuristic pilot plans ahead
+# Chance per tick the pilot makes a random move instead, a slip every 20 s or so. A perfect
+# pilot never crashes with the game's single enemy car, so every episode would score the same.
+NOISE = 0.005
+CAR_WIDTH = 100  # Centres closer than this, and than CAR_HEIGHT vertically, collide
+CAR_HEIGHT = 150
+
+
+def heuristic_pilot(sim, rng):
+    """
+    Plans HORIZON ticks ahead, assuming the traffic keeps its current speed, and takes
+    the move (left, stay or right) that keeps the car clear for longest, staying put
+    on a tie. A lane off the road at a tick counts as a crash then, the road would push
+    the car out of it.
+    """
+    player = sim.player
+    n = len(sim.traffic)
+    step = sim.PLAYER_SPEED
+    here = 1000 // step
+    lanes = player.x + step * np.arange(-here, here + 1)
+    ticks = np.arange(1, HORIZON + 1)
+    # The road slides down the screen by the speed every tick, so the road under the car
+    # t ticks on is the road (t - 1) * speed above it now.
+    ranges = np.array([sim.road_range(player.y - sim.speed * (tick - 1), sim.PLAYER_MIN_X, sim.PLAYER_MAX_X)
+                       for tick in ticks])  # (tick, low and high)
+    on_road = (lanes[None, :] >= ranges[:, :1]) & (lanes[None, :] <= ranges[:, 1:])  # (tick, lane)
+    enemy_y = sim.traffic.y[:n][None, :] + sim.speed * ticks[:, None]  # (tick, enemy)
+    near = np.abs(enemy_y - player.y) <= CAR_HEIGHT
+    overlap = np.abs(sim.traffic.x[:n][None, :] - lanes[:, None]) <= CAR_WIDTH  # (lane, enemy)
+    safe = on_road & ~(near[:, None, :] & overlap[None, :, :]).any(axis=2)  # (tick, lane)
+
+    # clear[lane]: ticks the car can stay clear from that lane onwards, moving one lane per tick.
+    clear = safe[-1].astype(int)
+    for tick in range(HORIZON - 2, -1, -1):
+        best_next = clear.copy()
+        best_next[1:] = np.maximum(best_next[1:], clear[:-1])
+        best_next[:-1] = np.maximum(best_next[:-1], clear[1:])
+        clear = np.where(safe[tick], best_next + 1, 0)
+    moves = [(here, 0)]
+    if here > 0:
+        moves.append((here - 1, 1))
+    if here < len(lanes) - 1:
+        moves.append((here + 1, 1))
+    target = max(moves, key=lambda move: (clear[move[0]], -move[1]))[0]
+    steer(sim, lanes[target])
+
+
+def random_pilot(sim, rng):
+    """
+    Holds a random direction, changing its mind every now and then.
+    """
+    if rng.random() < 0.1:
+        random_move(sim, rng)
+
+
+def random_move(sim, rng):
+    steer(sim, sim.player.x + rng.choice((-1, 0, 1)))
+
+
+def idle_pilot(sim, rng):
+    pass
+
+
+def steer(sim, target_x):
+    """
+    Holds the key that moves the player's car towards target_x, or neither.
+    """
+    sim.held["move_left"] = target_x < sim.player.x
+    sim.held["move_right"] = target_x > sim.player.x
+
+
+PILOT_FUNCTIONS = {"heuristic": heuristic_pilot, "random": random_pilot, "idle": idle_pilot}
+
+
+def run_episode(task):
+    """
+    Plays one episode. task is (seed, params, pilot, enemy_count, max_ticks, noise).
+    Returns its result as a dict.
+    """
+    seed, params, pilot, enemy_count, max_ticks, noise = task
+    state = default_game_state.copy()
+    if "speed" in params:
+        state["speed"] = params["speed"]
+    rules = {PARAMETERS[name]: value for name, value in params.items() if PARAMETERS[name]}
+    sim = Simulation(state, seed, enemy_count, rules)
+    fly = PILOT_FUNCTIONS[pilot]
+    rng = random.Random(seed)  # The pilot's own generator, so it does not change the traffic
+    while sim.tick < max_ticks:
+        if rng.random() < noise:
+            random_move(sim, rng)
+        else:
+            fly(sim, rng)
+        if not sim.step():
+            break
+    return {
+        "seed": seed,
+        "params": params,
+        "pilot": pilot,
+        "ticks": sim.tick,
+        "score": sim.score,
+        "collision_tick": sim.tick if sim.game_over else None,
+        "speed": sim.speed,
+    }
+
+
+def parse_param(text):
+    """
+    "name=1,2,3" -> (name, [1, 2, 3]).
+    """
+    name, _, values = text.partition("=")
+    if name not in PARAMETERS or not values:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(PARAMETERS)} as name=value[,value...]")
+    return name, [float(value) if "." in value else int(value) for value in values.split(",")]
+
+
+def parameter_sets(params):
+    """
+    Every combination of the values given for each parameter, as dicts.
+    """
+    names = [name for name, values in params]
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values for name, values in params))]
+
+
+def summarise(results, max_ticks):
+    """
+    Prints the score, survival and collision tick distribution for one parameter set.
+    """
+    scores = np.array([result["score"] for result in results])
+    ticks = np.array([result["ticks"] for result in results])
+    collisions = np.array([result["collision_tick"] for result in results if result["collision_tick"] is not None])
+    p10, p50, p90 = np.percentile(scores, (10, 50, 90))
+    print(f"  {len(results)} episodes, {100 * (1 - len(collisions) / len(results)):.1f}% survived {max_ticks} ticks")
+    print(f"  score   mean {scores.mean():>10,.0f}  p10 {p10:>10,.0f}  p50 {p50:>10,.0f}  p90 {p90:>10,.0f}  "
+          f"max {scores.max():>10,}")
+    print(f"  ticks   mean {ticks.mean():>10,.0f}  p50 {np.median(ticks):>10,.0f}")
+    if len(collisions):
+        p10, p50, p90 = np.percentile(collisions, (10, 50, 90))
+        print(f"  crashed at tick  p10 {p10:>8,.0f}  p50 {p50:>8,.0f}  p90 {p90:>8,.0f}")
+    edges = np.linspace(0, scores.max() + 1, 11)
+    counts, edges = np.histogram(scores, edges)
+    width = 40 / max(counts.max(), 1)
+    for count, low, high in zip(counts, edges, edges[1:]):
+        print(f"  {low:>10,.0f} - {high:>10,.0f} {'#' * round(count * width)} {count}")
+
+
+def run_batch(episodes, params, pilot, enemy_count, max_ticks, processes, filename, first_seed=0, noise=NOISE):
+    """
+    Runs episodes for every parameter set on a pool of processes, writing each result
+    to filename as it arrives. Returns the results grouped by parameter set.
+    """
+    sets = parameter_sets(params)
+    tasks = [(first_seed + episode, values, pilot, enemy_count, max_ticks, noise)
+             for values in sets for episode in range(episodes)]
+    # Big enough chunks that the pool's messaging is small next to the episodes themselves.
+    chunksize = max(1, min(64, len(tasks) // (processes * 8)))
+    grouped = {json.dumps(values, sort_keys=True): [] for values in sets}
+    start = time.perf_counter()
+    file = open(filename, "w")
+    with multiprocessing.Pool(processes) as pool:
+        for done, result in enumerate(pool.imap_unordered(run_episode, tasks, chunksize), 1):
+            file.write(json.dumps(result) + "\n")
+            grouped[json.dumps(result["params"], sort_keys=True)].append(result)
+            if done % 1000 == 0:
+                file.flush()
+                print(f"{done}/{len(tasks)} episodes")
+    file.close()
+    elapsed = time.perf_counter() - start
+    print(f"{len(tasks)} episodes in {elapsed:.1f} s on {processes} processes, "
+          f"{len(tasks) / elapsed:,.1f} episodes/s, results in {filename}")
+    return grouped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run headless self-play episodes in parallel.")
+    parser.add_argument("--episodes", type=int, default=1000, help="episodes per parameter set")
+    parser.add_argument("--pilot", choices=PILOTS, default="heuristic")
+    parser.add_argument("--enemies", type=int, default=1)
+    parser.add_argument("--max-ticks", type=int, default=5000, help="episodes stop here if the car never crashes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first episode, the rest count up")
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        help=f"difficulty parameter to sweep, name=value[,value...], one of {', '.join(PARAMETERS)}")
+    parser.add_argument("--noise", type=float, default=NOISE,
+                        help="chance per tick of a random move instead of the pilot's, 0 for a perfect pilot")
+    parser.add_argument("--output", default=RESULTS)
+    args = parser.parse_args()
+
+    grouped = run_batch(args.episodes, args.param, args.pilot, args.enemies, args.max_ticks, args.processes,
+                        args.output, args.seed, args.noise)
+    for key, results in grouped.items():
+        print(f"parameters {key}:")
+        summarise(results, args.max_ticks)
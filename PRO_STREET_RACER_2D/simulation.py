@@ -0,0 +1,533 @@
+"""
+Headless game rules for Pro Street Racer 2D.
+
+Nothing in here touches tkinter, so the game can be stepped, measured and
+regression-tested without a display. game_solution.py only renders the state
+held by a Simulation.
+"""
+import argparse
+import math
+import random
+import time
+
+from spatial import SpatialHash
+from track import CHUNK_LENGTH, TAPER, VIEW_LENGTH, Track
+from traffic import CAR_HALF_WIDTH, Traffic
+
+default_game_state = {
+    "score": 0,
+    "speed": 10,
+    "player_car_x": 350,
+    "player_car_y": 600,
+    "enemy_car_x": 650,
+    "enemy_car_y": 100,
+    "paused": False,
+    "game_over": False,
+    "invincibility_mode": False,
+    "mirrored_controls": False,
+    "car_colour_1": "RoyalBlue3",
+    "car_colour_2": "RoyalBlue4",
+}
+
+MIRRORED_ACTIONS = {"move_left": "move_right", "move_right": "move_left"}
+SPAWN_ATTEMPTS = 24  # Random lane picks before a respawning car gives up looking for a free spot
+SPAWN_GAP = 50  # Vertical gap kept free above and below a spawned car
+MAX_SCORE = 2 ** 62  # Custom scores are capped here, so the score keeps fitting the int64s of saves and replays
+
+
+def road_range(track, road, y, low, high, inset):
+    """
+    The x positions a car at screen y can take with the traffic driven road far: at least
+    inset inside the road's edges there, and from low to high.
+    """
+    left, right = track.edges(road + VIEW_LENGTH - y)
+    return max(low, math.ceil(left) + inset), min(high, math.floor(right) - inset)
+
+
+class SpeedProvider:
+    """
+    Provides the speed for game objects.
+    """
+    speed = default_game_state["speed"]
+
+
+class Car:
+    """
+    Car position and hitbox, a thin view onto one row of a traffic.Traffic.
+    """
+
+    def __init__(self, x1, y1, direct, traffic=None):
+        if traffic is None:
+            traffic = Traffic(1)
+        self.traffic = traffic
+        self.index = traffic.add(x1, y1)
+        self.direction = direct
+
+    @property
+    def x(self):
+        return int(self.traffic.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.traffic.x[self.index] = value
+
+    @property
+    def y(self):
+        return int(self.traffic.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.traffic.y[self.index] = value
+
+    @property
+    def prev_x(self):
+        return int(self.traffic.prev_x[self.index])
+
+    @prev_x.setter
+    def prev_x(self, value):
+        self.traffic.prev_x[self.index] = value
+
+    @property
+    def prev_y(self):
+        return int(self.traffic.prev_y[self.index])
+
+    @prev_y.setter
+    def prev_y(self, value):
+        self.traffic.prev_y[self.index] = value
+
+    def move_left(self):
+        """
+        Moves car left.
+        """
+        if self.x > 70:  # Restricts movement out of screen on the left side
+            self.x = (self.x - 20)
+
+    def move_right(self):
+        """
+        Moves car right.
+        """
+        if self.x < 930:  # Restricts movement out of screen on the right side
+            self.x = (self.x + 20)
+
+    def change_coord(self, speed, rng=random, length=900):
+        """
+        Randomly places enemy car, length above where it left the screen.
+        Simulation moves all enemies at once with Traffic.move instead.
+        """
+        self.y = (self.y + speed)
+        if self.y >= 800:
+            self.y -= length
+            self.x = rng.randint(0 + 100, 1000 - 100)
+
+    def box(self, gap=0):
+        return self.x - 50, self.y - 75 - gap, self.x + 50, self.y + 75 + gap
+
+    def near(self, other, gap):
+        """
+        Like the + collision test, with the cars stretched by gap vertically.
+        """
+        return not (self.x + 50 < other.x - 50 or
+                    self.x - 50 > other.x + 50 or
+                    self.y + 75 + gap < other.y - 75 or
+                    self.y - 75 - gap > other.y + 75)
+
+    def __add__(self, other):
+        self_left = self.x - 50
+        self_right = self.x + 50
+        self_top = self.y - 75
+        self_bottom = self.y + 75
+
+        car2_left = other.x - 50
+        car2_right = other.x + 50
+        car2_top = other.y - 75
+        car2_bottom = other.y + 75
+
+        return not (self_right < car2_left or
+                    self_left > car2_right or
+                    self_bottom < car2_top or
+                    self_top > car2_bottom)
+
+
+class Simulation:
+    """
+    One game session: the road, player car, enemy cars, score and the speed curve.
+    Advanced one tick at a time with step(), using its own seeded random generator.
+    """
+    TICK_MS = 100  # the original game loop ran every 100 ms
+    TICK = TICK_MS / 1000
+    SPEED_UP_INTERVAL = 5.0
+    SPEED_UP_STEP = 5
+    MAX_SPEED = 50
+    # A held key used to move the car 20 px per KeyPress, at the OS key repeat rate. At a typical
+    # 25 repeats per second that is 500 px/s, which is kept, now whatever the repeat rate is.
+    PLAYER_RATE = 500  # Pixels per second while a movement key is held
+    PLAYER_SPEED = round(PLAYER_RATE * TICK)  # Pixels per tick, 50
+    PLAYER_MIN_X = 70  # The furthest left and right the player's car goes, wherever the road is
+    PLAYER_MAX_X = 930
+    SPAWN_MIN_X = 100  # Range of x positions enemy cars spawn at, wherever the road is
+    SPAWN_MAX_X = 900
+    ROAD_INSET = CAR_HALF_WIDTH + 10  # Cars stay on the road, clear of its 20 px wide edges
+
+    def __init__(self, state=None, seed=None, enemy_count=1, rules=None):
+        """
+        rules overrides class constants for this session only, e.g. {"MAX_SPEED": 60}. They are
+        set before anything else, so the cars placed here already follow them.
+        """
+        if state is None:
+            state = default_game_state
+        for name, value in (rules or {}).items():
+            if not hasattr(Simulation, name):
+                raise ValueError(f"Simulation has no rule {name}")
+            setattr(self, name, value)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.track = Track(seed if seed is not None else random.getrandbits(32))  # See track.py
+        self.speedprovider = SpeedProvider()
+        self.speedprovider.speed = state["speed"]
+        self.score = state["score"]
+        self.invincibility_mode = state["invincibility_mode"]
+        self.mirrored_controls = state["mirrored_controls"]
+        self.game_over = False
+        self.tick = 0
+        self.speed_timer = 0.0
+        self.profiler = None  # Optional profiler.FrameProfiler, step() laps its phases
+        self.recorder = None  # Optional replay.ReplayRecorder, gets every input and outside change
+
+        self.player = Car(state["player_car_x"], state["player_car_y"], 0)
+        # Key-state table, set by key press and release events and sampled once per tick.
+        # A key pressed and released between two ticks still counts as held for one.
+        self.held = {"move_left": False, "move_right": False}
+        self.tapped = {"move_left": False, "move_right": False}
+        self.steering = (False, False)  # (left, right) as sampled on the last tick
+
+        # Enemy cars share one Traffic, row i of its arrays is self.enemies[i].
+        self.traffic = Traffic()
+        self.enemy = Car(state["enemy_car_x"], state["enemy_car_y"], 1, self.traffic)
+        self.enemies = [self.enemy]
+        # Enemies loop over a longer stretch of road when there are more of them than fit on screen.
+        self.traffic_length = max(900, 100 * enemy_count)
+        # All enemies move at the same speed, so the grid stores them relative to the distance
+        # the traffic has travelled and only respawning cars ever need re-bucketing.
+        self.road = 0
+        self.prev_road = 0
+        self.grid = SpatialHash()
+        self.grid.insert(self.enemy, self.road_box(self.enemy))
+        for _ in range(enemy_count - 1):
+            self.add_enemy()
+        self.increase_speed(self.SPEED_UP_INTERVAL)  # The first speed-up comes as the game starts
+
+    def road_box(self, car, gap=0):
+        left, top, right, bottom = car.box(gap)
+        return left, top - self.road, right, bottom - self.road
+
+    def road_range(self, y, low, high):
+        """
+        The x positions a car at screen y can take: on the road there, and from low to high.
+        """
+        return road_range(self.track, self.road, y, low, high, self.ROAD_INSET)
+
+    def road_span(self, top, bottom):
+        """
+        The leftmost and rightmost screen x the road's edges reach between screen y top and
+        bottom. Edges only change direction where a chunk or its taper starts, so those and
+        the two ends are all that need looking at.
+        """
+        near = self.road + VIEW_LENGTH - bottom
+        far = self.road + VIEW_LENGTH - top
+        distances = [near, far]
+        for index in range(int(near // CHUNK_LENGTH), int(far // CHUNK_LENGTH) + 1):
+            distances.extend(distance for distance in (index * CHUNK_LENGTH, index * CHUNK_LENGTH + TAPER)
+                             if near < distance < far)
+        edges = [self.track.edges(distance) for distance in distances]
+        return min(left for left, right in edges), max(right for left, right in edges)
+
+    def player_range(self):
+        return self.road_range(self.player.y, self.PLAYER_MIN_X, self.PLAYER_MAX_X)
+
+    def spawn_x(self, y):
+        return self.rng.randint(*self.road_range(y, self.SPAWN_MIN_X, self.SPAWN_MAX_X))
+
+    def add_enemy(self):
+        """
+        Spawns another enemy car above the screen in a free spot.
+        """
+        y = self.rng.randint(800 - self.traffic_length, -100)
+        enemy = Car(self.spawn_x(y), y, 1, self.traffic)
+        self.enemies.append(enemy)
+        self.find_free_spot(enemy)
+        self.grid.insert(enemy, self.road_box(enemy))
+        return enemy
+
+    def find_free_spot(self, car):
+        """
+        Moves a spawning car to another random lane, or further up the road,
+        until it no longer overlaps a car in the grid.
+        """
+        for attempt in range(SPAWN_ATTEMPTS):
+            box = self.road_box(car, SPAWN_GAP)
+            if not any(car.near(other, SPAWN_GAP) for other in self.grid.query(box) if other is not car):
+                return True
+            if attempt % 4 == 3:
+                car.y -= 150 + SPAWN_GAP
+            else:
+                car.x = self.spawn_x(car.y)
+        return False
+
+    def respawn(self, enemy):
+        """
+        Picks a new lane for an enemy car that went back up the road.
+        """
+        self.grid.remove(enemy)
+        enemy.x = self.spawn_x(enemy.y)
+        self.find_free_spot(enemy)
+        self.grid.insert(enemy, self.road_box(enemy))
+
+    def hit_mask(self):
+        """
+        Boolean mask over self.enemies of the cars overlapping the player's car.
+        """
+        return self.traffic.hit_mask(self.player.x, self.player.y)
+
+    def collisions(self):
+        """
+        Enemy cars overlapping the player's car.
+        """
+        return [self.enemies[index] for index in self.hit_mask().nonzero()[0]]
+
+    @property
+    def speed(self):
+        return self.speedprovider.speed
+
+    def apply_input(self, action):
+        """
+        Applies a single player action ("move_left" or "move_right").
+        """
+        if self.game_over:
+            return
+        if self.recorder:
+            self.recorder.record_input(self.tick, action)
+        if self.mirrored_controls:
+            action = MIRRORED_ACTIONS.get(action, action)
+        if action == "move_left":
+            self.player.move_left()
+        elif action == "move_right":
+            self.player.move_right()
+
+    def key_down(self, action):
+        if action in self.held:
+            self.held[action] = True
+            self.tapped[action] = True
+
+    def key_up(self, action):
+        if action in self.held:
+            self.held[action] = False
+
+    def release_keys(self):
+        """
+        Lets go of every key, for when the game stops seeing release events (pause, focus loss).
+        """
+        for action in self.held:
+            self.held[action] = False
+            self.tapped[action] = False
+
+    def sample_keys(self):
+        """
+        Reads the key-state table for this tick and moves the player's car at PLAYER_SPEED,
+        keeping it on the road even when the road narrows or bends under it.
+        """
+        left = self.held["move_left"] or self.tapped["move_left"]
+        right = self.held["move_right"] or self.tapped["move_right"]
+        self.tapped["move_left"] = self.tapped["move_right"] = False
+        if (left, right) != self.steering:
+            if self.recorder:
+                self.recorder.record_keys(self.tick, left, right)
+            self.steering = (left, right)
+        if self.mirrored_controls:
+            left, right = right, left
+        player = self.player
+        x = player.x
+        if left != right:
+            x += -self.PLAYER_SPEED if left else self.PLAYER_SPEED
+        low, high = self.player_range()
+        player.x = max(low, min(high, x))
+
+    def set_modes(self, invincibility_mode, mirrored_controls):
+        """
+        Switches the cheat modes, recording the change if it is one.
+        """
+        if self.recorder and (invincibility_mode != self.invincibility_mode or
+                              mirrored_controls != self.mirrored_controls):
+            self.recorder.record_modes(self.tick, invincibility_mode, mirrored_controls)
+        self.invincibility_mode = invincibility_mode
+        self.mirrored_controls = mirrored_controls
+
+    def set_score(self, score):
+        score = max(0, min(score, MAX_SCORE))
+        if self.recorder:
+            self.recorder.record_score(self.tick, score)
+        self.score = score
+
+    def step(self, dt=TICK, inputs=()):
+        """
+        Advances the game by one tick. dt is the time the tick covers and drives the speed curve,
+        inputs are discrete actions the player made since the previous tick, on top of the keys held.
+        Returns True while the game is still running.
+        """
+        if self.game_over:
+            return False
+        self.player.prev_x = self.player.x
+        self.player.prev_y = self.player.y
+        self.prev_road = self.road
+        for action in inputs:
+            self.apply_input(action)
+        self.sample_keys()
+
+        profiler = self.profiler
+        speed = self.speedprovider.speed
+        respawned = self.traffic.move(speed, self.traffic_length)
+        self.road += speed
+        for index in respawned:
+            self.respawn(self.enemies[index])
+        self.score += speed
+        self.tick += 1
+        if profiler:
+            profiler.lap("step_traffic")
+
+        hit = not self.invincibility_mode and self.hit_mask().any()
+        if profiler:
+            profiler.lap("step_collision")
+        if hit:
+            self.game_over = True
+            self.speedprovider.speed = 0
+            return False
+
+        self.increase_speed(dt)
+        return True
+
+    def increase_speed(self, dt):
+        """
+        Increases speed over time.
+        """
+        self.speed_timer += dt
+        while self.speed_timer >= self.SPEED_UP_INTERVAL:
+            self.speed_timer -= self.SPEED_UP_INTERVAL
+            if self.speedprovider.speed < self.MAX_SPEED:
+                self.speedprovider.speed += self.SPEED_UP_STEP
+
+    def snapshot(self):
+        """
+        Copies everything needed to carry on from this tick: positions, speed, score and
+        the random generator, so a restored game plays out exactly like this one.
+        """
+        n = len(self.traffic)
+        return {
+            "tick": self.tick,
+            "score": self.score,
+            "speed": self.speedprovider.speed,
+            "speed_timer": self.speed_timer,
+            "road": self.road,
+            "traffic_length": self.traffic_length,
+            "invincibility_mode": self.invincibility_mode,
+            "mirrored_controls": self.mirrored_controls,
+            "track_seed": self.track.seed,
+            "player_x": self.player.x,
+            "player_y": self.player.y,
+            "enemy_x": self.traffic.x[:n].copy(),
+            "enemy_y": self.traffic.y[:n].copy(),
+            "rng": self.rng.getstate(),
+        }
+
+    def restore(self, snapshot):
+        """
+        Puts the game back to a snapshot of a session with the same number of enemy cars.
+        """
+        n = len(self.traffic)
+        if len(snapshot["enemy_x"]) != n:
+            raise ValueError(f"snapshot has {len(snapshot['enemy_x'])} enemy cars, this game has {n}")
+        if self.recorder:
+            self.recorder.record_world(self.tick, snapshot)
+        self.tick = snapshot["tick"]
+        self.score = snapshot["score"]
+        self.speedprovider.speed = snapshot["speed"]
+        self.speed_timer = snapshot["speed_timer"]
+        self.road = self.prev_road = snapshot["road"]
+        self.traffic_length = snapshot["traffic_length"]
+        self.invincibility_mode = snapshot["invincibility_mode"]
+        self.mirrored_controls = snapshot["mirrored_controls"]
+        self.game_over = False
+        if snapshot["track_seed"] != self.track.seed:
+            self.track = Track(snapshot["track_seed"])
+        self.player.x = self.player.prev_x = snapshot["player_x"]
+        self.player.y = self.player.prev_y = snapshot["player_y"]
+        self.traffic.x[:n] = snapshot["enemy_x"]
+        self.traffic.prev_x[:n] = snapshot["enemy_x"]
+        self.traffic.y[:n] = snapshot["enemy_y"]
+        self.traffic.prev_y[:n] = snapshot["enemy_y"]
+        self.rng.setstate(snapshot["rng"])
+        self.grid = SpatialHash()
+        for enemy in self.enemies:
+            self.grid.insert(enemy, self.road_box(enemy))
+
+    @classmethod
+    def from_snapshot(cls, snapshot, state=None):
+        """
+        New session continuing from a snapshot, with the cars and the track it holds.
+        """
+        sim = cls(state, enemy_count=len(snapshot["enemy_x"]))
+        sim.restore(snapshot)
+        return sim
+
+    def to_game_state(self):
+        """
+        Returns the fields of game_state this session owns.
+        """
+        return {
+            "score": self.score,
+            "speed": self.speedprovider.speed,
+            "player_car_x": self.player.x,
+            "player_car_y": self.player.y,
+            "enemy_car_x": self.enemy.x,
+            "enemy_car_y": self.enemy.y,
+        }
+
+
+def run_headless(ticks, seed=None, invincible=True, enemy_count=1):
+    """
+    Runs a session without a display and returns (simulation, ticks per second).
+    """
+    state = default_game_state.copy()
+    state["invincibility_mode"] = invincible
+    sim = Simulation(state, seed, enemy_count)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if not sim.step():
+            break
+    elapsed = time.perf_counter() - start
+    return sim, sim.tick / elapsed if elapsed else float("inf")
+
+
+def run_stress(enemy_counts, ticks, seed=None):
+    """
+    Prints the average tick time for growing numbers of enemy cars.
+    """
+    for count in enemy_counts:
+        sim, rate = run_headless(ticks, seed, enemy_count=count)
+        print(f"{count:>6} enemies: {1e6 / rate:9.1f} us/tick, {len(sim.collisions()):>3} cars on the player")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the game rules headless.")
+    parser.add_argument("--ticks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mortal", action="store_true", help="stop at the first collision")
+    parser.add_argument("--enemies", type=int, default=1)
+    parser.add_argument("--stress", type=lambda text: [int(n) for n in text.split(",")],
+                        help="comma separated enemy counts to time, e.g. 1,10,100,1000")
+    args = parser.parse_args()
+
+    if args.stress:
+        run_stress(args.stress, args.ticks, args.seed)
+        raise SystemExit
+
+    sim, rate = run_headless(args.ticks, args.seed, invincible=not args.mortal, enemy_count=args.enemies)
+    print(f"{sim.tick} ticks, score {sim.score}, speed {sim.speed}, {rate:,.0f} ticks/s")
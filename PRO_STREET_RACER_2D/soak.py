@@ -0,0 +1,244 @@
+"""
+Long-run soak test that looks for slow leaks.
+
+    python soak.py sim --ticks 5000000      # headless simulation only
+    python soak.py game --cycles 100        # real game loop, needs a display or xvfb-run
+
+Samples traced Python memory (tracemalloc) and, in game mode, live canvas items,
+widgets, pending root.after callbacks and scheduler timers. Fails with exit code 1 if
+any of them keeps growing after the warm-up, and prints the call sites whose
+allocations grew most.
+
+The game soak runs in a temporary directory with copies of the game's assets, so the
+save files, replays and leaderboard it writes never touch the player's.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from simulation import Simulation, default_game_state
+from timestep import FixedTimestep
+
+MEMORY_TOLERANCE = 512 * 1024  # Bytes of growth allowed between the first and second half of the run
+COUNT_TOLERANCE = 2  # Items, widgets or callbacks allowed
+RELATIVE_TOLERANCE = 0.05  # Counts that naturally fluctuate may also vary by this fraction
+ASSETS = ("PIXY.ttf", "main_menu.png", "boss_key.png")  # Files the game reads from its working directory
+SESSION_FIELDS = ("score", "speed", "player_car_x", "player_car_y", "enemy_car_x", "enemy_car_y")  # to_game_state's
+
+
+class Samples:
+    """
+    Time series of each metric, plus the tracemalloc snapshots to diff at the end.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.first_snapshot = None
+        self.last_snapshot = None
+
+    def add(self, **values):
+        values["python_bytes"] = tracemalloc.get_traced_memory()[0]
+        for name, value in values.items():
+            self.series.setdefault(name, []).append(value)
+
+    def snapshot(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        if self.first_snapshot is None:
+            self.first_snapshot = snapshot
+        self.last_snapshot = snapshot
+
+
+def find_growth(samples, warmup):
+    """
+    Returns {metric: growth} for metrics whose second half of samples after the warm-up
+    averages more than the first half by more than the tolerance.
+    """
+    growing = {}
+    for name, values in samples.series.items():
+        values = values[warmup:]
+        if len(values) < 4:
+            continue
+        half = len(values) // 2
+        first_half = sum(values[:half]) / half
+        growth = sum(values[half:]) / (len(values) - half) - first_half
+        if name == "python_bytes":
+            tolerance = MEMORY_TOLERANCE
+        else:
+            tolerance = max(COUNT_TOLERANCE, RELATIVE_TOLERANCE * first_half)
+        if growth > tolerance:
+            growing[name] = growth
+    return growing
+
+
+def report(samples, warmup, top=10):
+    """
+    Prints the first and last value of every metric, what grew, and the growing call sites.
+    Returns True if nothing grew.
+    """
+    for name, values in samples.series.items():
+        print(f"{name:<16} first {values[min(warmup, len(values) - 1)]:>12,}  last {values[-1]:>12,}")
+    growing = find_growth(samples, warmup)
+    for name, growth in growing.items():
+        print(f"GROWING {name}: +{growth:,.0f} between the first and second half of the run")
+    if samples.first_snapshot and samples.last_snapshot:
+        stats = [stat for stat in samples.last_snapshot.compare_to(samples.first_snapshot, "lineno")
+                 if stat.size_diff > 0]
+        if stats:
+            print("Call sites with the most allocation growth:")
+        for stat in stats[:top]:
+            frame = stat.traceback[0]
+            print(f"  {frame.filename}:{frame.lineno}  +{stat.size_diff:,} B  +{stat.count_diff} blocks")
+    return not growing
+
+
+def run_sim_soak(ticks, sample_every, enemy_count):
+    """
+    Runs one headless session for ticks ticks, sampling every sample_every ticks.
+    """
+    state = default_game_state.copy()
+    state["invincibility_mode"] = True
+    sim = Simulation(state, seed=0, enemy_count=enemy_count)
+    samples = Samples()
+    tracemalloc.start()
+    for tick in range(ticks):
+        sim.step()
+        if tick % sample_every == 0:
+            samples.add(grid_items=len(sim.grid), grid_cells=len(sim.grid.cells))
+            if tick == sample_every:
+                samples.snapshot()
+    samples.snapshot()
+    tracemalloc.stop()
+    return samples
+
+
+class VirtualTimestep(FixedTimestep):
+    """
+    Runs one simulation step per frame and schedules frames back to back, so the soak
+    covers many ticks without waiting for real time.
+    """
+
+    def advance(self):
+        return 1
+
+    def alpha(self):
+        return 1.0
+
+    def frame_delay_ms(self):
+        return 1
+
+
+def live_widgets(widget):
+    """
+    All descendants of widget.
+    """
+    found = []
+    for child in widget.winfo_children():
+        found.append(child)
+        found.extend(live_widgets(child))
+    return found
+
+
+def run_game_soak(cycles, cycle_ms, warmup):
+    """
+    Runs soak_game in a temporary working directory holding copies of the assets.
+    """
+    game_directory = os.path.dirname(os.path.abspath(__file__))
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="psr-soak-") as directory:
+        for name in ASSETS:
+            shutil.copy(os.path.join(game_directory, name), directory)
+        os.chdir(directory)
+        try:
+            return soak_game(cycles, cycle_ms, warmup)
+        finally:
+            os.chdir(previous)
+
+
+def soak_game(cycles, cycle_ms, warmup):
+    """
+    Starts a game, plays it for cycle_ms, returns to the menu through the pause or game over
+    screen and repeats, sampling while each game runs and after it ends. Every game starts
+    from scratch, not from the world the previous one left in the pause menu.
+    """
+    import tkinter as tk
+    import game_solution
+
+    game_solution.FixedTimestep = VirtualTimestep
+    root = game_solution.root
+    samples = Samples()
+    tracemalloc.start(10)
+    cycle = 0
+
+    def sample():
+        widgets = live_widgets(root)
+        canvas_items = sum(len(widget.find_all()) for widget in widgets if isinstance(widget, tk.Canvas))
+        pending = len(root.tk.splitlist(root.tk.call("after", "info")))
+        samples.add(canvas_items=canvas_items, widgets=len(widgets), after_callbacks=pending,
+                    timers=game_solution.scheduler.pending())
+
+    def start_cycle():
+        # Every other game runs until the player crashes, to cover the game over screen too.
+        game_solution.game_state["invincibility_mode"] = cycle % 2 == 0
+        game_solution.saved_world = None
+        game_solution.game_state.update({name: default_game_state[name] for name in SESSION_FIELDS})
+        game_solution.start_game(root)
+        root.after(cycle_ms, end_cycle)
+
+    def end_cycle():
+        nonlocal cycle
+        sample()
+        root.event_generate(game_solution.key_bindings["pause_game"])
+        for widget in root.winfo_children():
+            if isinstance(widget, tk.Button) and widget.cget("text") == "MENU":
+                widget.invoke()
+                break
+        cycle += 1
+        if cycle == warmup:
+            samples.snapshot()
+        if cycle < cycles:
+            root.after(50, start_cycle)
+        else:
+            root.after(50, finish)
+
+    def finish():
+        sample()
+        samples.snapshot()
+        root.quit()
+
+    root.after(0, start_cycle)
+    root.mainloop()
+    tracemalloc.stop()
+    # Write what is left while still in the temporary directory, not at exit
+    game_solution.save_writer.close()
+    game_solution.leaderboard.close()
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak test for slow leaks.")
+    commands = parser.add_subparsers(dest="mode", required=True)
+    sim_parser = commands.add_parser("sim", help="headless simulation")
+    sim_parser.add_argument("--ticks", type=int, default=2000000)
+    sim_parser.add_argument("--sample-every", type=int, default=50000)
+    sim_parser.add_argument("--enemies", type=int, default=100)
+    game_parser = commands.add_parser("game", help="game loop with start/return-to-menu cycles")
+    game_parser.add_argument("--cycles", type=int, default=40)
+    game_parser.add_argument("--cycle-ms", type=int, default=3000)
+    args = parser.parse_args()
+
+    if args.mode == "sim":
+        result = run_sim_soak(args.ticks, args.sample_every, args.enemies)
+        warmup_samples = 2
+    else:
+        warmup_samples = 4
+        result = run_game_soak(args.cycles, args.cycle_ms, warmup_samples)
+    if not report(result, warmup_samples):
+        sys.exit(1)
+    print("No unbounded growth found")
@@ -0,0 +1,96 @@
+"""
+Spatial hash for the broad phase of car collisions.
+
+Cars are bucketed into square grid cells by their hitbox. Moving a car only touches
+the index when it crosses into different cells, and box queries only look at the
+cells the box covers, so collision and spawn checks stay cheap with dense traffic.
+"""
+
+
+class SpatialHash:
+    """
+    Grid of cells mapping to the items whose boxes overlap them.
+    Boxes are (left, top, right, bottom).
+    """
+
+    def __init__(self, cell_size=200):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def cell_range(self, box):
+        size = self.cell_size
+        left, top, right, bottom = box
+        return int(left // size), int(top // size), int(right // size), int(bottom // size)
+
+    def insert(self, item, box):
+        cell_range = self.cell_range(box)
+        self.item_cells[item] = cell_range
+        col0, row0, col1, row1 = cell_range
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = self.cells.get((col, row))
+                if bucket is None:
+                    bucket = self.cells[(col, row)] = set()
+                bucket.add(item)
+
+    def remove(self, item):
+        col0, row0, col1, row1 = self.item_cells.pop(item)
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = self.cells[(col, row)]
+                bucket.discard(item)
+                if not bucket:
+                    del self.cells[(col, row)]
+
+    def update(self, item, box):
+        """
+        Re-buckets an item after it moved. Does nothing while it stays in the same cells,
+        and a purely vertical move only touches the rows it entered or left.
+        """
+        new_range = self.cell_range(box)
+        old_range = self.item_cells.get(item)
+        if old_range == new_range:
+            return
+        if old_range is None or old_range[0] != new_range[0] or old_range[2] != new_range[2]:
+            if old_range is not None:
+                self.remove(item)
+            self.insert(item, box)
+            return
+        col0, old_row0, col1, old_row1 = old_range
+        _, row0, _, row1 = new_range
+        self.item_cells[item] = new_range
+        cells = self.cells
+        for row in range(old_row0, old_row1 + 1):
+            if row < row0 or row > row1:
+                for col in range(col0, col1 + 1):
+                    bucket = cells[(col, row)]
+                    bucket.discard(item)
+                    if not bucket:
+                        del cells[(col, row)]
+        for row in range(row0, row1 + 1):
+            if row < old_row0 or row > old_row1:
+                for col in range(col0, col1 + 1):
+                    bucket = cells.get((col, row))
+                    if bucket is None:
+                        bucket = cells[(col, row)] = set()
+                    bucket.add(item)
+
+    def query(self, box):
+        """
+        Returns the items in the cells covered by the box. Candidates only, the caller
+        still does the exact overlap test, and must not change the grid while iterating.
+        """
+        col0, row0, col1, row1 = self.cell_range(box)
+        if col0 == col1 and row0 == row1:
+            return self.cells.get((col0, row0), ())
+        found = set()
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = self.cells.get((col, row))
+                if bucket:
+                    found |= bucket
+        return found
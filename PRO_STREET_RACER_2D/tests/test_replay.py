@@ -0,0 +1,51 @@
+import random
+
+from replay import ReplayRecorder, read_replay, verify
+from simulation import Simulation, default_game_state
+
+
+def record(path, seed=11, enemy_count=4, quick_load=False):
+    """
+    Plays a session with random keys into a replay at path. Returns its final score.
+    """
+    state = default_game_state.copy()
+    sim = Simulation(state, seed, enemy_count)
+    sim.recorder = ReplayRecorder(str(path), state, seed, enemy_count)
+    keys = random.Random(seed)
+    world = None
+    while sim.tick < 3000:
+        if keys.random() < 0.1:
+            sim.key_down(keys.choice(("move_left", "move_right")))
+        if keys.random() < 0.1:
+            sim.key_up(keys.choice(("move_left", "move_right")))
+        if quick_load and sim.tick == 20:
+            world = sim.snapshot()
+        if quick_load and sim.tick == 40:
+            sim.restore(world)
+        if not sim.step():
+            break
+    sim.recorder.finish(sim.tick, sim.score)
+    return sim.score
+
+
+def test_replay_reproduces_its_score(tmp_path):
+    path = tmp_path / "game.psr"
+    score = record(path)
+    header, events = read_replay(str(path))
+    assert events[-1][2] == score
+    assert verify(str(path))
+
+
+def test_replay_with_a_quick_load(tmp_path):
+    path = tmp_path / "game.psr"
+    record(path, quick_load=True)
+    assert verify(str(path))
+
+
+def test_tampered_score_does_not_verify(tmp_path):
+    path = tmp_path / "game.psr"
+    record(path)
+    data = bytearray(path.read_bytes())
+    data[-8:] = (int.from_bytes(data[-8:], "little") + 1).to_bytes(8, "little")  # The END record's score
+    path.write_bytes(bytes(data))
+    assert not verify(str(path))
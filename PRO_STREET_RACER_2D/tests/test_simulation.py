@@ -0,0 +1,91 @@
+import random
+
+import numpy as np
+
+from savegame import pack_world, unpack_world
+from simulation import Simulation, default_game_state
+from track import VIEW_LENGTH
+
+
+def invincible_state():
+    state = default_game_state.copy()
+    state["invincibility_mode"] = True
+    return state
+
+
+def drive(sim, ticks, seed=0):
+    """
+    Steps sim with keys pressed and released at random, from their own generator.
+    """
+    keys = random.Random(seed)
+    for _ in range(ticks):
+        action = keys.choice(("move_left", "move_right"))
+        if keys.random() < 0.2:
+            sim.key_down(action)
+        elif keys.random() < 0.2:
+            sim.key_up(action)
+        if not sim.step():
+            break
+
+
+def same_snapshot(first, second):
+    assert first.keys() == second.keys()
+    for key in first:
+        if isinstance(first[key], np.ndarray):
+            assert np.array_equal(first[key], second[key]), key
+        else:
+            assert first[key] == second[key], key
+
+
+def test_same_seed_gives_the_same_game():
+    games = [Simulation(invincible_state(), seed=7, enemy_count=20) for _ in range(2)]
+    for sim in games:
+        drive(sim, 2000)
+    same_snapshot(games[0].snapshot(), games[1].snapshot())
+
+
+def test_other_seed_gives_another_game():
+    games = [Simulation(invincible_state(), seed=seed, enemy_count=20) for seed in (7, 8)]
+    for sim in games:
+        drive(sim, 200)
+    assert not np.array_equal(games[0].snapshot()["enemy_x"], games[1].snapshot()["enemy_x"])
+
+
+def test_restored_world_plays_on_the_same():
+    sim = Simulation(invincible_state(), seed=3, enemy_count=10)
+    drive(sim, 500)
+    world = unpack_world(pack_world(sim.snapshot()))
+    restored = Simulation(invincible_state(), seed=99, enemy_count=10)
+    restored.restore(world)
+    drive(sim, 500, seed=1)
+    drive(restored, 500, seed=1)
+    same_snapshot(sim.snapshot(), restored.snapshot())
+
+
+def test_speed_goes_up_as_the_game_starts():
+    sim = Simulation(seed=0)
+    assert sim.speed == default_game_state["speed"] + Simulation.SPEED_UP_STEP
+
+
+def test_player_stays_on_the_road():
+    sim = Simulation(invincible_state(), seed=5)
+    sim.key_down("move_left")
+    for _ in range(3000):
+        low, high = sim.player_range()  # The road under the car for the coming tick
+        sim.step()
+        assert low <= sim.player.x <= high
+
+
+def test_road_span_covers_the_road_on_screen():
+    sim = Simulation(invincible_state(), seed=3)
+    for _ in range(100):
+        sim.road += 97
+        left, right = sim.road_span(-40, 700)
+        edges = [sim.track.edges(sim.road + VIEW_LENGTH - y) for y in range(-40, 701)]
+        assert left == min(edge[0] for edge in edges)
+        assert right == max(edge[1] for edge in edges)
+
+
+def test_rules_apply_to_the_cars_placed_at_the_start():
+    sim = Simulation(invincible_state(), seed=2, enemy_count=30, rules={"SPAWN_MIN_X": 400, "SPAWN_MAX_X": 420})
+    assert all(400 <= enemy.x <= 420 for enemy in sim.enemies[1:])
@@ -0,0 +1,66 @@
+"""
+Fixed-timestep timing for the game loop.
+
+The simulation always advances in steps of the same length, however long a frame
+took, so speed and score do not depend on how busy the machine is. Frames are
+drawn as often as the display allows, interpolating between the last two steps.
+"""
+import time
+
+FRAME_RATE = 60
+
+
+class FixedTimestep:
+    """
+    Accumulates real time and reports how many fixed steps are due.
+    """
+
+    def __init__(self, step, max_steps=5, frame_rate=FRAME_RATE, clock=time.perf_counter):
+        self.step = step
+        self.max_steps = max_steps  # Bound on catch-up steps after a stall
+        self.frame_time = 1 / frame_rate
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        """
+        Starts timing from now, dropping time spent while the loop was stopped (pause, boss key).
+        """
+        self.last = self.clock()
+        self.next_frame = self.last
+        self.accumulator = 0.0
+        self.dropped = 0.0
+
+    def advance(self):
+        """
+        Returns the number of simulation steps to run for the time passed since the last call.
+        """
+        now = self.clock()
+        self.accumulator += now - self.last
+        self.last = now
+        steps = 0
+        while self.accumulator >= self.step and steps < self.max_steps:
+            self.accumulator -= self.step
+            steps += 1
+        if self.accumulator >= self.step:
+            # Too far behind: keep the fraction and forget the rest of the stall.
+            self.dropped += self.accumulator - self.accumulator % self.step
+            self.accumulator %= self.step
+        return steps
+
+    def alpha(self):
+        """
+        How far between the previous and the current step the next frame is drawn, 0 to 1.
+        """
+        return self.accumulator / self.step
+
+    def frame_delay_ms(self):
+        """
+        Milliseconds to wait before the next frame. Frames are scheduled against
+        fixed deadlines, so time spent in the frame itself does not add up as drift.
+        """
+        self.next_frame += self.frame_time
+        now = self.clock()
+        if self.next_frame < now:
+            self.next_frame = now
+        return round((self.next_frame - now) * 1000)
@@ -0,0 +1,198 @@
+"""
+The road as an endless strip of chunks generated from a seed.
+
+Chunk i covers road distances i * CHUNK_LENGTH to (i + 1) * CHUNK_LENGTH, distance being
+Simulation.road, how far the traffic has driven. Each chunk has a lane count, a
+sideways offset of the road at each end (the road bends between them) and a few
+roadside objects. Everything about chunk i comes from a random generator seeded with
+the track seed and i alone, so chunks can be made in any order, again and again, and
+always come out the same.
+
+TrackRing keeps only the chunks around the screen, in a fixed number of Chunk objects:
+as the road scrolls, the chunk that left the screen is filled in again as the next one
+ahead. Nothing grows however far the road goes.
+
+The road's edges are also game rules: Simulation keeps the player's car and the cars
+it spawns between them, looking them up with Track.edges.
+"""
+import argparse
+import random
+import time
+
+CHUNK_LENGTH = 400
+VIEW_LENGTH = 700  # Road distance shown on screen, the canvas height
+MARGIN = 20  # Extra distance kept below and above the screen, for the road edges' width
+LANE_WIDTH = 150
+MIN_LANES = 3
+MAX_LANES = 5
+START_LANES = 4  # The first chunk is straight, with the four lanes of the old fixed road
+MAX_BEND = 60  # Furthest the road's centre moves from the middle of the screen
+TAPER = 80  # Distance over which the road widens or narrows when the lane count changes
+MAX_PROPS = 4  # Roadside objects per chunk
+PROPS = ("tree", "bush", "rock")
+ROAD_CENTRE = 500  # Screen x of the road's centre when it does not bend
+CACHED_CHUNKS = 512  # Chunks Track keeps for edges(), 1000 enemy cars spawn over 250 chunks of road
+
+
+def chunk_random(seed, index):
+    return random.Random(f"{seed}:{index}")
+
+
+class Chunk:
+    """
+    One stretch of road. Filled in place by Track.fill, so it can be reused for another index.
+    """
+    __slots__ = ("index", "lanes", "previous_lanes", "start_offset", "end_offset", "props")
+
+    def __init__(self):
+        self.index = None
+        self.lanes = START_LANES
+        self.previous_lanes = START_LANES
+        self.start_offset = 0
+        self.end_offset = 0
+        self.props = []  # (kind, side, distance into the chunk, gap from the road edge), side -1 left or 1 right
+
+    def offset_at(self, distance):
+        """
+        Sideways offset of the road's centre, distance into the chunk.
+        """
+        return self.start_offset + (self.end_offset - self.start_offset) * distance / CHUNK_LENGTH
+
+    def half_width(self, distance):
+        """
+        Half the road's width, distance into the chunk.
+        """
+        if distance >= TAPER:
+            return self.lanes * LANE_WIDTH / 2
+        lanes = self.previous_lanes + (self.lanes - self.previous_lanes) * distance / TAPER
+        return lanes * LANE_WIDTH / 2
+
+
+class Track:
+    """
+    Makes chunks from a seed.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.cache = {}  # Index -> Chunk for edges(), oldest first. The road is driven in order.
+
+    def shape(self, index):
+        """
+        (random generator, offset of the road's centre where chunk index starts, lanes) for
+        chunk index. The generator has given those two and goes on to the roadside objects.
+        """
+        rng = chunk_random(self.seed, index)
+        offset = rng.randint(-MAX_BEND, MAX_BEND)
+        lanes = rng.randint(MIN_LANES, MAX_LANES)
+        return rng, offset if index > 1 else 0, lanes if index > 0 else START_LANES
+
+    def fill(self, chunk, index):
+        """
+        Fills chunk in as chunk number index and returns it.
+        """
+        rng, chunk.start_offset, chunk.lanes = self.shape(index)
+        chunk.index = index
+        chunk.previous_lanes = self.shape(index - 1)[2]
+        chunk.end_offset = self.shape(index + 1)[1]
+        props = chunk.props
+        props.clear()
+        for _ in range(rng.randint(0, MAX_PROPS)):
+            props.append((rng.choice(PROPS), rng.choice((-1, 1)), rng.randrange(CHUNK_LENGTH), rng.randint(20, 90)))
+        return chunk
+
+    def chunk(self, index):
+        return self.fill(Chunk(), index)
+
+    def edges(self, distance):
+        """
+        Screen x of the road's left and right edges at road distance distance.
+        """
+        index = int(distance // CHUNK_LENGTH)
+        chunk = self.cache.get(index)
+        if chunk is None:
+            chunk = self.cache[index] = self.chunk(index)
+            if len(self.cache) > CACHED_CHUNKS:
+                del self.cache[next(iter(self.cache))]
+        distance -= index * CHUNK_LENGTH
+        centre = ROAD_CENTRE + chunk.offset_at(distance)
+        half_width = chunk.half_width(distance)
+        return centre - half_width, centre + half_width
+
+
+class TrackRing:
+    """
+    The chunks around the screen, chunk i in slot i % size.
+    """
+
+    def __init__(self, track, view_length=VIEW_LENGTH, margin=MARGIN):
+        self.track = track
+        self.view_length = view_length
+        self.margin = margin
+        self.size = -(-(view_length + 2 * margin) // CHUNK_LENGTH) + 1  # Enough for any scroll position
+        self.chunks = [Chunk() for _ in range(self.size)]
+        self.first = None
+        self.refilled = 0  # Chunks filled in since the start, to check the ring recycles
+
+    def set_track(self, track):
+        """
+        Switches to another track, e.g. after loading a game from another session.
+        Every slot gets its chunk again on the next advance.
+        """
+        if track is self.track:
+            return
+        self.track = track
+        for chunk in self.chunks:
+            chunk.index = None
+        self.first = None
+
+    def first_index(self, road):
+        return int(road - self.margin) // CHUNK_LENGTH
+
+    def advance(self, road):
+        """
+        Makes the ring hold the chunks seen at road. Returns the slots that got a new chunk,
+        in order of distance. Scrolling back, e.g. on a quick load, works the same.
+        """
+        first = self.first_index(road)
+        if first == self.first:
+            return []
+        self.first = first
+        refilled = []
+        for index in range(first, first + self.size):
+            slot = index % self.size
+            if self.chunks[slot].index != index:
+                self.track.fill(self.chunks[slot], index)
+                refilled.append(slot)
+        self.refilled += len(refilled)
+        return refilled
+
+    def visible(self):
+        """
+        The chunks in the ring, nearest first.
+        """
+        return [self.chunks[index % self.size] for index in range(self.first, self.first + self.size)]
+
+
+def run(distance, speed, seed=0):
+    """
+    Scrolls a ring down distance of road at speed per tick. Returns (ticks per second, chunks made).
+    """
+    ring = TrackRing(Track(seed))
+    road = 0
+    start = time.perf_counter()
+    while road < distance:
+        ring.advance(road)
+        road += speed
+    elapsed = time.perf_counter() - start
+    return distance / speed / elapsed, ring.refilled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scroll the track headless and time it.")
+    parser.add_argument("--distance", type=int, default=10000000)
+    parser.add_argument("--speed", type=int, default=50)
+    args = parser.parse_args()
+
+    rate, refilled = run(args.distance, args.speed)
+    print(f"{rate:,.0f} ticks/s, {refilled:,} chunks made in a ring of {TrackRing(Track()).size}")
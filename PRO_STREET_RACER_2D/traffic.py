@@ -0,0 +1,76 @@
+"""
+Array storage for cars.
+
+Positions and hitbox extents of every car live in contiguous NumPy arrays, so moving
+all enemy cars and testing the player against all of them are one vectorised
+operation each per tick. simulation.Car objects are thin views onto a row.
+"""
+import numpy as np
+
+CAR_HALF_WIDTH = 50
+CAR_HALF_HEIGHT = 75
+
+
+class Traffic:
+    """
+    Positions (x, y, prev_x, prev_y) and half extents of a growing number of cars.
+    """
+
+    def __init__(self, capacity=8):
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.prev_x = np.zeros(capacity, dtype=np.int64)
+        self.prev_y = np.zeros(capacity, dtype=np.int64)
+        self.half_width = np.full(capacity, CAR_HALF_WIDTH, dtype=np.int64)
+        self.half_height = np.full(capacity, CAR_HALF_HEIGHT, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x, y, half_width=CAR_HALF_WIDTH, half_height=CAR_HALF_HEIGHT):
+        """
+        Adds a car and returns its row.
+        """
+        if self.count == len(self.x):
+            self.grow()
+        index = self.count
+        self.x[index] = x
+        self.y[index] = y
+        self.prev_x[index] = x
+        self.prev_y[index] = y
+        self.half_width[index] = half_width
+        self.half_height[index] = half_height
+        self.count += 1
+        return index
+
+    def grow(self):
+        capacity = 2 * len(self.x)
+        for name in ("x", "y", "prev_x", "prev_y", "half_width", "half_height"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def move(self, speed, length):
+        """
+        Moves every car down by speed. Cars that reach the bottom of the screen go back
+        up by length; their rows are returned so the caller can pick new lanes.
+        """
+        n = self.count
+        y = self.y[:n]
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = y
+        y += speed
+        respawned = np.flatnonzero(y >= 800)
+        y[respawned] -= length
+        return respawned
+
+    def hit_mask(self, x, y, half_width=CAR_HALF_WIDTH, half_height=CAR_HALF_HEIGHT):
+        """
+        Boolean mask of the cars overlapping the given box, edges touching included,
+        the same test as Car.__add__.
+        """
+        n = self.count
+        return ((np.abs(self.x[:n] - x) <= self.half_width[:n] + half_width) &
+                (np.abs(self.y[:n] - y) <= self.half_height[:n] + half_height))
@@ -0,0 +1,172 @@
+"""
+Many games stepped at once, for training and evaluating autopilots.
+
+VecRacer holds N independent games as NumPy arrays, one row per game, and advances
+all of them with one vectorised step(actions) following a simplified version of
+simulation.Simulation's rules: the player moves PLAYER_SPEED per tick, enemies drive down
+and respawn in a random lane above the screen, the score grows by the speed every
+tick, and the speed goes up every SPEED_UP_INTERVAL seconds of game time. Games that
+end are reset in place, so the batch never shrinks:
+
+    env = VecRacer(4096, seed=0)
+    observations = env.reset()
+    observations, rewards, dones, info = env.step(actions)  # actions: STAY, LEFT or RIGHT per game
+
+It only models a straight road, and does not match a Simulation tick for tick. The
+games have no track: the player and the enemies keep to the four lane road of a
+track's first chunk, where a Simulation's follow the road as it bends and changes
+lanes after that chunk. Respawning cars also skip Simulation's search for a free spot,
+so with several enemies per game the traffic can overlap where a Simulation's would
+not.
+
+    python vecenv.py --envs 4096 --ticks 1000   # prints game ticks per second
+"""
+import argparse
+import time
+
+import numpy as np
+
+from simulation import Simulation, default_game_state
+from track import Track
+from traffic import CAR_HALF_HEIGHT, CAR_HALF_WIDTH
+
+ROAD_LEFT, ROAD_RIGHT = (int(edge) for edge in Track().edges(0))  # The first chunk of every track
+STAY = 0
+LEFT = 1
+RIGHT = 2
+
+
+class VecRacer:
+    """
+    N games of enemy_count enemy cars each, on a straight road. Observations are
+    float32 rows of player x, speed, the enemies' x and then their y.
+    """
+    SPEED_UP_INTERVAL = Simulation.SPEED_UP_INTERVAL
+    SPEED_UP_STEP = Simulation.SPEED_UP_STEP
+    MAX_SPEED = Simulation.MAX_SPEED
+    PLAYER_SPEED = Simulation.PLAYER_SPEED
+    PLAYER_MIN_X = max(Simulation.PLAYER_MIN_X, ROAD_LEFT + Simulation.ROAD_INSET)
+    PLAYER_MAX_X = min(Simulation.PLAYER_MAX_X, ROAD_RIGHT - Simulation.ROAD_INSET)
+    SPAWN_MIN_X = max(Simulation.SPAWN_MIN_X, ROAD_LEFT + Simulation.ROAD_INSET)
+    SPAWN_MAX_X = min(Simulation.SPAWN_MAX_X, ROAD_RIGHT - Simulation.ROAD_INSET)
+
+    def __init__(self, num_envs, enemy_count=1, seed=None, invincible=False, crash_penalty=0.0):
+        self.num_envs = num_envs
+        self.enemy_count = enemy_count
+        self.invincible = invincible
+        self.crash_penalty = crash_penalty  # Taken off the reward of the tick a game crashes on
+        self.traffic_length = max(900, 100 * enemy_count)
+        speed = default_game_state["speed"]  # Sped up once as the game starts, like a Simulation
+        self.start_speed = speed + self.SPEED_UP_STEP if speed < self.MAX_SPEED else speed
+        self.rng = np.random.default_rng(seed)
+        self.player_x = np.zeros(num_envs, dtype=np.int64)
+        self.player_y = default_game_state["player_car_y"]
+        self.enemy_x = np.zeros((num_envs, enemy_count), dtype=np.int64)
+        self.enemy_y = np.zeros((num_envs, enemy_count), dtype=np.int64)
+        self.speed = np.zeros(num_envs, dtype=np.int64)
+        self.speed_timer = np.zeros(num_envs)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.ticks = np.zeros(num_envs, dtype=np.int64)
+        self.reset()
+
+    @property
+    def observation_size(self):
+        return 2 + 2 * self.enemy_count
+
+    def reset(self):
+        """
+        Starts every game over. Returns the observations.
+        """
+        self.reset_games(np.arange(self.num_envs))
+        return self.observations()
+
+    def reset_games(self, games):
+        """
+        Starts the games at the given rows over, like a new Simulation.
+        """
+        count = len(games)
+        if not count:
+            return
+        state = default_game_state
+        self.player_x[games] = state["player_car_x"]
+        self.speed[games] = self.start_speed
+        self.speed_timer[games] = 0.0
+        self.score[games] = state["score"]
+        self.ticks[games] = 0
+        self.enemy_x[games, 0] = state["enemy_car_x"]
+        self.enemy_y[games, 0] = state["enemy_car_y"]
+        if self.enemy_count > 1:
+            shape = (count, self.enemy_count - 1)
+            self.enemy_x[games, 1:] = self.rng.integers(self.SPAWN_MIN_X, self.SPAWN_MAX_X + 1, shape)
+            self.enemy_y[games, 1:] = self.rng.integers(800 - self.traffic_length, -100 + 1, shape)
+
+    def observations(self):
+        observations = np.empty((self.num_envs, self.observation_size), dtype=np.float32)
+        observations[:, 0] = self.player_x
+        observations[:, 1] = self.speed
+        observations[:, 2:2 + self.enemy_count] = self.enemy_x
+        observations[:, 2 + self.enemy_count:] = self.enemy_y
+        return observations
+
+    def step(self, actions):
+        """
+        Advances every game by one tick. actions holds STAY, LEFT or RIGHT per game.
+        Returns (observations, rewards, dones, info). The reward is the score gained.
+        Games that ended are already reset in the observations returned; info has
+        "final_score" and "final_ticks" for every game, valid where dones is True.
+        """
+        actions = np.asarray(actions)
+        self.player_x -= self.PLAYER_SPEED * (actions == LEFT)
+        self.player_x += self.PLAYER_SPEED * (actions == RIGHT)
+        np.clip(self.player_x, self.PLAYER_MIN_X, self.PLAYER_MAX_X, out=self.player_x)
+
+        self.enemy_y += self.speed[:, None]
+        respawned = self.enemy_y >= 800
+        if respawned.any():
+            self.enemy_y[respawned] -= self.traffic_length
+            self.enemy_x[respawned] = self.rng.integers(self.SPAWN_MIN_X, self.SPAWN_MAX_X + 1,
+                                                        np.count_nonzero(respawned))
+        self.score += self.speed
+        self.ticks += 1
+        rewards = self.speed.astype(np.float32)
+
+        if self.invincible:
+            dones = np.zeros(self.num_envs, dtype=bool)
+        else:
+            dones = ((np.abs(self.enemy_x - self.player_x[:, None]) <= 2 * CAR_HALF_WIDTH) &
+                     (np.abs(self.enemy_y - self.player_y) <= 2 * CAR_HALF_HEIGHT)).any(axis=1)
+            rewards[dones] -= self.crash_penalty
+
+        # Same floating point steps as Simulation.increase_speed, so the speed-ups land on the same ticks.
+        self.speed_timer += Simulation.TICK
+        due = self.speed_timer >= self.SPEED_UP_INTERVAL
+        self.speed_timer[due] -= self.SPEED_UP_INTERVAL
+        self.speed[due & (self.speed < self.MAX_SPEED)] += self.SPEED_UP_STEP
+
+        info = {"final_score": self.score.copy(), "final_ticks": self.ticks.copy()}
+        self.reset_games(np.flatnonzero(dones))
+        return self.observations(), rewards, dones, info
+
+
+def benchmark(num_envs, ticks, enemy_count=1, seed=0):
+    """
+    Steps num_envs games with random actions for ticks ticks. Returns game ticks per second.
+    """
+    env = VecRacer(num_envs, enemy_count, seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(STAY, RIGHT + 1, (ticks, num_envs))
+    start = time.perf_counter()
+    for tick in range(ticks):
+        env.step(actions[tick])
+    return num_envs * ticks / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the vectorised game environment.")
+    parser.add_argument("--envs", type=int, default=4096)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--enemies", type=int, default=1)
+    args = parser.parse_args()
+
+    rate = benchmark(args.envs, args.ticks, args.enemies)
+    print(f"{args.envs} games x {args.ticks} ticks: {rate:,.0f} game ticks/s")